@@ -150,13 +150,15 @@ router.get('/rules', async (req, res, next) => {
  */
 router.post('/train', async (req, res, next) => {
   try {
-    const { min_support, min_threshold, use_sample_data } = req.body;
+    const { min_support, min_threshold, use_sample_data, approximate } = req.body;
     
-    // Call ML service to train model
+    // Call ML service to train model and wait for the job to finish
     const response = await axios.post(`${ML_SERVICE_URL}/train`, {
       min_support,
       min_threshold,
-      use_sample_data
+      use_sample_data,
+      approximate: approximate || false,
+      wait: true
     });
     
     return res.json(response.data);
@@ -35,7 +35,9 @@ class MLService {
       const response = await axios.post(`${ML_SERVICE_URL}/train`, {
         min_support: params.min_support || 0.01,
         min_threshold: params.min_threshold || 0.5,
-        use_sample_data: params.use_sample_data !== undefined ? params.use_sample_data : true
+        use_sample_data: params.use_sample_data !== undefined ? params.use_sample_data : true,
+        approximate: params.approximate || false,
+        wait: true
       });
       return response.data;
     } catch (error) {
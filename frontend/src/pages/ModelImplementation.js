@@ -67,6 +67,7 @@ const ModelImplementation = () => {
   const [minSupport, setMinSupport] = useState(0.01);
   const [minConfidence, setMinConfidence] = useState(0.5);
   const [useSampleData, setUseSampleData] = useState(true);
+  const [approximate, setApproximate] = useState(false);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(false);
@@ -111,7 +112,8 @@ const ModelImplementation = () => {
       const response = await api.trainModel({
         min_support: minSupport,
         min_threshold: minConfidence,
-        use_sample_data: useSampleData
+        use_sample_data: useSampleData,
+        approximate
       });
       
       setModelResult(response);
@@ -289,6 +291,21 @@ const ModelImplementation = () => {
                       ? "Using standard processing for smaller datasets (faster but may not handle large datasets well)."
                       : "Using chunked processing for large datasets (more memory efficient but slower)."}
                   </Typography>
+                  <FormControlLabel
+                    control={
+                      <Switch
+                        checked={approximate}
+                        onChange={(e) => setApproximate(e.target.checked)}
+                        disabled={loading}
+                      />
+                    }
+                    label="Quick Approximate Training"
+                  />
+                  <Typography variant="body2" color="text.secondary">
+                    {approximate
+                      ? "Mining a random sample of all transactions; supports are estimates with confidence intervals."
+                      : "Mining the full dataset for exact supports."}
+                  </Typography>
                 </Box>
                 
                 {!useSampleData && (
@@ -0,0 +1,132 @@
+"""Throughput of /recommend served by 1..N uvicorn worker processes sharing one memory-mapped model.
+
+Run from ml-service/:  python benchmarks/load_test.py --workers 1 2 4 --clients 8 --duration 10
+
+A model is trained once on synthetic data; for each worker count the service
+is started with ``uvicorn --workers``, and client processes send /recommend
+requests over keep-alive connections for ``--duration`` seconds.
+Use --no-cache to measure scoring rather than recommendation cache hits.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, SERVICE_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from synthetic import add_arguments, generate_from_args, sample_queries
+
+def _client(url, queries, duration, seed):
+    """Send /recommend requests until ``duration`` has passed; returns the latencies in ms"""
+    import httpx
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(queries)).tolist()
+    latencies = []
+    with httpx.Client(base_url=url, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        i = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            client.post("/recommend", json={"items": queries[order[i % len(order)]]}).raise_for_status()
+            latencies.append((time.perf_counter() - started) * 1000)
+            i += 1
+    return latencies
+
+def _wait_until_serving(url, workers, timeout=60):
+    """Block until the service answers with a loaded model"""
+    import httpx
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/status").json().get("model_trained"):
+                # Give the remaining workers time to load the model as well
+                time.sleep(1 + 0.5 * workers)
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("Service did not start")
+
+def run_workers(workdir, workers, args, queries):
+    env = dict(os.environ, PYTHONPATH=SERVICE_DIR, MODEL_POLL_INTERVAL="0")
+    if args.no_cache:
+        env["RECOMMENDATION_CACHE_SIZE"] = "0"
+    url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", SERVICE_DIR, "--port", str(args.port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env)
+    try:
+        _wait_until_serving(url, workers)
+        with multiprocessing.get_context("spawn").Pool(args.clients) as pool:
+            runs = pool.starmap(_client, [(url, queries, args.duration, seed) for seed in range(args.clients)])
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    latencies = np.concatenate([np.asarray(run) for run in runs])
+    return {
+        "workers": workers,
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / args.duration,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--min-support", type=float, default=0.002)
+    parser.add_argument("--min-threshold", type=float, default=0.3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load per worker count")
+    parser.add_argument("--queries", type=int, default=5000, help="distinct baskets sent")
+    parser.add_argument("--no-cache", action="store_true", help="disable the recommendation cache")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output) if args.output else None
+
+    with tempfile.TemporaryDirectory(prefix="mba-load-") as workdir:
+        dataset = generate_from_args(os.path.join(workdir, "data"), args)
+        # Train once; every worker process maps the same saved artifact
+        os.chdir(workdir)
+        import main as service
+        from ingest import load_transactions
+        service.run_training(None, {"min_support": args.min_support, "min_threshold": args.min_threshold,
+                                    "use_sample_data": False, "use_cache": False})
+        baskets, _ = load_transactions(service.HEADER_FILE, service.DETAIL_FILE, cache_dir=None)
+        queries = sample_queries(baskets, args.queries, seed=args.seed)
+
+        results = []
+        for workers in args.workers:
+            result = run_workers(workdir, workers, args, queries)
+            result["speedup"] = result["requests_per_second"] / results[0]["requests_per_second"] if results else 1.0
+            results.append(result)
+            print(f"workers={workers:2d}  {result['requests_per_second']:8.0f} req/s  speedup {result['speedup']:.2f}x  "
+                  f"p50 {result['p50_ms']:.2f}ms  p99 {result['p99_ms']:.2f}ms")
+        os.chdir(SERVICE_DIR)
+
+    report = {
+        "dataset": dataset,
+        "clients": args.clients,
+        "duration": args.duration,
+        "cache": not args.no_cache,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Mining time of parallel_apriori for 1..N workers on the service's training data.
+
+Run from ml-service/:  python benchmarks/parallel_scaling.py --min-support 0.002 --max-workers 16
+With --synthetic the baskets are generated instead (see synthetic.py for the options).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ingest import load_transactions
+from parallel import parallel_apriori
+from synthetic import add_arguments, generate_from_args
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--header", default="data/Header_comb.csv")
+    parser.add_argument("--detail", default="data/Detail_comb.csv")
+    parser.add_argument("--min-support", type=float, default=0.002)
+    parser.add_argument("--max-length", type=int, default=3)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--synthetic", action="store_true", help="mine generated baskets instead of --header/--detail")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    dataset = None
+    if args.synthetic:
+        with tempfile.TemporaryDirectory(prefix="mba-bench-") as data_dir:
+            dataset = generate_from_args(data_dir, args)
+            baskets, _ = load_transactions(os.path.join(data_dir, "Header_comb.csv"),
+                                           os.path.join(data_dir, "Detail_comb.csv"), cache_dir=None)
+    else:
+        baskets, _ = load_transactions(args.header, args.detail)
+    results = []
+    reference = None
+    for workers in range(1, args.max_workers + 1):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            itemsets = parallel_apriori(baskets, args.min_support, args.max_length, workers=workers)
+            timings.append(time.perf_counter() - started)
+        if reference is None:
+            reference = itemsets
+        elif not (itemsets['itemsets'].equals(reference['itemsets'])
+                  and itemsets['support'].equals(reference['support'])):
+            raise SystemExit(f"Result with {workers} workers differs from 1 worker")
+        best = min(timings)
+        results.append({"workers": workers, "seconds": best, "speedup": results[0]["seconds"] / best if results else 1.0})
+        print(f"workers={workers:2d}  {best:.3f}s  speedup {results[-1]['speedup']:.2f}x")
+
+    report = {
+        "transactions": len(baskets),
+        "items": baskets.n_items,
+        "min_support": args.min_support,
+        "max_length": args.max_length,
+        "itemsets": len(reference),
+        "cpu_count": os.cpu_count(),
+        "dataset": dataset,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Benchmark ingest, mining, rule generation and serving on synthetic data and store the results as JSON.
+
+Run from ml-service/:
+    python benchmarks/run_benchmarks.py --transactions 100000 --items 5000
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/<earlier>.json
+
+Each run writes benchmarks/results/<time>-<commit>.json (or --output). With
+--compare, every timing is printed next to the earlier report's and ratios
+above 1 + --tolerance are flagged as regressions.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, SERVICE_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from synthetic import add_arguments, generate_from_args, sample_queries
+
+def git_commit():
+    """Short commit hash of the service code and whether the tree has local changes"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVICE_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        # Only changes to tracked files count; untracked files such as earlier results do not
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD", "--", "."], cwd=SERVICE_DIR).returncode != 0
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def timed(fn, repeat):
+    """Best and mean wall time of ``repeat`` calls, and the last result"""
+    runs = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - started)
+    return {"best_seconds": min(runs), "mean_seconds": sum(runs) / len(runs), "runs": runs}, result
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "requests": len(samples),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(np.percentile(samples, 50)),
+        "p90_ms": float(np.percentile(samples, 90)),
+        "p99_ms": float(np.percentile(samples, 99)),
+    }
+
+def run(args):
+    import main
+    from fastapi.testclient import TestClient
+    from ingest import load_transactions
+    from rule_index import RuleIndex
+
+    # One log line per request would drown the results
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    report = {"timings": {}}
+    header, detail = main.HEADER_FILE, main.DETAIL_FILE
+
+    stats, _ = timed(lambda: main.process_transaction_data(header, detail), args.repeat)
+    report["timings"]["process_transaction_data"] = stats
+    stats, (baskets, _) = timed(lambda: load_transactions(header, detail, cache_dir=None), args.repeat)
+    report["timings"]["load_transactions"] = stats
+    print(f"ingest: {len(baskets)} baskets, {baskets.n_items} items")
+
+    frequent_itemsets = None
+    for algorithm in args.algorithms:
+        stats, (frequent_itemsets, columns) = timed(
+            lambda: main.train_model(baskets, args.min_support, args.max_length, algorithm), args.repeat)
+        report["timings"][f"train_model[{algorithm}]"] = stats
+        print(f"train_model[{algorithm}]: {len(frequent_itemsets)} itemsets in {stats['best_seconds']:.3f}s")
+
+    stats, rules = timed(lambda: main.generate_association_rules(frequent_itemsets, args.min_threshold, items=columns),
+                         args.repeat)
+    report["timings"]["generate_association_rules"] = stats
+    print(f"generate_association_rules: {len(rules)} rules in {stats['best_seconds']:.3f}s")
+    report["counts"] = {"transactions": len(baskets), "items": baskets.n_items,
+                        "itemsets": len(frequent_itemsets), "rules": len(rules)}
+
+    index = RuleIndex.from_rules(rules)
+    queries = sample_queries(baskets, args.requests, seed=args.seed)
+
+    stats, _ = timed(lambda: [main.get_recommendations(query, index) for query in queries], args.repeat)
+    stats["per_call_us"] = stats["best_seconds"] / len(queries) * 1e6
+    report["timings"]["get_recommendations"] = stats
+    stats, _ = timed(lambda: main.get_batch_recommendations(queries, index), args.repeat)
+    stats["per_basket_us"] = stats["best_seconds"] / len(queries) * 1e6
+    report["timings"]["get_batch_recommendations"] = stats
+
+    # End to end: train through the job path, serve the saved model and time /recommend requests
+    main.run_training(None, {"min_support": args.min_support, "min_threshold": args.min_threshold,
+                             "max_length": args.max_length, "use_sample_data": False, "use_cache": False})
+    with TestClient(main.app) as client:
+        for query in queries[:min(50, len(queries))]:
+            client.post("/recommend", json={"items": query})
+        latencies = []
+        for query in queries:
+            started = time.perf_counter()
+            response = client.post("/recommend", json={"items": query})
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+    report["http_recommend"] = percentiles(latencies)
+    print(f"/recommend: p50 {report['http_recommend']['p50_ms']:.2f}ms "
+          f"p99 {report['http_recommend']['p99_ms']:.2f}ms over {len(latencies)} requests")
+    return report
+
+def _comparable(report):
+    """Flat name -> value of the numbers compared between reports (lower is better)"""
+    values = {f"{name}.best_seconds": stats["best_seconds"] for name, stats in report.get("timings", {}).items()}
+    for key in ("p50_ms", "p90_ms", "p99_ms"):
+        if key in report.get("http_recommend", {}):
+            values[f"http_recommend.{key}"] = report["http_recommend"][key]
+    return values
+
+def compare(report, baseline, tolerance):
+    """Print each value against the baseline; returns the names of regressions"""
+    current, previous = _comparable(report), _comparable(baseline)
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created_at')}):")
+    regressions = []
+    for name, value in current.items():
+        if name not in previous or not previous[name]:
+            print(f"  {name:45s} {value:10.4f}   (new)")
+            continue
+        ratio = value / previous[name]
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name:45s} {value:10.4f}  was {previous[name]:10.4f}  x{ratio:.2f}{flag}")
+    return regressions
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_arguments(parser)
+    parser.add_argument("--min-support", type=float, default=0.002)
+    parser.add_argument("--min-threshold", type=float, default=0.3)
+    parser.add_argument("--max-length", type=int, default=3)
+    parser.add_argument("--algorithms", nargs="+", default=["apriori", "fpgrowth", "eclat"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=2000, help="recommendation requests to time")
+    parser.add_argument("--output", help="report path (default benchmarks/results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown ratio above 1 + tolerance is a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    created_at = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+    output = args.output or os.path.join(BENCHMARK_DIR, "results", f"{created_at}-{commit or 'unknown'}.json")
+    output = os.path.abspath(output)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="mba-bench-") as workdir:
+        # The service reads data/ and writes its models and caches relative to the working directory
+        dataset = generate_from_args(os.path.join(workdir, "data"), args)
+        os.chdir(workdir)
+        report = run(args)
+        os.chdir(SERVICE_DIR)
+
+    report = {
+        "commit": commit,
+        "dirty": dirty,
+        "created_at": created_at,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "dataset": dataset,
+        "config": {key: getattr(args, key) for key in
+                   ("min_support", "min_threshold", "max_length", "algorithms", "repeat", "requests")},
+        **report,
+    }
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions and args.fail_on_regression:
+            raise SystemExit(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,102 @@
+"""Synthetic Header_comb.csv / Detail_comb.csv / productname.csv with Zipf-distributed item popularity.
+
+Run from ml-service/:  python benchmarks/synthetic.py /tmp/bench-data --transactions 100000 --items 5000
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+def _uuid_like(prefix: int, numbers: np.ndarray) -> np.ndarray:
+    """Upper-case UUID-shaped IDs like the vouchers and items of the real exports"""
+    return np.array([f"{prefix:08X}-0000-4000-8000-{n:012X}" for n in numbers.tolist()], dtype=object)
+
+def generate(output_dir: str, transactions: int = 100000, items: int = 5000, zipf_exponent: float = 1.1,
+             mean_basket_size: float = 4.0, bundle_rate: float = 0.5, missing_header_rate: float = 0.02,
+             seed: int = 0) -> dict:
+    """Write the three CSVs under ``output_dir`` and return a summary of what was generated.
+
+    Item ``k`` (0-based rank) is drawn with probability proportional to
+    ``1 / (k + 1) ** zipf_exponent``; basket sizes are 1 + Poisson. Every fifth
+    item comes with its successor in ``bundle_rate`` of its baskets, so there
+    are strong rules to find. ``missing_header_rate`` of the vouchers get no
+    header row, like detail lines whose header was not exported.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(output_dir, exist_ok=True)
+
+    popularity = 1.0 / np.arange(1, items + 1) ** zipf_exponent
+    popularity /= popularity.sum()
+    sizes = rng.poisson(max(mean_basket_size - 1, 0), transactions) + 1
+    picks = rng.choice(items, size=int(sizes.sum()), p=popularity)
+    vouchers = np.repeat(np.arange(transactions), sizes)
+
+    bundled = (picks % 5 == 0) & (rng.random(len(picks)) < bundle_rate)
+    picks = np.concatenate([picks, (picks[bundled] + 1) % items])
+    vouchers = np.concatenate([vouchers, vouchers[bundled]])
+    order = np.argsort(vouchers, kind='stable')
+    picks, vouchers = picks[order], vouchers[order]
+
+    # Shuffle which ID gets which popularity rank, so IDs do not sort by popularity
+    item_ids = _uuid_like(0x1D, rng.permutation(items))
+    voucher_ids = _uuid_like(0x70, np.arange(transactions))
+
+    with_header = rng.random(transactions) >= missing_header_rate
+    pd.DataFrame({
+        'voucher_id': voucher_ids[with_header],
+        'date': '2023-04-01',
+        'total': (sizes[with_header] * 2.5).round(2),
+    }).to_csv(os.path.join(output_dir, "Header_comb.csv"), index=False)
+    pd.DataFrame({
+        'voucher_id': voucher_ids[vouchers],
+        'item_no': item_ids[picks],
+        'quantity': 1,
+        'price': 2.5,
+    }).to_csv(os.path.join(output_dir, "Detail_comb.csv"), index=False)
+    pd.DataFrame({
+        'product_id': item_ids,
+        'product_name': [f"Product {rank}" for rank in range(items)],
+    }).to_csv(os.path.join(output_dir, "productname.csv"), index=False)
+
+    return {
+        "transactions": transactions,
+        "items": items,
+        "detail_rows": len(picks),
+        "zipf_exponent": zipf_exponent,
+        "mean_basket_size": mean_basket_size,
+        "bundle_rate": bundle_rate,
+        "missing_header_rate": missing_header_rate,
+        "seed": seed,
+    }
+
+def sample_queries(baskets, count: int, seed: int = 0, max_items: int = 3) -> list:
+    """Recommendation inputs: the first ``max_items`` items of randomly drawn encoded baskets"""
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(len(baskets), size=count)
+    return [baskets.items[baskets.codes[baskets.offsets[row]:baskets.offsets[row + 1]]][:max_items].tolist()
+            for row in rows.tolist()]
+
+def add_arguments(parser: argparse.ArgumentParser):
+    """Generator options shared by the benchmark scripts"""
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument("--mean-basket-size", type=float, default=4.0)
+    parser.add_argument("--bundle-rate", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+
+def generate_from_args(output_dir: str, args: argparse.Namespace) -> dict:
+    return generate(output_dir, transactions=args.transactions, items=args.items,
+                    zipf_exponent=args.zipf_exponent, mean_basket_size=args.mean_basket_size,
+                    bundle_rate=args.bundle_rate, seed=args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_dir")
+    add_arguments(parser)
+    args = parser.parse_args()
+    print(generate_from_args(args.output_dir, args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+import logging
+from encoding import EncodedBaskets
+from eclat import tid_bitsets, count_itemsets, generate_candidates
+from rule_generation import SupportTable, encode_itemsets, rows_by_length, generate_rules, count_rules
+from rule_store import RuleStore, store_nbytes
+
+logger = logging.getLogger(__name__)
+
+# Which frequent itemsets a model keeps: all of them, the closed ones or the maximal ones
+ITEMSET_TYPES = ("all", "closed", "maximal")
+
+def superset_level(baskets: EncodedBaskets, frequent_itemsets: pd.DataFrame, min_support: float,
+                   max_len: Optional[int]) -> pd.DataFrame:
+    """Frequent itemsets of ``max_len + 1`` items, for itemsets mined up to ``max_len``.
+
+    Itemsets at the mining length limit are closed or maximal only if no
+    superset one item larger qualifies, and those supersets were never mined.
+    They are the apriori join of the longest itemsets, counted over ``baskets``.
+    """
+    empty = pd.DataFrame({'support': np.zeros(0), 'itemsets': pd.Series([], dtype=object)})
+    if max_len is None or baskets.n_transactions == 0:
+        return empty
+    codes = {item: code for code, item in enumerate(baskets.items)}
+    longest = sorted(tuple(sorted(codes[item] for item in itemset))
+                     for itemset in frequent_itemsets['itemsets'] if len(itemset) == max_len)
+    candidates = generate_candidates(longest)
+    if not candidates:
+        return empty
+    items = np.unique([code for candidate in candidates for code in candidate])
+    rows = np.full(baskets.n_items, -1, dtype=np.int64)
+    rows[items] = np.arange(len(items))
+    supports = count_itemsets(tid_bitsets(baskets, items), candidates, rows) / baskets.n_transactions
+    frequent = np.flatnonzero(supports >= min_support)
+    return pd.DataFrame({
+        'support': supports[frequent],
+        'itemsets': pd.Series([frozenset(baskets.items[list(candidates[i])]) for i in frequent], dtype=object),
+    })
+
+def _lattice(frequent_itemsets: pd.DataFrame, supersets: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """The itemsets followed by the supersets past their length limit"""
+    if supersets is None or len(supersets) == 0:
+        return frequent_itemsets
+    return pd.concat([frequent_itemsets[['support', 'itemsets']], supersets[['support', 'itemsets']]],
+                     ignore_index=True)
+
+def _mask(sets: List[Tuple[int, ...]], supports: np.ndarray, table: SupportTable, itemset_type: str) -> np.ndarray:
+    keep = np.ones(len(sets), dtype=bool)
+    if itemset_type == "all":
+        return keep
+    for length, rows in rows_by_length(sets).items():
+        if length < 2:
+            continue
+        matrix = np.array([sets[row] for row in rows], dtype=np.int64)
+        for dropped in range(length):
+            subsets = table.lookup(np.delete(matrix, dropped, axis=1))
+            if itemset_type == "maximal":
+                keep[subsets] = False
+            else:
+                keep[subsets[np.isclose(supports[subsets], supports[rows], rtol=1e-9, atol=0)]] = False
+    return keep
+
+def condensed_mask(frequent_itemsets: pd.DataFrame, items: Sequence[str], itemset_type: str,
+                   supersets: Optional[pd.DataFrame] = None) -> np.ndarray:
+    """Which frequent itemsets are closed or maximal.
+
+    An itemset is closed when no superset one item larger has the same
+    support, and maximal when no superset one item larger is frequent (any
+    larger such superset implies one of these). Each itemset is checked as a
+    superset of its subsets one item smaller, length by length. Pass the
+    ``superset_level`` of itemsets mined with a length limit; without it,
+    itemsets at the limit count as closed and maximal.
+    """
+    if itemset_type not in ITEMSET_TYPES:
+        raise ValueError(f"Unknown itemset type '{itemset_type}'")
+    if itemset_type == "all" or len(frequent_itemsets) == 0:
+        return np.ones(len(frequent_itemsets), dtype=bool)
+    sets, supports = encode_itemsets(_lattice(frequent_itemsets, supersets), items)
+    return _mask(sets, supports, SupportTable(sets, len(items)), itemset_type)[:len(frequent_itemsets)]
+
+def _model_nbytes(frequent_itemsets: pd.DataFrame, n_rules: int, n_antecedent_codes: int, n_consequent_codes: int,
+                  n_metrics: int, n_items: int) -> int:
+    """Bytes of the itemset and rule arrays and the rule index postings"""
+    n = len(frequent_itemsets)
+    itemset_bytes = (n + 1) * 8 + int(frequent_itemsets['itemsets'].apply(len).sum()) * 4 + n * 8
+    postings = n_antecedent_codes * 4 + (n_items + 1) * 8
+    return itemset_bytes + store_nbytes(n_rules, n_antecedent_codes, n_consequent_codes, n_metrics) + postings
+
+def condense(frequent_itemsets: pd.DataFrame, items: Sequence[str], itemset_type: str, min_confidence: float,
+             metrics: Optional[Sequence[str]] = None,
+             supersets: Optional[pd.DataFrame] = None) -> Tuple[pd.DataFrame, RuleStore, Dict[str, Any]]:
+    """Closed or maximal itemsets and the rules generated from them, with a report of what was saved.
+
+    Rules are generated from the kept itemsets only, with antecedent and
+    consequent supports looked up among all frequent itemsets, in ranking
+    order. The rules of the dropped itemsets are only counted, so the report
+    can compare itemset and rule counts and array sizes with the full set.
+    ``supersets`` is the ``superset_level`` of the itemsets, see ``condensed_mask``.
+    """
+    if itemset_type not in ITEMSET_TYPES:
+        raise ValueError(f"Unknown itemset type '{itemset_type}'")
+    lattice = _lattice(frequent_itemsets, supersets)
+    sets, supports = encode_itemsets(lattice, items)
+    table = SupportTable(sets, len(items))
+    n = len(frequent_itemsets)
+    # Supersets past the length limit only decide what is kept; they never enter the model
+    keep = np.zeros(len(sets), dtype=bool)
+    keep[:n] = _mask(sets, supports, table, itemset_type)[:n]
+    dropped = np.zeros(len(sets), dtype=bool)
+    dropped[:n] = ~keep[:n]
+
+    rules = generate_rules(lattice, items, min_confidence=min_confidence, metrics=metrics,
+                           keep=keep, table=table)
+    n_dropped_rules, n_antecedent_codes, n_consequent_codes = count_rules(sets, supports, table, min_confidence,
+                                                                          keep=dropped)
+    kept_itemsets = frequent_itemsets[keep[:n]].reset_index(drop=True)
+
+    n_rules = len(rules) + n_dropped_rules
+    full_bytes = _model_nbytes(frequent_itemsets, n_rules, len(rules.antecedent_codes) + n_antecedent_codes,
+                               len(rules.consequent_codes) + n_consequent_codes, len(rules.columns), len(items))
+    kept_bytes = _model_nbytes(kept_itemsets, len(rules), len(rules.antecedent_codes), len(rules.consequent_codes),
+                               len(rules.columns), len(items))
+    report = {
+        "itemset_type": itemset_type,
+        "itemsets": {"full": n, "kept": len(kept_itemsets)},
+        "rules": {"full": n_rules, "kept": len(rules)},
+        "model_bytes": {"full": full_bytes, "kept": kept_bytes},
+        "bytes_saved": full_bytes - kept_bytes,
+    }
+    logger.info(f"Kept {len(kept_itemsets)} of {n} itemsets ({itemset_type}) and "
+                f"{len(rules)} of {n_rules} rules, {full_bytes - kept_bytes} bytes saved")
+    return kept_itemsets, rules, report
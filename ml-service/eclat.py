@@ -0,0 +1,131 @@
+from typing import Callable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from encoding import EncodedBaskets
+
+# Number of set bits for every byte value
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def tid_bitsets(baskets: EncodedBaskets, codes: np.ndarray) -> np.ndarray:
+    """Packed vertical TID bitsets (one row per item code) for the given items"""
+    csc = baskets.to_csr()[:, codes].tocsc()
+    n_bytes = (baskets.n_transactions + 7) // 8
+    bitsets = np.empty((len(codes), n_bytes), dtype=np.uint8)
+    row = np.zeros(n_bytes * 8, dtype=bool)
+    for col in range(len(codes)):
+        row[:] = False
+        row[csc.indices[csc.indptr[col]:csc.indptr[col + 1]]] = True
+        bitsets[col] = np.packbits(row)
+    return bitsets
+
+def popcount(bitsets: np.ndarray) -> np.ndarray:
+    """Number of set bits in each row of a packed bitset matrix"""
+    return _POPCOUNT[bitsets].sum(axis=-1, dtype=np.int64)
+
+def weighted_popcount(bitsets: np.ndarray, byte_weights: np.ndarray, block_rows: int = 256) -> np.ndarray:
+    """Sum of ``byte_weights`` over the set bits of each row, counting ``block_rows`` rows at a time"""
+    bitsets = bitsets.reshape(-1, bitsets.shape[-1])
+    totals = np.empty(len(bitsets), dtype=np.float64)
+    for start in range(0, len(bitsets), block_rows):
+        totals[start:start + block_rows] = _POPCOUNT[bitsets[start:start + block_rows]] @ byte_weights
+    return totals
+
+def count_itemsets(bitsets: np.ndarray, candidates: Sequence[Sequence[int]], rows: Optional[np.ndarray] = None,
+                   count_of: Callable[[np.ndarray], np.ndarray] = popcount, block_rows: int = 256) -> np.ndarray:
+    """Count of every candidate itemset, from the AND of its items' bitsets.
+
+    Candidates are sequences of bitset rows, or of item codes mapped to rows
+    through ``rows``; a 2-D array holds candidates of one length. Candidates of
+    one length are combined ``block_rows`` at a time and each block is counted
+    with ``count_of`` (``popcount`` by default).
+    """
+    counts = np.zeros(len(candidates), dtype=count_of(bitsets[:0]).dtype)
+    if isinstance(candidates, np.ndarray):
+        groups = [(np.arange(len(candidates)), candidates)] if len(candidates) else []
+    else:
+        by_length = {}
+        for i, candidate in enumerate(candidates):
+            by_length.setdefault(len(candidate), []).append(i)
+        groups = [(positions, np.array([candidates[i] for i in positions], dtype=np.int64))
+                  for positions in by_length.values()]
+    for positions, item_rows in groups:
+        if rows is not None:
+            item_rows = rows[item_rows]
+        for start in range(0, len(positions), block_rows):
+            block = item_rows[start:start + block_rows]
+            combined = bitsets[block[:, 0]]
+            for column in range(1, block.shape[1]):
+                combined &= bitsets[block[:, column]]
+            counts[positions[start:start + block_rows]] = count_of(combined)
+    return counts
+
+def generate_candidates(frequent: List[Tuple[int, ...]]) -> List[Tuple[int, ...]]:
+    """Apriori join and prune: k-itemsets whose every (k-1)-subset is frequent, in sorted order"""
+    known = set(frequent)
+    candidates = []
+    start = 0
+    while start < len(frequent):
+        # Itemsets sharing all but their last item are adjacent in sorted order
+        end = start
+        while end < len(frequent) and frequent[end][:-1] == frequent[start][:-1]:
+            end += 1
+        for i in range(start, end):
+            for j in range(i + 1, end):
+                candidate = frequent[i] + frequent[j][-1:]
+                if all(candidate[:m] + candidate[m + 1:] in known for m in range(len(candidate) - 2)):
+                    candidates.append(candidate)
+        start = end
+    return candidates
+
+def search(codes: np.ndarray, bitsets: np.ndarray, supports: np.ndarray,
+           support_of: Callable[[np.ndarray], np.ndarray], min_support: float,
+           max_len: Optional[int] = None) -> Tuple[List[Tuple[int, ...]], List[float]]:
+    """Depth-first Eclat search from frequent items and their TID bitsets.
+
+    ``support_of`` maps a matrix of bitsets to one support per row. Returns the
+    item code tuples of all frequent itemsets with their supports, sorted in
+    apriori's (length, item order) order.
+    """
+    found_codes = []
+    found_supports = []
+
+    def extend(prefix, codes, bitsets, item_supports):
+        for i, code in enumerate(codes):
+            itemset = prefix + (int(code),)
+            found_codes.append(itemset)
+            found_supports.append(float(item_supports[i]))
+            if i + 1 == len(codes) or (max_len is not None and len(itemset) >= max_len):
+                continue
+            child_bitsets = bitsets[i] & bitsets[i + 1:]
+            child_supports = support_of(child_bitsets)
+            keep = child_supports >= min_support
+            if keep.any():
+                extend(itemset, codes[i + 1:][keep], child_bitsets[keep], child_supports[keep])
+
+    if len(codes):
+        extend((), codes, bitsets, supports)
+
+    order = sorted(range(len(found_codes)), key=lambda i: (len(found_codes[i]), found_codes[i]))
+    return [found_codes[i] for i in order], [found_supports[i] for i in order]
+
+def eclat(baskets: EncodedBaskets, min_support: float = 0.5, max_len: Optional[int] = None) -> pd.DataFrame:
+    """Mine frequent itemsets with Eclat over vertical TID bitsets.
+
+    Supports are computed by AND-ing the prefix bitset with every candidate
+    extension at once and counting bits. Returns the same frame as mlxtend's
+    miners with use_colnames=True, in apriori's (length, item order) order.
+    """
+    n_transactions = baskets.n_transactions
+    found_codes, found_supports = [], []
+    if n_transactions:
+        supports = baskets.item_counts() / n_transactions
+        frequent = np.flatnonzero(supports >= min_support)
+        found_codes, found_supports = search(frequent, tid_bitsets(baskets, frequent), supports[frequent],
+                                             lambda bitsets: popcount(bitsets) / n_transactions,
+                                             min_support, max_len)
+
+    items = baskets.items
+    return pd.DataFrame({
+        'support': np.array(found_supports, dtype=np.float64),
+        'itemsets': pd.Series([frozenset(items[list(codes)]) for codes in found_codes], dtype=object),
+    })
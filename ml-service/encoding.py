@@ -0,0 +1,115 @@
+from typing import Iterable, List, Optional
+import numpy as np
+import pandas as pd
+import os
+import json
+from scipy import sparse
+
+class EncodedBaskets:
+    """Transactions as integer item codes in CSR layout.
+
+    Basket i holds ``codes[offsets[i]:offsets[i + 1]]``; codes index into
+    ``items``, which is sorted so code order matches TransactionEncoder's
+    column order. Codes are unique and ascending within each basket.
+    """
+
+    def __init__(self, offsets: np.ndarray, codes: np.ndarray, items: np.ndarray):
+        self.offsets = offsets
+        self.codes = codes
+        self.items = items
+
+    @classmethod
+    def from_lists(cls, baskets: Iterable[List[str]]) -> "EncodedBaskets":
+        """Encode an iterable of item ID lists (e.g. the ``item_no`` column of a transactions frame)"""
+        baskets = list(baskets)
+        sizes = np.fromiter((len(b) for b in baskets), dtype=np.int64, count=len(baskets))
+        flat = np.fromiter((str(item) for b in baskets for item in b), dtype=object, count=int(sizes.sum()))
+        rows = np.repeat(np.arange(len(baskets), dtype=np.int64), sizes)
+        codes, items = pd.factorize(flat, sort=True)
+        return cls.from_pairs(rows, codes, np.asarray(items, dtype=object), len(baskets))
+
+    @classmethod
+    def from_pairs(cls, rows: np.ndarray, codes: np.ndarray, items: np.ndarray,
+                   n_transactions: Optional[int] = None) -> "EncodedBaskets":
+        """Build baskets from parallel (row, item code) arrays, dropping repeated items"""
+        if n_transactions is None:
+            n_transactions = int(rows.max()) + 1 if len(rows) else 0
+        keys = np.unique(rows.astype(np.int64) * len(items) + codes)
+        rows, codes = np.divmod(keys, max(len(items), 1))
+        offsets = np.zeros(n_transactions + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_transactions), out=offsets[1:])
+        return cls(offsets, codes.astype(np.int32), items)
+
+    def recode(self, mapping: np.ndarray, items: np.ndarray, block_size: int = 1000000) -> "EncodedBaskets":
+        """Return baskets with codes translated through ``mapping`` into the ``items`` dictionary.
+
+        Codes are re-sorted within each basket, working through blocks of about
+        ``block_size`` codes so the temporary sort keys stay bounded.
+        """
+        codes = mapping[self.codes].astype(np.int32)
+        bounds = np.unique(np.searchsorted(
+            self.offsets, np.arange(0, len(codes), max(block_size, 1)), side='right') - 1)
+        bounds = np.append(bounds, self.n_transactions)
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            lo, hi = self.offsets[first], self.offsets[last]
+            rows = np.repeat(np.arange(last - first, dtype=np.int64), np.diff(self.offsets[first:last + 1]))
+            keys = (rows << 32) | codes[lo:hi]
+            keys.sort()
+            codes[lo:hi] = keys & 0xFFFFFFFF
+        return EncodedBaskets(self.offsets, codes, items)
+
+    def take(self, rows: np.ndarray) -> "EncodedBaskets":
+        """Baskets at the given row positions, in that order, sharing the item dictionary"""
+        starts, ends = self.offsets[rows], self.offsets[np.asarray(rows) + 1]
+        sizes = ends - starts
+        offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        # Position of every kept code in the source codes array
+        positions = np.repeat(starts - offsets[:-1], sizes) + np.arange(offsets[-1])
+        return EncodedBaskets(offsets, np.asarray(self.codes[positions], dtype=np.int32), self.items)
+
+    @property
+    def n_transactions(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def n_items(self) -> int:
+        return len(self.items)
+
+    def __len__(self):
+        return self.n_transactions
+
+    def basket_sizes(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def item_counts(self) -> np.ndarray:
+        """Number of baskets containing each item code"""
+        return np.bincount(self.codes, minlength=self.n_items)
+
+    def to_csr(self) -> sparse.csr_matrix:
+        """Boolean transactions x items matrix"""
+        data = np.ones(len(self.codes), dtype=bool)
+        return sparse.csr_matrix((data, self.codes, self.offsets),
+                                 shape=(self.n_transactions, self.n_items))
+
+    def to_sparse_frame(self) -> pd.DataFrame:
+        """One-hot frame with sparse boolean columns named by item ID, as accepted by mlxtend miners"""
+        return pd.DataFrame.sparse.from_spmatrix(self.to_csr().tocsc(), columns=self.items)
+
+    def save(self, path: str):
+        """Write offsets, codes and the item dictionary as .npy/.json files under ``path``"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "offsets.npy"), np.ascontiguousarray(self.offsets, dtype=np.int64))
+        np.save(os.path.join(path, "codes.npy"), np.ascontiguousarray(self.codes, dtype=np.int32))
+        with open(os.path.join(path, "items.json"), "w") as f:
+            json.dump([str(item) for item in self.items], f)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "EncodedBaskets":
+        """Load baskets written by ``save``; arrays are memory-mapped read-only unless ``mmap`` is False"""
+        mmap_mode = "r" if mmap else None
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode=mmap_mode)
+        codes = np.load(os.path.join(path, "codes.npy"), mmap_mode=mmap_mode)
+        with open(os.path.join(path, "items.json")) as f:
+            items = np.array(json.load(f), dtype=object)
+        return cls(offsets, codes, items)
@@ -0,0 +1,257 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+import os
+import json
+import shutil
+import fcntl
+import logging
+from encoding import EncodedBaskets
+from eclat import tid_bitsets, weighted_popcount, count_itemsets, search, eclat
+
+logger = logging.getLogger(__name__)
+
+# Baskets retained for incremental updates, one segment directory per ingested batch
+INCREMENTAL_DIR = os.environ.get("INCREMENTAL_DIR", "data/incremental")
+STATE_FILE = "state.json"
+
+# Relative slack when comparing weighted counts against the support threshold
+_TOLERANCE = 1e-9
+
+class IncrementalStateError(Exception):
+    """The retained baskets do not belong to the model being updated"""
+
+def _history_bitsets(segments: List[EncodedBaskets], weights: List[float],
+                     items: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """TID bitsets of ``items`` over all segments, side by side, and the weight of every byte.
+
+    Each segment is packed on its own, so every byte belongs to one segment
+    and weighted supports are a dot product of per-byte bit counts.
+    """
+    parts = []
+    byte_weights = []
+    for baskets, weight in zip(segments, weights):
+        n_bytes = (baskets.n_transactions + 7) // 8
+        bitsets = np.zeros((len(items), n_bytes), dtype=np.uint8)
+        if baskets.n_items and len(items):
+            codes = np.minimum(np.searchsorted(baskets.items, items), baskets.n_items - 1)
+            present = baskets.items[codes] == items
+            if present.any():
+                bitsets[present] = tid_bitsets(baskets, codes[present])
+        parts.append(bitsets)
+        byte_weights.append(np.full(n_bytes, weight, dtype=np.float64))
+    if not parts:
+        return np.zeros((len(items), 0), dtype=np.uint8), np.zeros(0, dtype=np.float64)
+    return np.hstack(parts), np.concatenate(byte_weights)
+
+def _count_itemsets(itemsets: List[frozenset], segments: List[EncodedBaskets],
+                    weights: List[float]) -> np.ndarray:
+    """Weighted number of baskets containing each itemset"""
+    if not itemsets or not segments:
+        return np.zeros(len(itemsets), dtype=np.float64)
+    items = np.array(sorted({item for itemset in itemsets for item in itemset}), dtype=object)
+    rows = {item: row for row, item in enumerate(items)}
+    bitsets, byte_weights = _history_bitsets(segments, weights, items)
+    return count_itemsets(bitsets, [[rows[item] for item in itemset] for itemset in itemsets],
+                          count_of=lambda combined: weighted_popcount(combined, byte_weights))
+
+def _mine_weighted(segments: List[EncodedBaskets], weights: List[float], min_count: float,
+                   max_len: Optional[int]) -> Dict[frozenset, float]:
+    """Weighted Eclat over all segments: every itemset whose weighted count reaches ``min_count``"""
+    items = np.array(sorted({item for baskets in segments for item in baskets.items}), dtype=object)
+    bitsets, byte_weights = _history_bitsets(segments, weights, items)
+    counts = weighted_popcount(bitsets, byte_weights)
+    frequent = np.flatnonzero(counts >= min_count)
+    found_codes, found_counts = search(frequent, bitsets[frequent], counts[frequent],
+                                       lambda child: weighted_popcount(child, byte_weights), min_count, max_len)
+    return {frozenset(items[list(codes)]): count for codes, count in zip(found_codes, found_counts)}
+
+class IncrementalMiner:
+    """Keeps a model's frequent itemsets current as new baskets arrive, FUP-style.
+
+    Baskets are retained as one segment per ingested batch, each with a weight
+    that is multiplied by ``decay`` on every ingest; with ``window`` the oldest
+    segments are dropped once they lie entirely outside the latest ``window``
+    baskets. The weighted counts of the current frequent itemsets are updated
+    from the new and dropped segments only. An itemset that was not frequent
+    can only become frequent if it is frequent enough in the new batch, so
+    just those candidates are counted over the retained history. When dropped
+    baskets outweigh the new batch that bound no longer holds and the
+    retained segments are mined again.
+    """
+
+    def __init__(self, path: str = INCREMENTAL_DIR):
+        self.path = path
+        self.state = None
+        self._pending = None
+        self._evicted = []
+
+    @contextmanager
+    def lock(self):
+        """Serialize updates across processes"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield self
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _segment_path(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _load_state(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.path, STATE_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _write_state(self):
+        path = os.path.join(self.path, STATE_FILE)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def open(self, model: Dict[str, Any], load_base: Callable[[], EncodedBaskets]):
+        """Attach to ``model``; for a freshly trained model its training baskets become the first segment"""
+        state = self._load_state()
+        if state is not None and state["model_version"] == model["version"]:
+            self.state = state
+            return self
+        if model["params"].get("incremental") is not None:
+            raise IncrementalStateError(
+                f"Retained baskets do not match model {model['version']}; retrain the model first")
+
+        baskets = load_base()
+        if len(baskets) != model["transaction_count"]:
+            raise IncrementalStateError(
+                f"Training data changed since model {model['version']} was trained; retrain the model first")
+        # Start over from the trained model's baskets
+        for name in os.listdir(self.path):
+            if name.startswith("segment-"):
+                shutil.rmtree(self._segment_path(name), ignore_errors=True)
+        baskets.save(self._segment_path("segment-000000"))
+        self.state = {
+            "model_version": model["version"],
+            "base_version": model["version"],
+            "sequence": 0,
+            "segments": [{"name": "segment-000000", "weight": 1.0, "transactions": len(baskets)}],
+        }
+        self._write_state()
+        logger.info(f"Started incremental state for model {model['version']} with {len(baskets)} baskets")
+        return self
+
+    def update(self, model: Dict[str, Any], new_baskets: EncodedBaskets, decay: float = 1.0,
+               window: Optional[int] = None) -> Dict[str, Any]:
+        """Apply a batch of new baskets and return the updated frequent itemsets and counters.
+
+        The batch is stored as a new segment; call ``commit`` once the updated
+        model has been saved to make it part of the retained state.
+        """
+        params = model["params"]
+        min_support = params["min_support"]
+        max_len = params.get("max_length") or 3
+        segments_state = [dict(segment) for segment in self.state["segments"]]
+
+        # Old weighted counts, recovered from the published supports
+        total_weight = sum(segment["weight"] * segment["transactions"] for segment in segments_state)
+        frequent_itemsets = model["frequent_itemsets"]
+        counts = dict(zip(frequent_itemsets['itemsets'], frequent_itemsets['support'].to_numpy() * total_weight))
+
+        # Age the retained baskets
+        for segment in segments_state:
+            segment["weight"] *= decay
+        counts = {itemset: count * decay for itemset, count in counts.items()}
+
+        # Drop the oldest segments beyond the window
+        evicted = []
+        if window is not None:
+            retained = sum(segment["transactions"] for segment in segments_state) + len(new_baskets)
+            while segments_state and retained - segments_state[0]["transactions"] >= window:
+                retained -= segments_state[0]["transactions"]
+                evicted.append(segments_state.pop(0))
+        elif segments_state and segments_state[0]["weight"] * 2 ** 52 < 1:
+            # Fully decayed segments no longer contribute
+            while segments_state and segments_state[0]["weight"] * 2 ** 52 < 1:
+                evicted.append(segments_state.pop(0))
+
+        evicted_weight = sum(segment["weight"] * segment["transactions"] for segment in evicted)
+        retained_segments = [EncodedBaskets.load(self._segment_path(s["name"])) for s in segments_state]
+        retained_weights = [s["weight"] for s in segments_state]
+        new_weight = float(len(new_baskets))
+        total_weight = sum(w * len(b) for w, b in zip(retained_weights, retained_segments)) + new_weight
+        min_count = min_support * total_weight * (1 - _TOLERANCE)
+
+        # An itemset that was not frequent needs more than min_support * (new - dropped weight)
+        # occurrences in the new batch to become frequent; when dropped baskets outweigh the
+        # new ones there is no such bound
+        if new_weight and new_weight >= evicted_weight:
+            batch_support = max(min_support * (new_weight - evicted_weight), 1) / new_weight
+            mode = "fup"
+            tracked = list(counts)
+            updated = np.array([counts[itemset] for itemset in tracked], dtype=np.float64)
+            if evicted:
+                updated -= _count_itemsets(tracked, [EncodedBaskets.load(self._segment_path(s["name"]))
+                                                     for s in evicted], [s["weight"] for s in evicted])
+            updated += _count_itemsets(tracked, [new_baskets], [1.0])
+            counts = dict(zip(tracked, updated))
+
+            batch_frequent = eclat(new_baskets, min_support=batch_support, max_len=max_len)
+            candidates = [itemset for itemset in batch_frequent['itemsets'] if itemset not in counts]
+            if candidates:
+                candidate_counts = (_count_itemsets(candidates, retained_segments, retained_weights)
+                                    + _count_itemsets(candidates, [new_baskets], [1.0]))
+                counts.update(zip(candidates, candidate_counts))
+            n_candidates = len(candidates)
+        else:
+            mode = "remine"
+            counts = _mine_weighted(retained_segments + [new_baskets], retained_weights + [1.0],
+                                    min_count, max_len)
+            n_candidates = len(counts)
+
+        frequent = {itemset: count for itemset, count in counts.items() if count >= min_count}
+        columns = sorted({item for baskets in retained_segments + [new_baskets] for item in baskets.items})
+        codes = {item: code for code, item in enumerate(columns)}
+        keys = {itemset: (len(itemset), sorted(codes[item] for item in itemset)) for itemset in frequent}
+        ordered = sorted(frequent, key=keys.get)
+
+        # Stage the new batch as the newest segment
+        sequence = self.state["sequence"] + 1
+        name = f"segment-{sequence:06d}"
+        new_baskets.save(self._segment_path(name))
+        segments_state.append({"name": name, "weight": 1.0, "transactions": len(new_baskets)})
+        self._pending = {
+            "model_version": None,
+            "base_version": self.state["base_version"],
+            "sequence": sequence,
+            "segments": segments_state,
+        }
+        self._evicted = [segment["name"] for segment in evicted]
+
+        sizes = np.concatenate([baskets.basket_sizes() for baskets in retained_segments + [new_baskets]])
+        return {
+            "frequent_itemsets": pd.DataFrame({
+                'support': np.array([frequent[itemset] / total_weight for itemset in ordered], dtype=np.float64),
+                'itemsets': pd.Series(ordered, dtype=object),
+            }),
+            "columns": columns,
+            "basket_sizes": sizes,
+            "weighted_transaction_count": total_weight,
+            "new_transactions": len(new_baskets),
+            "evicted_transactions": sum(segment["transactions"] for segment in evicted),
+            "candidates_counted": n_candidates,
+            "mode": mode,
+            "sequence": sequence,
+            "base_version": self.state["base_version"],
+        }
+
+    def commit(self, model_version: str):
+        """Record the saved model as the current state and delete dropped segments"""
+        self._pending["model_version"] = model_version
+        self.state, self._pending = self._pending, None
+        self._write_state()
+        for name in self._evicted:
+            shutil.rmtree(self._segment_path(name), ignore_errors=True)
+        self._evicted = []
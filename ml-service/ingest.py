@@ -0,0 +1,178 @@
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+import os
+import shutil
+import hashlib
+import logging
+from encoding import EncodedBaskets
+
+logger = logging.getLogger(__name__)
+
+# Detail/header rows parsed per chunk; bounds the parsing working set independently of file size
+DEFAULT_CHUNK_SIZE = int(os.environ.get("INGEST_CHUNK_SIZE", 100000))
+
+# Directory holding memory-mappable encoded baskets keyed by source file size/mtime
+CACHE_DIR = os.environ.get("BASKET_CACHE_DIR", "data/cache")
+
+def _hash_vouchers(voucher_ids: np.ndarray) -> np.ndarray:
+    """64-bit hashes of voucher IDs, so the join keys cost 8 bytes per voucher"""
+    return pd.util.hash_array(voucher_ids.astype(object), categorize=False)
+
+def load_header_vouchers(header_file: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> np.ndarray:
+    """Sorted unique voucher hashes from the header file, read in chunks"""
+    parts = []
+    for chunk in pd.read_csv(header_file, usecols=['voucher_id'], dtype={'voucher_id': 'category'},
+                             chunksize=chunk_size):
+        # Categories are the chunk's distinct voucher IDs, without missing values
+        parts.append(np.unique(_hash_vouchers(chunk['voucher_id'].cat.categories.to_numpy())))
+    if not parts:
+        return np.empty(0, dtype=np.uint64)
+    return np.unique(np.concatenate(parts))
+
+class _BasketWriter:
+    """Accumulates complete baskets as first-seen item codes"""
+
+    def __init__(self):
+        self.item_codes = {}
+        self.code_parts = []
+        self.size_parts = []
+        self.voucher_parts = []
+
+    def encode(self, items: pd.Categorical) -> np.ndarray:
+        """Writer codes of a chunk's categorical items; only the chunk's categories are looked up"""
+        mapping = np.fromiter((self.item_codes.setdefault(item, len(self.item_codes)) for item in items.categories),
+                              dtype=np.int64, count=len(items.categories))
+        return mapping[items.codes]
+
+    def write(self, vouchers: np.ndarray, codes: np.ndarray):
+        """Write baskets from rows grouped by voucher, dropping repeated items within a basket"""
+        if len(vouchers) == 0:
+            return
+        is_start = np.r_[True, vouchers[1:] != vouchers[:-1]]
+        starts = np.flatnonzero(is_start)
+        rows = np.cumsum(is_start) - 1
+        keys = np.unique((rows << 32) | codes)
+        self.code_parts.append((keys & 0xFFFFFFFF).astype(np.int32))
+        self.size_parts.append(np.bincount(keys >> 32, minlength=len(starts)))
+        self.voucher_parts.append(vouchers[starts])
+
+    def finish(self, block_size: int) -> EncodedBaskets:
+        codes = np.concatenate(self.code_parts) if self.code_parts else np.empty(0, dtype=np.int32)
+        sizes = np.concatenate(self.size_parts) if self.size_parts else np.empty(0, dtype=np.int64)
+        vouchers = np.concatenate(self.voucher_parts) if self.voucher_parts else np.empty(0, dtype=np.uint64)
+        self.code_parts = self.size_parts = self.voucher_parts = None
+
+        items = np.array(list(self.item_codes), dtype=object)
+        # Items seen only on rows without a header or an item ID never reach a basket; drop their codes
+        used = np.bincount(codes, minlength=len(items)) > 0
+        if not used.all():
+            codes = (np.cumsum(used, dtype=np.int32) - 1)[codes]
+            items = items[used]
+        offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        baskets = EncodedBaskets(offsets, codes, items)
+
+        unique_vouchers, basket_rows = np.unique(vouchers, return_inverse=True)
+        if len(unique_vouchers) < len(vouchers):
+            # A voucher's lines were not contiguous in the detail file; regroup in memory
+            logger.warning(f"Detail file is not grouped by voucher_id ({len(vouchers) - len(unique_vouchers)} "
+                           f"split baskets); regrouping in memory")
+            rows = np.repeat(basket_rows, sizes)
+            baskets = EncodedBaskets.from_pairs(rows, codes, items, len(unique_vouchers))
+
+        # Renumber items in sorted ID order, matching TransactionEncoder's column order
+        order = np.argsort(items, kind='stable')
+        mapping = np.empty(len(items), dtype=np.int32)
+        mapping[order] = np.arange(len(items), dtype=np.int32)
+        return baskets.recode(mapping, items[order], block_size=block_size)
+
+def stream_transactions(header_file: str, detail_file: str, chunk_size: Optional[int] = None,
+                        max_rows: Optional[int] = None) -> EncodedBaskets:
+    """Stream header/detail files into integer-encoded baskets with bounded memory.
+
+    Detail lines are read ``chunk_size`` rows at a time, inner-joined against the
+    header's voucher IDs and grouped into baskets. The trailing basket of each
+    chunk is carried into the next one, so baskets that span chunk boundaries
+    stay whole. ``max_rows`` limits how many detail lines are read.
+    """
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    header_vouchers = load_header_vouchers(header_file, chunk_size)
+    logger.info(f"Loaded {len(header_vouchers)} header vouchers from {header_file}")
+
+    writer = _BasketWriter()
+    carry_vouchers = np.empty(0, dtype=np.uint64)
+    carry_codes = np.empty(0, dtype=np.int64)
+    rows_read = 0
+
+    for chunk in pd.read_csv(detail_file, usecols=['voucher_id', 'item_no'], dtype='category',
+                             chunksize=chunk_size, nrows=max_rows):
+        rows_read += len(chunk)
+        chunk = chunk.dropna()
+        # Hash each distinct voucher once and spread the hashes over the rows by category code
+        voucher_ids = chunk['voucher_id'].array
+        vouchers = _hash_vouchers(voucher_ids.categories.to_numpy())[voucher_ids.codes]
+
+        # Inner join with the header
+        positions = np.minimum(np.searchsorted(header_vouchers, vouchers), max(len(header_vouchers) - 1, 0))
+        matched = header_vouchers[positions] == vouchers if len(header_vouchers) else np.zeros(len(vouchers), bool)
+        vouchers = np.concatenate([carry_vouchers, vouchers[matched]])
+        codes = np.concatenate([carry_codes, writer.encode(chunk['item_no'].array)[matched]])
+        if len(vouchers) == 0:
+            continue
+
+        # Hold back the last basket, it may continue in the next chunk
+        boundaries = np.flatnonzero(vouchers[1:] != vouchers[:-1])
+        last_start = boundaries[-1] + 1 if len(boundaries) else 0
+        writer.write(vouchers[:last_start], codes[:last_start])
+        carry_vouchers, carry_codes = vouchers[last_start:], codes[last_start:]
+
+    writer.write(carry_vouchers, carry_codes)
+    baskets = writer.finish(block_size=chunk_size)
+    logger.info(f"Streamed {rows_read} detail rows into {len(baskets)} baskets over {baskets.n_items} items")
+    return baskets
+
+def _source_fingerprint(*paths: str) -> str:
+    """Hash of the source files' paths, sizes and modification times"""
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:16]
+
+def load_transactions(header_file: str, detail_file: str, chunk_size: Optional[int] = None,
+                      max_rows: Optional[int] = None, cache_dir: Optional[str] = CACHE_DIR) -> Tuple[EncodedBaskets, bool]:
+    """Return encoded baskets for the source files, memory-mapped from the cache when possible.
+
+    On a miss the files are streamed with stream_transactions and the result is
+    written to ``cache_dir``, replacing entries for older versions of the files.
+    Returns the baskets and whether they came from the cache.
+    """
+    if not cache_dir:
+        return stream_transactions(header_file, detail_file, chunk_size, max_rows), False
+
+    fingerprint = _source_fingerprint(header_file, detail_file)
+    entry = os.path.join(cache_dir, f"baskets-{fingerprint}-{max_rows or 'all'}")
+    if os.path.isdir(entry):
+        try:
+            baskets = EncodedBaskets.load(entry, mmap=True)
+            logger.info(f"Loaded {len(baskets)} cached baskets from {entry}")
+            return baskets, True
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable basket cache {entry}: {str(e)}")
+            shutil.rmtree(entry, ignore_errors=True)
+
+    baskets = stream_transactions(header_file, detail_file, chunk_size, max_rows)
+    # Write next to the final location and rename, so readers never see a partial entry
+    staging = f"{entry}.tmp-{os.getpid()}"
+    try:
+        baskets.save(staging)
+        os.replace(staging, entry)
+        for name in os.listdir(cache_dir):
+            if name.startswith("baskets-") and not name.startswith(f"baskets-{fingerprint}-"):
+                shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+        logger.info(f"Cached {len(baskets)} baskets in {entry}")
+    except OSError as e:
+        logger.warning(f"Could not write basket cache {entry}: {str(e)}")
+        shutil.rmtree(staging, ignore_errors=True)
+    return baskets, False
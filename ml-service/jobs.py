@@ -0,0 +1,219 @@
+from typing import Any, Callable, Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from datetime import datetime
+import multiprocessing
+import threading
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Progress files written by training processes, readable by any service worker
+JOBS_DIR = os.environ.get("TRAINING_JOBS_DIR", "data/jobs")
+TRAINING_WORKERS = int(os.environ.get("TRAINING_WORKERS", 1))
+MAX_TRACKED_JOBS = 100
+
+def memory_usage_mb() -> Dict[str, float]:
+    """Current and peak resident set size of this process in MiB.
+
+    Read from /proc on Linux; elsewhere only the peak is known, from getrusage.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if line.startswith(("VmRSS", "VmHWM")))
+        return {"rss_mb": int(fields["VmRSS"].split()[0]) / 1024, "peak_rss_mb": int(fields["VmHWM"].split()[0]) / 1024}
+    except (OSError, KeyError, ValueError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        peak_mb = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+        return {"rss_mb": peak_mb, "peak_rss_mb": peak_mb}
+    except ImportError:
+        return {}
+
+def _reset_peak_rss() -> bool:
+    """Restart the peak RSS counter so it covers the next phase only (Linux)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def _progress_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+def _write_progress(job_id: str, progress: Dict[str, Any]):
+    try:
+        os.makedirs(JOBS_DIR, exist_ok=True)
+        path = _progress_path(job_id)
+        with open(f"{path}.tmp-{os.getpid()}", "w") as f:
+            json.dump(progress, f)
+        os.replace(f"{path}.tmp-{os.getpid()}", path)
+    except OSError as e:
+        logger.warning(f"Could not write progress for job {job_id}: {str(e)}")
+
+def read_progress(job_id: str) -> Optional[Dict[str, Any]]:
+    """Progress last written by the training process for a job, if any"""
+    try:
+        with open(_progress_path(job_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+class ProgressReporter:
+    """Records phase timings and memory inside a training process and publishes them to the job's progress file"""
+
+    def __init__(self, job_id: Optional[str] = None):
+        self.job_id = job_id
+        self.phase = None
+        self.timings = {}
+        self.memory = {}
+
+    @contextmanager
+    def track(self, phase: str):
+        """Time a training phase, stored in ``timings`` as ``<phase>_seconds``.
+
+        ``memory[phase]`` gets the RSS at the end of the phase and the peak RSS
+        during it (the process peak so far where the counter cannot be reset).
+        """
+        self.phase = phase
+        self._write()
+        _reset_peak_rss()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            self.timings[f"{phase}_seconds"] = seconds
+            self.memory[phase] = memory_usage_mb()
+            logger.info(f"Phase {phase} took {seconds:.3f}s, RSS {self.memory[phase].get('rss_mb', 0):.1f} MiB "
+                        f"(peak {self.memory[phase].get('peak_rss_mb', 0):.1f} MiB)")
+            self._write()
+
+    def _write(self):
+        if self.job_id is not None:
+            _write_progress(self.job_id, {"phase": self.phase, "timings": self.timings, "memory": self.memory})
+
+class TrainingJobError(Exception):
+    """Failure of a job function, carried back from the training process as a plain message"""
+
+def _run_job(fn: Callable[[str, Dict[str, Any]], Dict[str, Any]], job_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        return fn(job_id, params)
+    except Exception as e:
+        # Exceptions such as HTTPException do not survive unpickling in the parent
+        raise TrainingJobError(getattr(e, "detail", None) or str(e)) from None
+
+class TrainingJobs:
+    """Runs training jobs in a process pool and tracks their state in this process.
+
+    ``fn(job_id, params)`` runs in a child process and returns a result dict;
+    ``on_success(result)`` is called in this process once it finishes, before
+    the job is marked completed.
+    """
+
+    def __init__(self, max_workers: int = TRAINING_WORKERS):
+        self.max_workers = max_workers
+        self._executor = None
+        self._jobs = OrderedDict()
+        self._done = {}
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawn rather than fork: the server process runs threads
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def submit(self, fn: Callable[[str, Dict[str, Any]], Dict[str, Any]], params: Dict[str, Any],
+               on_success: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "queued",
+            "submitted_at": datetime.utcnow().isoformat(),
+            "params": params,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._done[job_id] = threading.Event()
+            self._trim()
+        _write_progress(job_id, {"status": "queued"})
+        future = self._get_executor().submit(_run_job, fn, job_id, params)
+        future.add_done_callback(lambda f: self._finish(job_id, f, on_success))
+        return dict(job)
+
+    def _finish(self, job_id: str, future, on_success):
+        try:
+            result = future.result()
+            on_success(result)
+            update = {"status": "completed", "result": result}
+        except Exception as e:
+            logger.error(f"Training job {job_id} failed: {str(e)}")
+            if isinstance(e, BrokenProcessPool):
+                # A training process died (e.g. OOM-killed); start a fresh pool for the next job
+                self._executor = None
+            update = {"status": "failed", "error": getattr(e, "detail", None) or str(e)}
+        update["finished_at"] = datetime.utcnow().isoformat()
+        # The final state goes to the progress file too, for service workers that did not submit the job
+        _write_progress(job_id, {**(read_progress(job_id) or {}), **update})
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(update)
+            done = self._done.pop(job_id, None)
+        if done is not None:
+            done.set()
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("completed", "failed")]
+        for job_id in finished[:max(len(self._jobs) - MAX_TRACKED_JOBS, 0)]:
+            del self._jobs[job_id]
+            try:
+                os.remove(_progress_path(job_id))
+            except OSError:
+                pass
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until a job has finished and been published, then return its state"""
+        with self._lock:
+            done = self._done.get(job_id)
+        if done is not None:
+            done.wait(timeout)
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job state merged with the training process's latest progress"""
+        with self._lock:
+            job = dict(self._jobs[job_id]) if job_id in self._jobs else None
+        progress = read_progress(job_id)
+        if job is None and progress is None:
+            return None
+        if job is None:
+            # Submitted by another service worker: its state is whatever the progress file records
+            job = {"job_id": job_id, "status": progress.get("status", "running" if progress.get("phase") else "unknown")}
+            for key in ("result", "error", "finished_at"):
+                if key in progress:
+                    job[key] = progress[key]
+        if progress is not None:
+            if job["status"] == "queued" and progress.get("phase"):
+                job["status"] = "running"
+            job["phase"] = progress.get("phase")
+            job["timings"] = progress.get("timings", {})
+            job["memory"] = progress.get("memory", {})
+        return job
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -1,19 +1,34 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Body
+from fastapi import FastAPI, HTTPException, Body, Response
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Tuple
 import pandas as pd
 import os
-import json
-from mlxtend.frequent_patterns import apriori, association_rules, fpgrowth
-from mlxtend.preprocessing import TransactionEncoder
+from mlxtend.frequent_patterns import apriori, fpgrowth
 import numpy as np
 import time
 from datetime import datetime
-import gc
-import traceback
-import sys
+import asyncio
+import threading
 from product_names import product_name_mapper
+from rule_index import RuleIndex, SCORING_MODES, DEFAULT_SCORING_MODE
+from rule_generation import generate_rules, RULE_METRICS
+from rule_store import RuleStore
+from encoding import EncodedBaskets
+from eclat import eclat
+from parallel import parallel_apriori
+from son import son
+from sampling import chernoff_sample_size, sample_baskets, support_intervals, exact_supports
+from condensed import condense, superset_level, ITEMSET_TYPES
+from topk import mine_top_k, select_top_rules, is_exact, TOP_K_TARGETS, TOP_K_METRICS
+from ingest import load_transactions, stream_transactions, CACHE_DIR
+from model_store import save_model, load_model, load_meta, latest_version, new_version
+from jobs import TrainingJobs, ProgressReporter
+from incremental import IncrementalMiner, IncrementalStateError
+from metrics import Histogram, LatencyMiddleware, metric_lines
+from recommendation_cache import RecommendationCache, basket_key
 import logging
 
 # Configure logging
@@ -34,11 +49,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Latency of the serving endpoints, exposed by /metrics
+request_latency = Histogram("mba_request_duration_seconds", "Request latency of the serving endpoints")
+app.add_middleware(LatencyMiddleware, histogram=request_latency)
+
 # Global variables
+# The published model: itemsets, rules, rule index and statistics, replaced as a whole
 model_data = None
-transactions_df = None
-frequent_itemsets = None
-rules = None
+# Phase timings and memory of the last finished training or ingest job
+last_training = None
+# Recommendations of recently seen baskets, emptied whenever a model is published
+recommendation_cache = RecommendationCache()
+# Serializes publishing so an older model never replaces a newer one
+_publish_lock = threading.Lock()
+
+# Seconds between checks of the LATEST pointer for models saved by other workers (0 disables)
+MODEL_POLL_INTERVAL = float(os.environ.get("MODEL_POLL_INTERVAL", 5))
+
+# Dashboard aggregates stored with each model
+DASHBOARD_TOP_N = 5
+MAX_BASKET_SIZE_BUCKET = 20
 
 class TransactionItem(BaseModel):
     item_id: str
@@ -54,280 +84,789 @@ class RecommendationRequest(BaseModel):
     items: List[str]
     min_support: Optional[float] = 0.01
     min_threshold: Optional[float] = 0.5
+    top_n: Optional[int] = 5
+    mode: Optional[str] = DEFAULT_SCORING_MODE
+
+class BatchRecommendationRequest(BaseModel):
+    baskets: List[List[str]]
+    top_n: Optional[int] = 5
+    mode: Optional[str] = DEFAULT_SCORING_MODE
 
 class TrainingRequest(BaseModel):
     min_support: Optional[float] = 0.01
     min_threshold: Optional[float] = 0.5
     use_sample_data: Optional[bool] = True
     max_length: Optional[int] = None
+    algorithm: Optional[str] = "apriori"
+    chunk_size: Optional[int] = None
+    use_cache: Optional[bool] = True
+    workers: Optional[int] = None
+    partitions: Optional[int] = None
+    approximate: Optional[bool] = False
+    relative_error: Optional[float] = 0.25
+    error_probability: Optional[float] = 0.05
+    sample_seed: Optional[int] = None
+    top_k: Optional[int] = None
+    top_k_of: Optional[str] = "itemsets"
+    top_k_by: Optional[str] = "support"
+    rule_metrics: Optional[List[str]] = None
+    itemset_type: Optional[str] = "all"
+    wait: Optional[bool] = False
+
+class IngestRequest(BaseModel):
+    transactions: List[Transaction]
+    decay: Optional[float] = 1.0
+    window: Optional[int] = None
+    wait: Optional[bool] = False
 
 # Helper functions
-def process_transaction_data(header_file: str, detail_file: str, sample_size: Optional[int] = None) -> pd.DataFrame:
-    """Process transaction data from header and detail files"""
+def process_transaction_data(header_file: str, detail_file: str, sample_size: Optional[int] = None) -> EncodedBaskets:
+    """Process transaction data from header and detail files into encoded baskets.
+
+    ``sample_size`` limits the detail rows read; the header is always read in
+    full so no matching line is dropped.
+    """
     try:
-        # Read data files with optional sampling
-        header_df = pd.read_csv(header_file, nrows=sample_size)
-        detail_df = pd.read_csv(detail_file, nrows=sample_size)
-        
-        # Merge datasets on voucher_id
-        merged_df = pd.merge(detail_df, header_df, on='voucher_id', how='inner')
-        
-        # Ensure item_no is a string
-        merged_df['item_no'] = merged_df['item_no'].astype(str)
-        
-        # Group by voucher_id and collect item_no into lists
-        transactions = merged_df.groupby('voucher_id')['item_no'].apply(list).reset_index()
-        
-        return transactions
+        return stream_transactions(header_file, detail_file, max_rows=sample_size)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing data: {str(e)}")
 
-def process_large_transaction_data(header_file, detail_file, chunk_size=100000):
-    """Process large transaction data files in chunks to avoid memory issues"""
-    try:
-        # Process header file - typically smaller, can load at once
-        print(f"Loading header file: {header_file}")
-        header_df = pd.read_csv(header_file)
-        print(f"Header data loaded, shape: {header_df.shape}")
-        
-        # Create empty list to hold transactions
-        transactions_list = []
-        
-        # Process detail file in chunks to reduce memory usage
-        print(f"Processing detail file in chunks of {chunk_size}")
-        
-        # Get total number of rows to track progress
-        total_rows = sum(1 for _ in open(detail_file, 'r')) - 1  # Subtract header row
-        print(f"Total rows in detail file: {total_rows}")
-        
-        # Process in chunks
-        chunks_processed = 0
-        for detail_chunk in pd.read_csv(detail_file, chunksize=chunk_size):
-            # Merge with header data
-            merged_chunk = pd.merge(detail_chunk, header_df, on='voucher_id', how='inner')
-            
-            # Ensure item_no is a string
-            if merged_chunk['item_no'].dtype != 'object':
-                merged_chunk['item_no'] = merged_chunk['item_no'].astype(str)
-            
-            # Group by voucher_id and collect item_no
-            chunk_transactions = merged_chunk.groupby('voucher_id')['item_no'].apply(list).reset_index()
-            
-            # Add to transactions list
-            transactions_list.append(chunk_transactions)
-            
-            # Clean up to free memory
-            del merged_chunk
-            del chunk_transactions
-            del detail_chunk
-            gc.collect()
-            
-            # Update progress
-            chunks_processed += 1
-            print(f"Processed chunk {chunks_processed}, total transactions so far: {sum(len(t) for t in transactions_list)}")
-        
-        # Combine all chunks
-        print("Combining all transaction chunks...")
-        transactions = pd.concat(transactions_list, ignore_index=True)
-        
-        # Clean up memory again
-        del transactions_list
-        del header_df
-        gc.collect()
-        
-        print(f"Final transaction count: {len(transactions)}")
-        return transactions
-    except Exception as e:
-        print(f"Error processing large transaction data: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing large transaction data: {str(e)}")
+def _mine_apriori(baskets: EncodedBaskets, min_support: float, max_length: int) -> pd.DataFrame:
+    return apriori(baskets.to_sparse_frame(), min_support=min_support, use_colnames=True,
+                   max_len=max_length, low_memory=True)
+
+def _mine_fpgrowth(baskets: EncodedBaskets, min_support: float, max_length: int) -> pd.DataFrame:
+    frequent_itemsets = fpgrowth(baskets.to_sparse_frame(), min_support=min_support, use_colnames=True,
+                                 max_len=max_length)
+    # FP-Growth emits itemsets in tree order; use apriori's (length, item order) so
+    # every engine yields the same frame and rule ranking ties break identically
+    order = sorted(range(len(frequent_itemsets)),
+                   key=lambda i: (len(frequent_itemsets['itemsets'].iat[i]),
+                                  sorted(frequent_itemsets['itemsets'].iat[i])))
+    return frequent_itemsets.iloc[order].reset_index(drop=True)
 
-def train_model(transactions: pd.DataFrame, min_support: float = 0.01, max_length: int = 3):
-    """Train market basket analysis model using Apriori algorithm"""
+# Frequent itemset miners selectable through TrainingRequest.algorithm
+MINING_ENGINES = {
+    "apriori": _mine_apriori,
+    "fpgrowth": _mine_fpgrowth,
+    "eclat": eclat,
+    "son": son,
+}
+
+def train_model(baskets: EncodedBaskets, min_support: float = 0.01, max_length: int = 3,
+                algorithm: str = "apriori", workers: Optional[int] = None, partitions: Optional[int] = None):
+    """Train market basket analysis model with the selected frequent itemset miner.
+
+    With ``workers`` > 1 supports are counted over basket shards in parallel
+    instead; every miner finds the same itemsets, so the result is unchanged.
+    The "son" miner splits the baskets into ``partitions`` mined by ``workers``
+    processes (and any SON workers sharing its directory).
+    """
     try:
-        # Prepare transaction data
-        te = TransactionEncoder()
-        te_ary = te.fit(transactions['item_no']).transform(transactions['item_no'])
-        df = pd.DataFrame(te_ary, columns=te.columns_)
-        del te_ary
-        gc.collect()
-        
         # Generate frequent itemsets
-        frequent_itemsets = apriori(
-            df, 
-            min_support=min_support, 
-            use_colnames=True,
-            max_len=max_length
-        )
+        if algorithm == "son":
+            frequent_itemsets = son(baskets, min_support, max_length, partitions=partitions, workers=workers)
+        elif workers is not None and workers > 1:
+            frequent_itemsets = parallel_apriori(baskets, min_support, max_length, workers=workers)
+        else:
+            frequent_itemsets = MINING_ENGINES[algorithm](baskets, min_support, max_length)
         
-        return frequent_itemsets, te.columns_
+        return frequent_itemsets, baskets.items.tolist()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error training model: {str(e)}")
 
-def generate_association_rules(frequent_itemsets, min_threshold=0.5):
-    """Generate association rules from frequent itemsets"""
+def generate_association_rules(frequent_itemsets, min_threshold=0.5, items: Optional[List[str]] = None,
+                               metrics: Optional[List[str]] = None) -> RuleStore:
+    """Generate association rules from frequent itemsets, ranked by confidence and lift"""
     try:
-        rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=min_threshold)
-        return rules.sort_values(['confidence', 'lift'], ascending=[False, False])
+        if items is None:
+            items = sorted({item for itemset in frequent_itemsets['itemsets'] for item in itemset})
+        return generate_rules(frequent_itemsets, items, min_confidence=min_threshold, metrics=metrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating rules: {str(e)}")
 
-def get_recommendations(items, rules, top_n=5):
-    """Get recommendations based on items and rules"""
+def _format_recommendations(rule_ids, index: RuleIndex, basket_codes, top_n, mode):
+    """Score the items recommended by fired rules and format the top ones as recommendation entries"""
+    codes, scores, best_rules, counts = index.recommend(rule_ids, basket_codes, top_n, mode)
+    names = product_name_mapper.decode(index.items, codes)
+    # Metrics are those of the highest-ranked rule recommending the item
+    return [
+        {
+            'item_id': index.items[code],
+            'name': name,
+            'score': score,
+            'confidence': float(index.confidence[rule_id]),
+            'lift': float(index.lift[rule_id]),
+            'support': float(index.support[rule_id]),
+            'rules': count
+        }
+        for code, name, score, rule_id, count in zip(codes.tolist(), names, scores.tolist(), best_rules.tolist(),
+                                                     counts.tolist())
+    ]
+
+def get_recommendations(items, index: RuleIndex, top_n=5, mode=DEFAULT_SCORING_MODE):
+    """Get recommendations based on items and the precompiled rule index.
+
+    Rules fire when all their antecedents are in the basket; each item they
+    recommend is scored over all of them as selected by ``mode``.
+    """
     try:
-        # Filter rules where antecedents contain at least one of the input items
-        matching_rules = []
-        
-        for _, rule in rules.iterrows():
-            antecedents = list(rule['antecedents'])
-            if any(item in antecedents for item in items):
-                consequents = list(rule['consequents'])
-                # Only recommend items that are not in the input list
-                new_items = [item for item in consequents if item not in items]
-                if new_items:
-                    matching_rules.append({
-                        'recommended_items': new_items,
-                        'confidence': rule['confidence'],
-                        'lift': rule['lift'],
-                        'support': rule['support']
-                    })
-        
-        # Sort by confidence and return top recommendations
-        matching_rules = sorted(matching_rules, key=lambda x: (x['confidence'], x['lift']), reverse=True)
-        
-        # Flatten the recommendations
-        recommended_items = []
-        for rule in matching_rules[:top_n]:
-            for item in rule['recommended_items']:
-                if item not in recommended_items and item not in items:
-                    recommended_items.append({
-                        'item_id': item,
-                        'name': product_name_mapper.get_name(item),
-                        'confidence': float(rule['confidence']),
-                        'lift': float(rule['lift']),
-                        'support': float(rule['support'])
-                    })
-        
-        return recommended_items[:top_n]
+        basket_codes = index.basket_codes(items)
+        return _format_recommendations(index.fired_rules(basket_codes), index, basket_codes, top_n, mode)
     except Exception as e:
-        print(f"Error getting recommendations: {str(e)}")
+        logger.exception("Error getting recommendations")
         raise HTTPException(status_code=500, detail=f"Error getting recommendations: {str(e)}")
 
+def get_batch_recommendations(baskets: List[List[str]], index: RuleIndex, top_n=5,
+                              mode=DEFAULT_SCORING_MODE) -> List[List[Dict[str, Any]]]:
+    """Get recommendations for many baskets at once; same results as get_recommendations per basket"""
+    try:
+        rule_ids = index.batch_matching_rules(baskets)
+        return [_format_recommendations(ids, index, index.basket_codes(items), top_n, mode)
+                for items, ids in zip(baskets, rule_ids)]
+    except Exception as e:
+        logger.exception("Error getting batch recommendations")
+        raise HTTPException(status_code=500, detail=f"Error getting batch recommendations: {str(e)}")
+
+def cached_recommendations(items, model: Dict[str, Any], top_n=5, mode=DEFAULT_SCORING_MODE):
+    """get_recommendations for the given model, served from the recommendation cache when possible"""
+    key = basket_key(model["version"], items, top_n, mode)
+    recommendations = recommendation_cache.get(key)
+    if recommendations is None:
+        recommendations = get_recommendations(items, model["rule_index"], top_n, mode)
+        recommendation_cache.put(key, recommendations)
+    return recommendations
+
+def cached_batch_recommendations(baskets: List[List[str]], model: Dict[str, Any], top_n=5,
+                                 mode=DEFAULT_SCORING_MODE) -> List[List[Dict[str, Any]]]:
+    """get_batch_recommendations for the given model, computing only the baskets missing from the cache"""
+    keys = [basket_key(model["version"], items, top_n, mode) for items in baskets]
+    results = [recommendation_cache.get(key) for key in keys]
+    missing = [i for i, recommendations in enumerate(results) if recommendations is None]
+    if missing:
+        computed = get_batch_recommendations([baskets[i] for i in missing], model["rule_index"], top_n=top_n,
+                                             mode=mode)
+        for i, recommendations in zip(missing, computed):
+            results[i] = recommendations
+            recommendation_cache.put(keys[i], recommendations)
+    return results
+
+async def recommend_async(items, model: Dict[str, Any], top_n=5, mode=DEFAULT_SCORING_MODE):
+    """cached_recommendations in the threadpool, so scoring never holds up the event loop"""
+    return await run_in_threadpool(cached_recommendations, items, model, top_n, mode)
+
+def _check_scoring(top_n: Optional[int], mode: Optional[str]):
+    if top_n is None or top_n < 1:
+        raise HTTPException(status_code=400, detail="top_n must be a positive integer")
+    if mode not in SCORING_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown mode '{mode}'. Choose one of: {', '.join(SCORING_MODES)}")
+
 # API Endpoints
+# Per-basket endpoints are async and score in the threadpool; bulk endpoints stay sync and run in it as a whole
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Market Basket Analysis ML Service", "status": "active"}
 
 @app.get("/status")
-def get_status():
-    global model_data, transactions_df, rules, frequent_itemsets
-    
-    # Calculate additional statistics if transaction data is available
-    unique_items_count = 0
-    avg_basket_size = 0
-    avg_basket_value = 0
-    
-    if transactions_df is not None:
-        # Get unique items
-        all_items = []
-        for _, row in transactions_df.iterrows():
-            all_items.extend(row['item_no'])
-        unique_items_count = len(set(all_items))
-        
-        # Calculate average basket size
-        basket_sizes = transactions_df['item_no'].apply(len)
-        avg_basket_size = float(basket_sizes.mean()) if len(basket_sizes) > 0 else 0
-        
-        # Average basket value is estimated (not actual price data in this demo)
-        avg_basket_value = 15.0 * avg_basket_size  # Assuming average price per item
+async def get_status():
+    # Read the published model once; /train swaps it atomically
+    model = model_data
+    
+    # Statistics are computed at training time and stored with the model
+    stats = model["stats"] if model is not None else {}
+    avg_basket_size = stats.get("avg_basket_size", 0)
     
     return {
-        "model_trained": model_data is not None,
-        "transactions_count": len(transactions_df) if transactions_df is not None else 0,
-        "rules_count": len(rules) if rules is not None else 0,
-        "frequent_itemsets_count": len(frequent_itemsets) if frequent_itemsets is not None else 0,
-        "unique_items_count": unique_items_count,
+        "model_trained": model is not None,
+        "model_version": model["version"] if model is not None else None,
+        "last_training_time": model["trained_at"] if model is not None else None,
+        "transactions_count": stats.get("transaction_count", 0),
+        "rules_count": len(model["rules"]) if model is not None else 0,
+        "frequent_itemsets_count": len(model["frequent_itemsets"]) if model is not None else 0,
+        "itemset_type": (model["params"].get("itemset_type") or "all") if model is not None else None,
+        "min_support": model["params"].get("min_support") if model is not None else None,
+        # Lowered threshold an approximate model's sample was mined at
+        "mining_min_support": model["params"].get("mining_min_support") if model is not None else None,
+        "top_k_exact": stats.get("top_k_exact"),
+        "unique_items_count": stats.get("unique_items_count", 0),
         "avg_basket_size": avg_basket_size,
-        "avg_basket_value": avg_basket_value
+        # Average basket value is estimated (not actual price data in this demo)
+        "avg_basket_value": 15.0 * avg_basket_size  # Assuming average price per item
     }
 
-@app.post("/train")
-def train_model_endpoint(request: TrainingRequest = Body(...)):
-    """Train the market basket analysis model"""
-    global model_data, transactions_df, rules, frequent_itemsets
-    
+def _basket_stats(sizes: np.ndarray, n_items: int) -> Dict[str, Any]:
+    """Transaction statistics kept with a model, from its basket sizes and item count"""
+    # Basket counts by size, with everything from MAX_BASKET_SIZE_BUCKET up in the last bucket
+    counts = np.bincount(np.minimum(sizes, MAX_BASKET_SIZE_BUCKET), minlength=1) if len(sizes) > 0 else np.zeros(1, dtype=np.int64)
+    return {
+        "transaction_count": len(sizes),
+        # Every encoded item occurs in at least one basket
+        "unique_items_count": n_items,
+        "avg_basket_size": float(sizes.mean()) if len(sizes) > 0 else 0,
+        "basket_size_distribution": [
+            {
+                "size": f"{size}+" if size == MAX_BASKET_SIZE_BUCKET else str(size),
+                "count": int(count)
+            }
+            for size, count in enumerate(counts) if size > 0
+        ]
+    }
+
+def _dashboard_aggregates(frequent_itemsets: pd.DataFrame, rules: RuleStore, transaction_count: int) -> Dict[str, Any]:
+    """Top products and combinations shown on the dashboard, computed once per model"""
+    # Get top products
+    top_products = []
+    single_items = frequent_itemsets[frequent_itemsets['itemsets'].apply(len) == 1]
+    if not single_items.empty:
+        for _, row in single_items.nlargest(DASHBOARD_TOP_N, 'support').iterrows():
+            item_id = list(row['itemsets'])[0]
+            top_products.append({
+                "id": item_id,
+                "name": product_name_mapper.get_name(item_id),
+                "transactions": int(row['support'] * transaction_count)
+            })
+
+    # Get top combinations
+    top_combinations = []
+    lift = np.asarray(rules['lift'])
+    for rule_id in np.argsort(-lift, kind='stable')[:DASHBOARD_TOP_N]:
+        top_combinations.append({
+            "antecedents": product_name_mapper.decode(rules.items, rules.antecedent_item_codes(rule_id)),
+            "consequents": product_name_mapper.decode(rules.items, rules.consequent_item_codes(rule_id)),
+            "support": float(rules['support'][rule_id]),
+            "confidence": float(rules['confidence'][rule_id]),
+            "lift": float(lift[rule_id])
+        })
+
+    return {"top_products": top_products, "top_combinations": top_combinations}
+
+def _publish_model(model: Dict[str, Any]):
+    """Make a trained or loaded model the one served by the API.
+
+    Handlers read ``model_data`` once per request, so replacing the reference
+    swaps itemsets, rules and index together without blocking readers.
+    """
+    global model_data
+    # Align product names with the item dictionary now rather than on the first request
+    product_name_mapper.names_for_items(model["rule_index"].items)
+    model_data = model
+    recommendation_cache.clear()
+
+def _publish_version(version: str) -> bool:
+    """Load and publish a saved model unless it is already served or LATEST names another one.
+
+    LATEST is replaced by every save, so it names the most recently saved
+    model; an older artifact is never published over it. Itemsets are not
+    decoded: worker processes serve the memory-mapped arrays of the artifact,
+    which the OS shares between them.
+    """
+    current = model_data
+    if (current is not None and current["version"] == version) or latest_version() != version:
+        return False
+    model = load_model(version, decode_itemsets=False)
+    with _publish_lock:
+        current = model_data
+        if (current is not None and current["version"] == version) or latest_version() != version:
+            return False
+        _publish_model(model)
+    return True
+
+@app.on_event("startup")
+def load_latest_model():
+    """Warm start from the latest saved model artifact, if any"""
     try:
-        # Dataset files
-        header_file = "data/Header_comb.csv"
-        detail_file = "data/Detail_comb.csv"
-        
-        if not os.path.exists(header_file) or not os.path.exists(detail_file):
-            raise HTTPException(status_code=404, detail="Data files not found")
+        started = time.perf_counter()
+        version = latest_version()
+        if version is not None and _publish_version(version):
+            logger.info(f"Loaded model {version} in {time.perf_counter() - started:.3f}s")
+    except Exception as e:
+        logger.error(f"Error loading saved model: {str(e)}")
+
+async def _poll_latest_model():
+    """Publish models saved by training jobs of other worker processes"""
+    # A version that failed to load (e.g. an artifact of an older format) is not retried
+    failed = None
+    while True:
+        await asyncio.sleep(MODEL_POLL_INTERVAL)
+        version = None
+        try:
+            version = latest_version()
+            if version is not None and version != failed and await run_in_threadpool(_publish_version, version):
+                logger.info(f"Published model {version} saved by another process")
+        except Exception as e:
+            failed = version
+            logger.error(f"Error polling for new models: {str(e)}")
+
+@app.on_event("startup")
+async def start_model_polling():
+    if MODEL_POLL_INTERVAL > 0:
+        app.state.model_poller = asyncio.create_task(_poll_latest_model())
+
+@app.on_event("shutdown")
+def stop_training_jobs():
+    training_jobs.shutdown()
+
+@app.on_event("shutdown")
+async def stop_model_polling():
+    poller = getattr(app.state, "model_poller", None)
+    if poller is not None:
+        poller.cancel()
+
+# Dataset files
+HEADER_FILE = "data/Header_comb.csv"
+DETAIL_FILE = "data/Detail_comb.csv"
+SAMPLE_ROWS = 500000
+
+def _load_training_baskets(request: TrainingRequest) -> Tuple[EncodedBaskets, bool]:
+    """Integer-encoded baskets from the columnar cache, or streamed from the CSVs"""
+    if not os.path.exists(HEADER_FILE) or not os.path.exists(DETAIL_FILE):
+        raise HTTPException(status_code=404, detail="Data files not found")
+    
+    # Approximate mode draws a random sample from all baskets instead of reading the first rows
+    return load_transactions(
+        HEADER_FILE, DETAIL_FILE,
+        chunk_size=request.chunk_size,
+        max_rows=SAMPLE_ROWS if request.use_sample_data and not request.approximate else None,
+        cache_dir=None if request.use_cache is False else CACHE_DIR
+    )
+
+def _build_model(frequent_itemsets: pd.DataFrame, columns: List[str], params: Dict[str, Any],
+                 stats: Dict[str, Any], progress: ProgressReporter,
+                 supersets: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Generate rules for mined itemsets and save the resulting model artifact"""
+    # Generate association rules and precompile the antecedent index used by /recommend and /simulate
+    all_itemsets = frequent_itemsets
+    with progress.track("rules"):
+        itemset_type = params.get("itemset_type") or "all"
+        if itemset_type == "all":
+            rules = generate_association_rules(frequent_itemsets, min_threshold=params["min_threshold"],
+                                               items=columns, metrics=params.get("rule_metrics"))
+        else:
+            # Only closed or maximal itemsets and the rules generated from them are kept in the model
+            try:
+                frequent_itemsets, rules, stats["condensed"] = condense(
+                    all_itemsets, columns, itemset_type, params["min_threshold"], params.get("rule_metrics"),
+                    supersets=supersets)
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Error condensing itemsets: {str(e)}")
+        if params.get("top_k") and params.get("top_k_of") == "rules":
+            rules = select_top_rules(rules, params["top_k"], params.get("top_k_by") or "support")
+        rule_index = RuleIndex.from_rules(rules)
+    
+    # Store model data, with the statistics served by /status and /dashboard
+    model = {
+        "version": new_version(),
+        "trained_at": datetime.utcnow().isoformat(),
+        "params": params,
+        "stats": stats,
+        "frequent_itemsets": frequent_itemsets,
+        "columns": columns,
+        "transaction_count": stats["transaction_count"],
+        "rules": rules,
+        "rule_index": rule_index,
+        # Top products are the most frequent items, whether or not their singletons were kept
+        "aggregates": _dashboard_aggregates(all_itemsets, rules, stats["transaction_count"])
+    }
+    
+    # The serving process publishes the model by loading this artifact
+    with progress.track("save"):
+        save_model(model)
+    return model
+
+def run_training(job_id: Optional[str], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Train, save and return a summary of a model; runs inside a training process"""
+    request = TrainingRequest(**params)
+    progress = ProgressReporter(job_id)
+    
+    with progress.track("ingest"):
+        transactions, cache_hit = _load_training_baskets(request)
+    
+    # Approximate mode mines a random sample sized by a Chernoff bound, at a lowered threshold
+    # so itemsets at min_support are missed with probability at most error_probability
+    mined, min_support = transactions, request.min_support
+    if request.approximate:
+        with progress.track("sampling"):
+            sample_size = chernoff_sample_size(request.min_support, request.relative_error,
+                                               request.error_probability)
+            mined = sample_baskets(transactions, sample_size, seed=request.sample_seed)
+            # A sample of every basket gives exact supports, so it is mined at the requested threshold
+            if len(mined) < len(transactions):
+                min_support = request.min_support * (1 - request.relative_error)
+        logger.info(f"Mining a sample of {len(mined)} of {len(transactions)} baskets at support {min_support:.6f}")
+    
+    # Train model; top-K mode finds its own min_support, which is recorded with the model
+    with progress.track("mining"):
+        if request.top_k:
+            frequent_itemsets, min_support = mine_top_k(
+                mined, request.top_k,
+                max_len=request.max_length or 3,
+                target=request.top_k_of,
+                metric=request.top_k_by,
+                min_confidence=request.min_threshold
+            )
+            columns = mined.items.tolist()
+        else:
+            frequent_itemsets, columns = train_model(
+                mined, 
+                min_support=min_support,
+                max_length=request.max_length or 3,
+                algorithm=request.algorithm,
+                workers=request.workers,
+                partitions=request.partitions
+            )
+    
+    stats = _basket_stats(transactions.basket_sizes(), transactions.n_items)
+    if request.approximate:
+        stats["sample_size"] = len(mined)
+        frequent_itemsets['support_ci_lower'], frequent_itemsets['support_ci_upper'] = support_intervals(
+            frequent_itemsets['support'], len(mined), len(transactions), request.error_probability)
+        if len(mined) < len(transactions):
+            # The sample's candidates are counted once over all baskets and only those at
+            # min_support are kept; the intervals stay with the sample estimate they bound
+            frequent_itemsets['sample_support'] = frequent_itemsets['support']
+            with progress.track("recount"):
+                frequent_itemsets['support'] = exact_supports(transactions, frequent_itemsets)
+                frequent_itemsets = frequent_itemsets[
+                    frequent_itemsets['support'] >= request.min_support].reset_index(drop=True)
+    
+    # Closed and maximal are decided against supersets too, including those one item past max_length
+    supersets = None
+    if (request.itemset_type or "all") != "all":
+        with progress.track("supersets"):
+            supersets = superset_level(transactions, frequent_itemsets,
+                                       request.min_support if request.approximate else min_support,
+                                       request.max_length or 3)
+    
+    params = request.model_dump()
+    if request.top_k:
+        params["min_support"] = min_support
+        # Top-K rules by lift are re-ranked from a pool of rules, so they may miss some with higher lift
+        stats["top_k_exact"] = is_exact(request.top_k_of, request.top_k_by)
+    elif request.approximate:
+        params["mining_min_support"] = min_support
+    model = _build_model(frequent_itemsets, columns, params, stats, progress, supersets=supersets)
+    rules = model["rules"]
+    
+    # Approximate models report the recount on all baskets next to the sample's mining time
+    timing = f"mining took {progress.timings['mining_seconds']:.2f}s"
+    if "recount_seconds" in progress.timings:
+        timing += f", recount took {progress.timings['recount_seconds']:.2f}s"
+    logger.info(f"Model trained successfully with {len(model['frequent_itemsets'])} itemsets and {len(rules)} rules "
+                f"using {f'top-{request.top_k} {request.top_k_of}' if request.top_k else request.algorithm} ({timing})")
+    
+    return {
+        "model_version": model["version"],
+        "transactions_count": len(transactions),
+        "rules_count": len(rules),
+        "algorithm": request.algorithm,
+        "min_support": params["min_support"],
+        "mining_min_support": min_support,
+        "workers": request.workers or 1,
+        "sample_size": len(mined),
+        "cache_hit": cache_hit,
+        "condensed": stats.get("condensed"),
+        "top_k_exact": stats.get("top_k_exact"),
+        "timings": progress.timings,
+        "memory": progress.memory
+    }
+
+# Incremental updates recount every frequent itemset of the model, which condensed models do not keep
+_CONDENSED_INGEST_ERROR = "Incremental updates need a model trained with itemset_type 'all'"
+
+def run_ingest(job_id: Optional[str], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold new transactions into the latest model and save the result; runs inside a training process"""
+    request = IngestRequest(**params)
+    progress = ProgressReporter(job_id)
+    miner = IncrementalMiner()
+    
+    with miner.lock():
+        with progress.track("ingest"):
+            model = load_model()
+            if model is None:
+                raise HTTPException(status_code=400, detail="Model not trained. Please train the model first.")
+            if (model["params"].get("itemset_type") or "all") != "all":
+                raise HTTPException(status_code=400, detail=_CONDENSED_INGEST_ERROR)
+            try:
+                # The first update after /train retains that model's training baskets
+                miner.open(model, lambda: _load_training_baskets(TrainingRequest(**model["params"]))[0])
+            except IncrementalStateError as e:
+                raise HTTPException(status_code=409, detail=str(e))
+            baskets = EncodedBaskets.from_lists(
+                [item.item_id for item in transaction.items] for transaction in request.transactions)
         
-        # Process transaction data
-        sample_size = 500000 if request.use_sample_data else None
-        transactions_df = process_transaction_data(header_file, detail_file, sample_size)
+        with progress.track("update"):
+            update = miner.update(model, baskets, decay=request.decay, window=request.window)
         
-        # Train model
-        frequent_itemsets, columns = train_model(
-            transactions_df, 
-            min_support=request.min_support,
-            max_length=request.max_length or 3
+        params = dict(model["params"], incremental={
+            "base_version": update["base_version"],
+            "sequence": update["sequence"],
+            "decay": request.decay,
+            "window": request.window
+        })
+        stats = _basket_stats(update["basket_sizes"], len(update["columns"]))
+        stats["weighted_transaction_count"] = update["weighted_transaction_count"]
+        new_model = _build_model(update["frequent_itemsets"], update["columns"], params, stats, progress)
+        miner.commit(new_model["version"])
+    
+    logger.info(f"Model updated with {update['new_transactions']} transactions ({update['mode']}, "
+                f"{update['candidates_counted']} candidates counted): {len(new_model['frequent_itemsets'])} itemsets "
+                f"and {len(new_model['rules'])} rules")
+    
+    return {
+        "model_version": new_model["version"],
+        "transactions_count": stats["transaction_count"],
+        "new_transactions": update["new_transactions"],
+        "evicted_transactions": update["evicted_transactions"],
+        "candidates_counted": update["candidates_counted"],
+        "mode": update["mode"],
+        "rules_count": len(new_model["rules"]),
+        "timings": progress.timings,
+        "memory": progress.memory
+    }
+
+def _publish_trained_model(result: Dict[str, Any]):
+    """Load a finished job's artifact and publish it unless a newer model is already served"""
+    global last_training
+    last_training = {"timings": result.get("timings", {}), "memory": result.get("memory", {})}
+    if not _publish_version(result["model_version"]):
+        logger.info(f"Not publishing model {result['model_version']}, LATEST names {latest_version()}")
+
+training_jobs = TrainingJobs()
+
+@app.post("/train", status_code=202)
+def train_model_endpoint(response: Response, request: TrainingRequest = Body(...)):
+    """Submit a training job; poll /train/{job_id} for progress"""
+    if request.algorithm not in MINING_ENGINES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown algorithm '{request.algorithm}'. Choose one of: {', '.join(MINING_ENGINES)}"
         )
-        
-        # Store model data
-        model_data = {
-            "frequent_itemsets": frequent_itemsets,
-            "columns": columns,
-            "transaction_count": len(transactions_df)
-        }
-        
-        # Generate association rules
-        rules = generate_association_rules(frequent_itemsets, min_threshold=request.min_threshold)
-        
-        print(f"Model trained successfully with {len(frequent_itemsets)} itemsets and {len(rules)} rules")
-        
+    if request.workers is not None and request.workers < 1:
+        raise HTTPException(status_code=400, detail="workers must be at least 1")
+    if request.partitions is not None and request.partitions < 1:
+        raise HTTPException(status_code=400, detail="partitions must be at least 1")
+    if request.approximate and not (0 < (request.relative_error or 0) < 1 and 0 < (request.error_probability or 0) < 1):
+        raise HTTPException(status_code=400, detail="relative_error and error_probability must be in (0, 1)")
+    if request.itemset_type not in ITEMSET_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown itemset_type '{request.itemset_type}'. Choose one of: {', '.join(ITEMSET_TYPES)}"
+        )
+    if request.rule_metrics is not None and not set(request.rule_metrics) <= set(RULE_METRICS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown rule_metrics. Choose from: {', '.join(RULE_METRICS)}"
+        )
+    if request.top_k is not None:
+        if request.top_k < 1:
+            raise HTTPException(status_code=400, detail="top_k must be a positive integer")
+        if request.top_k_of not in TOP_K_TARGETS or request.top_k_by not in TOP_K_METRICS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"top_k_of must be one of: {', '.join(TOP_K_TARGETS)}; "
+                       f"top_k_by one of: {', '.join(TOP_K_METRICS)}"
+            )
+        if request.top_k_by == "lift" and request.top_k_of != "rules":
+            raise HTTPException(status_code=400, detail="top_k_by=lift requires top_k_of=rules")
+        if request.approximate:
+            raise HTTPException(status_code=400, detail="top_k cannot be combined with approximate")
+    
+    try:
+        job = training_jobs.submit(run_training, request.model_dump(), on_success=_publish_trained_model)
+    except Exception as e:
+        logger.exception("Error submitting training job")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not request.wait:
         return {
-            "status": "success",
-            "message": "Model trained successfully",
-            "transactions_count": len(transactions_df),
-            "rules_count": len(rules)
+            "status": "accepted",
+            "message": "Training started",
+            "job_id": job["job_id"]
         }
     
+    # Blocking mode for clients that expect the trained model in the response
+    job = training_jobs.wait(job["job_id"])
+    if job["status"] != "completed":
+        raise HTTPException(status_code=500, detail=job.get("error", "Training failed"))
+    response.status_code = 200
+    return {
+        "status": "success",
+        "message": "Model trained successfully",
+        "job_id": job["job_id"],
+        **job["result"]
+    }
+
+@app.post("/ingest", status_code=202)
+def ingest_transactions(response: Response, request: IngestRequest = Body(...)):
+    """Submit new transactions to update the latest model incrementally; poll /train/{job_id} for progress"""
+    # Checked against the model run_ingest will update, which may be newer than the one served
+    latest = load_meta()
+    if latest is None:
+        raise HTTPException(status_code=400, detail="Model not trained. Please train the model first.")
+    if not request.transactions:
+        raise HTTPException(status_code=400, detail="No transactions to ingest")
+    if (latest["params"].get("itemset_type") or "all") != "all":
+        raise HTTPException(status_code=400, detail=_CONDENSED_INGEST_ERROR)
+    if request.decay is None or not 0 < request.decay <= 1:
+        raise HTTPException(status_code=400, detail="decay must be in (0, 1]")
+    if request.window is not None and request.window < 1:
+        raise HTTPException(status_code=400, detail="window must be a positive number of transactions")
+    
+    try:
+        job = training_jobs.submit(run_ingest, request.model_dump(), on_success=_publish_trained_model)
     except Exception as e:
-        print(f"Error in train_model: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error submitting ingest job")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    if not request.wait:
+        return {
+            "status": "accepted",
+            "message": "Ingest started",
+            "job_id": job["job_id"]
+        }
+    
+    job = training_jobs.wait(job["job_id"])
+    if job["status"] != "completed":
+        raise HTTPException(status_code=500, detail=job.get("error", "Ingest failed"))
+    response.status_code = 200
+    return {
+        "status": "success",
+        "message": "Model updated successfully",
+        "job_id": job["job_id"],
+        **job["result"]
+    }
+
+@app.get("/train/{job_id}")
+def get_training_job(job_id: str):
+    """Training job status, current phase and phase timings"""
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Training job {job_id} not found")
+    return job
+
+# Rule metrics accepted by /rules?sort_by=
+RULE_SORT_METRICS = ('support', 'confidence', 'lift', 'leverage', 'conviction')
+
+def _set_filter(offsets: np.ndarray, codes: np.ndarray, model: Dict[str, Any], min_length: Optional[int],
+                max_length: Optional[int], item: Optional[str], extra_sets=None) -> np.ndarray:
+    """Boolean row mask over item-coded sets by total length and by a contained item ID"""
+    sets = [(offsets, codes)] + (extra_sets or [])
+    lengths = sum(np.diff(set_offsets) for set_offsets, _ in sets)
+    mask = np.ones(len(lengths), dtype=bool)
+    if min_length is not None:
+        mask &= lengths >= min_length
+    if max_length is not None:
+        mask &= lengths <= max_length
+    if item is not None:
+        code = model["rule_index"].item_code(item)
+        contains = np.zeros(len(lengths), dtype=bool)
+        if code is not None:
+            for set_offsets, set_codes in sets:
+                rows = np.repeat(np.arange(len(lengths)), np.diff(set_offsets))
+                contains[rows[set_codes == code]] = True
+        mask &= contains
+    return mask
+
+def _select_rows(mask: np.ndarray, values: Optional[np.ndarray], offset: int,
+                 limit: Optional[int]) -> Tuple[np.ndarray, int]:
+    """Row positions for one page of the rows in ``mask`` and the number of matching rows.
+
+    With ``values`` the rows are ordered by value, highest first (ties and NaN
+    last, in table order); only the top ``offset + limit`` rows are selected with
+    argpartition and sorted. Without ``values`` the table order is kept.
+    """
+    candidates = np.flatnonzero(mask)
+    total = len(candidates)
+    end = total if limit is None else min(offset + limit, total)
+    if offset >= end:
+        return candidates[:0], total
+    if values is None:
+        return candidates[offset:end], total
+
+    keys = -np.asarray(values, dtype=np.float64)[candidates]
+    keys[np.isnan(keys)] = np.inf
+    if end < total:
+        # Everything strictly above the k-th value, then the earliest rows tied with it
+        kth = np.partition(keys, end - 1)[end - 1]
+        above = np.flatnonzero(keys < kth)
+        tied = np.flatnonzero(keys == kth)[:end - len(above)]
+        top = np.concatenate([above, tied])
+    else:
+        top = np.arange(total)
+    top = top[np.lexsort((top, keys[top]))]
+    return candidates[top[offset:end]], total
+
+def _page(total: int, offset: int, limit: Optional[int], count: int) -> Dict[str, Any]:
+    next_offset = offset + count
+    return {
+        "total": total,
+        "offset": offset,
+        "next_offset": next_offset if limit is not None and next_offset < total else None
+    }
+
+def _check_page(offset: int, limit: Optional[int]):
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="offset and limit must not be negative")
 
 @app.get("/frequent-itemsets")
-def get_frequent_itemsets(limit: Optional[int] = None, min_support: Optional[float] = None) -> Dict[str, Any]:
-    """Get frequent itemsets with product names."""
-    global model_data
+def get_frequent_itemsets(limit: Optional[int] = None, min_support: Optional[float] = None, offset: int = 0,
+                          min_length: Optional[int] = None, max_length: Optional[int] = None,
+                          item: Optional[str] = None) -> Dict[str, Any]:
+    """Get frequent itemsets with product names, highest support first.
+
+    Filter by support, itemset length and a contained item ID; page through the
+    results with ``offset``/``limit`` (``next_offset`` is the next page's offset).
+    """
+    model = model_data
     
-    if model_data is None:
+    if model is None:
         raise HTTPException(status_code=400, detail="Model not trained. Please train the model first.")
+    _check_page(offset, limit)
     
     try:
-        # Get frequent itemsets from model_data
-        frequent_itemsets = model_data["frequent_itemsets"]
+        # Get frequent itemsets from the published model
+        frequent_itemsets = model["frequent_itemsets"]
+        arrays = model["set_arrays"]
+        support = frequent_itemsets['support'].to_numpy()
         
-        # Filter by support if needed
+        mask = _set_filter(arrays["itemset_offsets"], arrays["itemset_codes"], model, min_length, max_length, item)
         if min_support is not None:
-            frequent_itemsets = frequent_itemsets[frequent_itemsets['support'] >= min_support]
+            mask &= support >= min_support
+        
+        # Only the requested page is sorted and formatted
+        positions, total = _select_rows(mask, support, offset, limit or None)
+        items = model["rule_index"].items
+        itemset_offsets, itemset_codes = arrays["itemset_offsets"], arrays["itemset_codes"]
+        ci_lower = ci_upper = None
+        sample_support = None
+        if 'support_ci_lower' in frequent_itemsets.columns:
+            ci_lower = frequent_itemsets['support_ci_lower'].to_numpy()
+            ci_upper = frequent_itemsets['support_ci_upper'].to_numpy()
+        if 'sample_support' in frequent_itemsets.columns:
+            sample_support = frequent_itemsets['sample_support'].to_numpy()
         
         # Format itemsets with product names
         formatted_itemsets = []
-        for _, row in frequent_itemsets.sort_values('support', ascending=False).head(limit or len(frequent_itemsets)).iterrows():
+        for position in positions:
             try:
-                itemset_products = list(row['itemsets'])
+                codes = itemset_codes[itemset_offsets[position]:itemset_offsets[position + 1]]
+                product_names = product_name_mapper.decode(items, codes)
                 formatted_itemset = {
-                    'itemset': itemset_products,  # Keep original IDs
-                    'product_names': product_name_mapper.get_names_batch(itemset_products),  # Add names
-                    'support': float(row['support'])
+                    'itemset': items[codes].tolist(),  # Keep original IDs
+                    'product_names': product_names,  # Add names
+                    'support': float(support[position])
                 }
                 
                 # For single-item sets, add name for top products display
-                if len(itemset_products) == 1:
-                    formatted_itemset['name'] = product_name_mapper.get_name(itemset_products[0])
+                if len(product_names) == 1:
+                    formatted_itemset['name'] = product_names[0]
+                
+                # Models mined on a sample carry confidence intervals on the sample's support
+                # estimate; when supports were recounted on all baskets the estimate is kept too
+                if ci_lower is not None:
+                    formatted_itemset['support_ci'] = [float(ci_lower[position]), float(ci_upper[position])]
+                if sample_support is not None:
+                    formatted_itemset['sample_support'] = float(sample_support[position])
                 
                 formatted_itemsets.append(formatted_itemset)
             except Exception as item_error:
@@ -336,7 +875,8 @@ def get_frequent_itemsets(limit: Optional[int] = None, min_support: Optional[flo
         
         return {
             "status": "success",
-            "frequent_itemsets": formatted_itemsets
+            "frequent_itemsets": formatted_itemsets,
+            **_page(total, offset, limit or None, len(positions))
         }
     except Exception as e:
         logger.error(f"Error getting frequent itemsets: {str(e)}")
@@ -349,33 +889,52 @@ def get_frequent_itemsets(limit: Optional[int] = None, min_support: Optional[flo
         )
 
 @app.get("/rules")
-def get_rules(limit: Optional[int] = None, min_confidence: Optional[float] = None, min_lift: Optional[float] = None) -> Dict[str, Any]:
-    """Get association rules with product names."""
-    global model_data, rules
+def get_rules(limit: Optional[int] = None, min_confidence: Optional[float] = None, min_lift: Optional[float] = None,
+              offset: int = 0, sort_by: Optional[str] = None, min_length: Optional[int] = None,
+              max_length: Optional[int] = None, item: Optional[str] = None) -> Dict[str, Any]:
+    """Get association rules with product names.
+
+    Rules keep their ranking order unless ``sort_by`` names a metric to rank by
+    (highest first). Filter by confidence, lift, rule length (antecedents plus
+    consequents) and a contained item ID; page with ``offset``/``limit``.
+    """
+    model = model_data
     
-    if model_data is None or rules is None:
+    if model is None:
         raise HTTPException(status_code=400, detail="Model not trained. Please train the model first.")
+    _check_page(offset, limit)
+    
+    rules = model["rules"]
+    if sort_by is not None and (sort_by not in RULE_SORT_METRICS or sort_by not in rules.columns):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown sort_by '{sort_by}'. Choose one of: "
+                   f"{', '.join(m for m in RULE_SORT_METRICS if m in rules.columns)}"
+        )
     
     try:
-        # Filter rules based on confidence and lift
-        filtered_rules = rules[
-            (rules['confidence'] >= min_confidence if min_confidence is not None else True) &
-            (rules['lift'] >= min_lift if min_lift is not None else True)
-        ]
+        # Filter rules based on confidence, lift, length and item
+        mask = _set_filter(rules.antecedent_offsets, rules.antecedent_codes, model, min_length, max_length,
+                           item, extra_sets=[(rules.consequent_offsets, rules.consequent_codes)])
+        if min_confidence is not None:
+            mask &= rules['confidence'] >= min_confidence
+        if min_lift is not None:
+            mask &= rules['lift'] >= min_lift
+        
+        # Only the requested page is ranked and formatted
+        values = rules[sort_by] if sort_by is not None else None
+        positions, total = _select_rows(mask, values, offset, limit or None)
         
         # Format rules with product names
         formatted_rules = []
-        for _, rule in filtered_rules.iterrows():
+        for rule_id in positions:
             try:
-                antecedents = list(rule['antecedents'])
-                consequents = list(rule['consequents'])
-                
                 formatted_rule = {
-                    'antecedents': product_name_mapper.get_names_batch(antecedents),  # Use names directly
-                    'consequents': product_name_mapper.get_names_batch(consequents),  # Use names directly
-                    'support': float(rule['support']),
-                    'confidence': float(rule['confidence']),
-                    'lift': float(rule['lift'])
+                    'antecedents': product_name_mapper.decode(rules.items, rules.antecedent_item_codes(rule_id)),  # Use names directly
+                    'consequents': product_name_mapper.decode(rules.items, rules.consequent_item_codes(rule_id)),  # Use names directly
+                    'support': float(rules['support'][rule_id]),
+                    'confidence': float(rules['confidence'][rule_id]),
+                    'lift': float(rules['lift'][rule_id])
                 }
                 
                 formatted_rules.append(formatted_rule)
@@ -383,12 +942,10 @@ def get_rules(limit: Optional[int] = None, min_confidence: Optional[float] = Non
                 logger.error(f"Error formatting rule: {str(rule_error)}")
                 continue  # Skip problematic rule
         
-        if limit:
-            formatted_rules = formatted_rules[:limit]
-        
         return {
             "status": "success",
-            "rules": formatted_rules
+            "rules": formatted_rules,
+            **_page(total, offset, limit or None, len(positions))
         }
     except Exception as e:
         logger.error(f"Error getting rules: {str(e)}")
@@ -401,25 +958,31 @@ def get_rules(limit: Optional[int] = None, min_confidence: Optional[float] = Non
         )
 
 @app.post("/recommend")
-def get_item_recommendations(request: RecommendationRequest):
-    """Get product recommendations with names."""
-    global model_data, rules
+async def get_item_recommendations(request: RecommendationRequest):
+    """Get product recommendations with names.
+
+    ``top_n`` items are returned, scored over all rules whose antecedents are
+    in the basket by ``mode``: max (best confidence), noisy_or or lift_sum.
+    """
+    model = model_data
     
-    if model_data is None or rules is None:
+    if model is None:
         raise HTTPException(status_code=400, detail="Model not trained. Please train the model first.")
+    _check_scoring(request.top_n, request.mode)
     
     try:
         # Get recommendations
         recommendations = []
         try:
-            raw_recommendations = get_recommendations(request.items, rules)
+            raw_recommendations = await recommend_async(request.items, model, request.top_n, request.mode)
             
             # Add product names to recommendations
             for rec in raw_recommendations:
                 try:
                     recommendations.append({
                         'id': rec['item_id'],
-                        'name': product_name_mapper.get_name(rec['item_id']),
+                        'name': rec['name'],
+                        'score': rec['score'],
                         'confidence': float(rec['confidence']),
                         'lift': float(rec['lift']),
                         'support': float(rec['support'])
@@ -447,19 +1010,53 @@ def get_item_recommendations(request: RecommendationRequest):
             }
         )
 
+@app.post("/recommend/batch")
+def get_batch_item_recommendations(request: BatchRecommendationRequest):
+    """Get product recommendations for many baskets in one call."""
+    model = model_data
+    
+    if model is None:
+        raise HTTPException(status_code=400, detail="Model not trained. Please train the model first.")
+    
+    _check_scoring(request.top_n, request.mode)
+    
+    batch = cached_batch_recommendations(request.baskets, model, top_n=request.top_n, mode=request.mode)
+    
+    return {
+        "status": "success",
+        "results": [
+            {
+                "input_items": items,
+                "recommendations": [
+                    {
+                        'id': rec['item_id'],
+                        'name': rec['name'],
+                        'score': rec['score'],
+                        'confidence': rec['confidence'],
+                        'lift': rec['lift'],
+                        'support': rec['support']
+                    }
+                    for rec in recommendations
+                ]
+            }
+            for items, recommendations in zip(request.baskets, batch)
+        ]
+    }
+
 @app.post("/simulate")
-def simulate_transaction(transaction: Transaction):
-    global model_data, rules
+async def simulate_transaction(transaction: Transaction, top_n: int = 5, mode: str = DEFAULT_SCORING_MODE):
+    model = model_data
     
     # Check if model is trained
-    if model_data is None or rules is None:
+    if model is None:
         raise HTTPException(status_code=400, detail="Model not trained. Please train the model first.")
+    _check_scoring(top_n, mode)
     
     # Extract item IDs
     item_ids = [item.item_id for item in transaction.items]
     
     # Get recommendations
-    recommendations = get_recommendations(item_ids, rules)
+    recommendations = await recommend_async(item_ids, model, top_n, mode)
     
     return {
         "status": "success",
@@ -468,11 +1065,47 @@ def simulate_transaction(transaction: Transaction):
         "recommendations": recommendations
     }
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Serving latency, model size and age, cache hit rates and the last training run in the Prometheus text format"""
+    model = model_data
+    lines = request_latency.lines()
+    lines += metric_lines("mba_model_loaded", "gauge", "Whether a model is being served", [({}, model is not None)])
+    if model is not None:
+        age = (datetime.utcnow() - datetime.fromisoformat(model["trained_at"])).total_seconds()
+        lines += metric_lines("mba_model_info", "gauge", "Version of the served model", [({"version": model["version"]}, 1)])
+        lines += metric_lines("mba_model_age_seconds", "gauge", "Seconds since the served model was trained", [({}, age)])
+        lines += metric_lines("mba_model_rules", "gauge", "Association rules in the served model", [({}, len(model["rules"]))])
+        lines += metric_lines("mba_model_frequent_itemsets", "gauge", "Frequent itemsets in the served model",
+                              [({}, len(model["frequent_itemsets"]))])
+        lines += metric_lines("mba_model_transactions", "gauge", "Transactions the served model was trained on",
+                              [({}, model["stats"]["transaction_count"])])
+    if last_training is not None:
+        lines += metric_lines("mba_training_phase_seconds", "gauge", "Duration of each phase of the last training job",
+                              [({"phase": name[:-len("_seconds")]}, value) for name, value in last_training["timings"].items()])
+        lines += metric_lines("mba_training_phase_peak_rss_bytes", "gauge", "Peak RSS during each phase of the last training job",
+                              [({"phase": phase}, usage["peak_rss_mb"] * 1024 * 1024)
+                               for phase, usage in last_training["memory"].items() if "peak_rss_mb" in usage])
+    cache = recommendation_cache.stats()
+    lines += metric_lines("mba_recommendation_cache_hits_total", "counter", "Recommendation cache hits",
+                          [({}, cache["hits"])])
+    lines += metric_lines("mba_recommendation_cache_misses_total", "counter", "Recommendation cache misses",
+                          [({}, cache["misses"])])
+    lines += metric_lines("mba_recommendation_cache_evictions_total", "counter", "Entries evicted from the recommendation cache",
+                          [({}, cache["evictions"])])
+    lines += metric_lines("mba_recommendation_cache_entries", "gauge", "Baskets in the recommendation cache",
+                          [({}, cache["entries"])])
+    names = product_name_mapper.stats()
+    lines += metric_lines("mba_product_name_misses_total", "counter", "Product IDs without a known name",
+                          [({}, names["misses"])])
+    return "\n".join(lines) + "\n"
+
 @app.get("/dashboard")
 async def get_dashboard_data():
     """Get dashboard data including metrics and top products/combinations."""
     try:
-        if transactions_df is None or frequent_itemsets is None or rules is None:
+        model = model_data
+        if model is None:
             return {
                 "status": "success",
                 "data": {
@@ -483,53 +1116,28 @@ async def get_dashboard_data():
                         "avg_basket_value": 0
                     },
                     "top_products": [],
-                    "top_combinations": []
+                    "top_combinations": [],
+                    "basket_size_distribution": []
                 }
             }
 
-        # Calculate basic metrics
+        # Statistics and top lists are computed at training time and stored with the model
+        stats = model["stats"]
+        aggregates = model["aggregates"]
         metrics = {
-            "total_transactions": len(transactions_df),
-            "unique_products": len(pd.unique(transactions_df['item_no'].explode())),
-            "avg_basket_size": transactions_df['item_no'].apply(len).mean(),
-            "avg_basket_value": transactions_df['quantity'].sum() if 'quantity' in transactions_df else 0
+            "total_transactions": stats["transaction_count"],
+            "unique_products": stats["unique_items_count"],
+            "avg_basket_size": stats["avg_basket_size"],
+            "avg_basket_value": 0  # Quantities are not kept on the encoded baskets
         }
 
-        # Get top products
-        top_products = []
-        single_items = frequent_itemsets[frequent_itemsets['itemsets'].apply(len) == 1]
-        if not single_items.empty:
-            for _, row in single_items.nlargest(5, 'support').iterrows():
-                item_id = list(row['itemsets'])[0]
-                product_name = product_name_mapper.get_name(item_id)
-                transactions = int(row['support'] * len(transactions_df))
-                top_products.append({
-                    "id": item_id,
-                    "name": product_name,
-                    "transactions": transactions
-                })
-
-        # Get top combinations
-        top_combinations = []
-        if not rules.empty:
-            for _, rule in rules.nlargest(5, 'lift').iterrows():
-                antecedents = [product_name_mapper.get_name(pid) for pid in rule['antecedents']]
-                consequents = [product_name_mapper.get_name(pid) for pid in rule['consequents']]
-                
-                top_combinations.append({
-                    "antecedents": antecedents,
-                    "consequents": consequents,
-                    "support": rule['support'],
-                    "confidence": rule['confidence'],
-                    "lift": rule['lift']
-                })
-
         return {
             "status": "success",
             "data": {
                 "metrics": metrics,
-                "top_products": top_products,
-                "top_combinations": top_combinations
+                "top_products": aggregates["top_products"],
+                "top_combinations": aggregates["top_combinations"],
+                "basket_size_distribution": stats.get("basket_size_distribution", [])
             }
         }
 
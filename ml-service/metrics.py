@@ -0,0 +1,79 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import bisect
+import os
+import threading
+import time
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Endpoints whose latency is recorded
+METRICS_ENDPOINTS = tuple(os.environ.get("METRICS_ENDPOINTS", "/recommend,/recommend/batch,/simulate,/rules").split(","))
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+def metric_lines(name: str, kind: str, help_text: str,
+                 samples: Iterable[Tuple[Dict[str, str], float]]) -> List[str]:
+    """A metric family in the Prometheus text exposition format"""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{name}{_labels(labels)} {_format_value(value)}" for labels, value in samples)
+    return lines
+
+class Histogram:
+    """Cumulative latency histogram per endpoint, safe to update from handler threads"""
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, endpoint: str, seconds: float):
+        with self._lock:
+            series = self._series.get(endpoint)
+            if series is None:
+                # Bucket counts (the last one for +Inf), sum and count
+                series = self._series[endpoint] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, seconds)] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def lines(self) -> List[str]:
+        with self._lock:
+            series = {endpoint: (list(counts), total, count) for endpoint, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for endpoint, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels({'endpoint': endpoint, 'le': _format_value(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels({'endpoint': endpoint})} {total!r}")
+            lines.append(f"{self.name}_count{_labels({'endpoint': endpoint})} {count}")
+        return lines
+
+class LatencyMiddleware:
+    """ASGI middleware recording the latency of requests to ``paths`` in ``histogram``"""
+
+    def __init__(self, app, histogram: Histogram, paths: Optional[Sequence[str]] = None):
+        self.app = app
+        self.histogram = histogram
+        self.paths = frozenset(METRICS_ENDPOINTS if paths is None else paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.histogram.observe(scope["path"], time.perf_counter() - started)
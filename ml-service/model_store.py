@@ -0,0 +1,189 @@
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import os
+import json
+import shutil
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime
+from rule_index import RuleIndex
+from rule_store import RuleStore
+
+logger = logging.getLogger(__name__)
+
+# Versioned model artifacts live in MODEL_DIR/<version>/, LATEST names the one to serve
+MODEL_DIR = os.environ.get("MODEL_DIR", "data/models")
+KEEP_VERSIONS = int(os.environ.get("MODEL_KEEP_VERSIONS", 3))
+LATEST_FILE = "LATEST"
+# Layout of the artifacts written by save_model; load_model refuses artifacts of any other format
+MODEL_FORMAT = 1
+
+_last_version_ns = 0
+_version_lock = threading.Lock()
+
+def new_version() -> str:
+    """Unique model version string: UTC time to the nanosecond and a random suffix.
+
+    Versions strictly increase within a process and sort in creation order
+    across processes. The served model is the one named by LATEST, not the
+    highest version.
+    """
+    global _last_version_ns
+    with _version_lock:
+        _last_version_ns = max(time.time_ns(), _last_version_ns + 1)
+        seconds, nanoseconds = divmod(_last_version_ns, 1000000000)
+    return f"{datetime.utcfromtimestamp(seconds).strftime('%Y%m%dT%H%M%S')}{nanoseconds:09d}-{uuid.uuid4().hex[:6]}"
+
+def _encode_sets(sets, codes: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """CSR offsets and sorted item codes for a sequence of item ID sets"""
+    offsets = np.zeros(len(sets) + 1, dtype=np.int64)
+    flat = []
+    for i, itemset in enumerate(sets):
+        flat.extend(sorted(codes[item] for item in itemset))
+        offsets[i + 1] = len(flat)
+    return offsets, np.array(flat, dtype=np.int32)
+
+def _decode_sets(offsets: np.ndarray, set_codes: np.ndarray, items: np.ndarray) -> List[frozenset]:
+    return [frozenset(items[set_codes[offsets[i]:offsets[i + 1]]]) for i in range(len(offsets) - 1)]
+
+def _save_array(path: str, name: str, array: np.ndarray):
+    np.save(os.path.join(path, f"{name}.npy"), array)
+
+def _load_array(path: str, name: str, mmap: bool) -> np.ndarray:
+    return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+
+def save_model(model: Dict[str, Any], model_dir: str = MODEL_DIR) -> str:
+    """Write a model artifact for ``model`` and make it the latest version.
+
+    The artifact holds the item dictionary, the frequent itemsets as
+    integer-coded CSR arrays with their metric columns, the rule store and the
+    rule index postings, and a meta.json with the training parameters,
+    statistics and dashboard aggregates.
+    """
+    version = model["version"]
+    items = np.asarray(model["columns"], dtype=object)
+    codes = {item: code for code, item in enumerate(items)}
+    frequent_itemsets = model["frequent_itemsets"]
+    rules = model["rules"]
+    itemset_columns = [c for c in frequent_itemsets.columns if c not in ('support', 'itemsets')]
+
+    path = os.path.join(model_dir, version)
+    staging = f"{path}.tmp-{os.getpid()}"
+    os.makedirs(staging, exist_ok=True)
+    try:
+        with open(os.path.join(staging, "items.json"), "w") as f:
+            json.dump([str(item) for item in items], f)
+
+        offsets, set_codes = _encode_sets(frequent_itemsets['itemsets'], codes)
+        _save_array(staging, "itemset_offsets", offsets)
+        _save_array(staging, "itemset_codes", set_codes)
+        _save_array(staging, "itemset_support", frequent_itemsets['support'].to_numpy(dtype=np.float64))
+        if itemset_columns:
+            _save_array(staging, "itemset_metrics", frequent_itemsets[itemset_columns].to_numpy(dtype=np.float64))
+
+        rules.save(os.path.join(staging, "rules"))
+        model["rule_index"].save(os.path.join(staging, "index"))
+
+        meta = {
+            "format": MODEL_FORMAT,
+            "version": version,
+            "trained_at": model["trained_at"],
+            "params": model["params"],
+            "stats": model["stats"],
+            "aggregates": model["aggregates"],
+            "itemset_metric_columns": itemset_columns,
+        }
+        with open(os.path.join(staging, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=2)
+
+        os.replace(staging, path)
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    # Point LATEST at the new version atomically
+    latest_tmp = os.path.join(model_dir, f"{LATEST_FILE}.tmp-{os.getpid()}")
+    with open(latest_tmp, "w") as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(model_dir, LATEST_FILE))
+
+    _prune_versions(model_dir, keep=version)
+    logger.info(f"Saved model {version} to {path}")
+    return version
+
+def _prune_versions(model_dir: str, keep: str):
+    versions = sorted(name for name in os.listdir(model_dir)
+                      if os.path.isdir(os.path.join(model_dir, name)) and ".tmp-" not in name)
+    for name in versions[:-KEEP_VERSIONS] if KEEP_VERSIONS > 0 else []:
+        if name != keep:
+            shutil.rmtree(os.path.join(model_dir, name), ignore_errors=True)
+
+def latest_version(model_dir: str = MODEL_DIR) -> Optional[str]:
+    """Version named by the LATEST pointer, or None if no model has been saved"""
+    try:
+        with open(os.path.join(model_dir, LATEST_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def load_meta(version: Optional[str] = None, model_dir: str = MODEL_DIR) -> Optional[Dict[str, Any]]:
+    """meta.json of a model artifact (the latest one by default), or None if there is no saved model"""
+    version = version or latest_version(model_dir)
+    if version is None:
+        return None
+    with open(os.path.join(model_dir, version, "meta.json")) as f:
+        return json.load(f)
+
+def load_model(version: Optional[str] = None, model_dir: str = MODEL_DIR, mmap: bool = True,
+               decode_itemsets: bool = True) -> Optional[Dict[str, Any]]:
+    """Load a model artifact (the latest one by default), memory-mapping its arrays.
+
+    With ``decode_itemsets`` False the frequent itemsets frame has no
+    'itemsets' column of frozensets; serving reads itemsets from the
+    memory-mapped ``set_arrays``, which worker processes share through the page
+    cache. Returns None when there is no saved model.
+    """
+    version = version or latest_version(model_dir)
+    if version is None:
+        return None
+    path = os.path.join(model_dir, version)
+
+    meta = load_meta(version, model_dir)
+    if meta.get("format") != MODEL_FORMAT:
+        raise ValueError(f"Model {version} has artifact format {meta.get('format')}, expected {MODEL_FORMAT}; "
+                         f"retrain it")
+    with open(os.path.join(path, "items.json")) as f:
+        items = np.array(json.load(f), dtype=object)
+
+    # Item-coded CSR arrays of itemsets, used for vectorized filtering
+    set_arrays = {name: _load_array(path, name, mmap) for name in ("itemset_offsets", "itemset_codes")}
+
+    frequent_itemsets = pd.DataFrame({'support': np.array(_load_array(path, "itemset_support", mmap))})
+    if decode_itemsets:
+        frequent_itemsets['itemsets'] = pd.Series(
+            _decode_sets(set_arrays["itemset_offsets"], set_arrays["itemset_codes"], items), dtype=object)
+
+    itemset_columns = meta["itemset_metric_columns"]
+    if itemset_columns:
+        itemset_metrics = _load_array(path, "itemset_metrics", mmap)
+        for i, column in enumerate(itemset_columns):
+            frequent_itemsets[column] = np.array(itemset_metrics[:, i])
+
+    rules = RuleStore.load(os.path.join(path, "rules"), items, mmap=mmap)
+
+    return {
+        "version": meta["version"],
+        "trained_at": meta["trained_at"],
+        "params": meta["params"],
+        "stats": meta["stats"],
+        "aggregates": meta["aggregates"],
+        "columns": items.tolist(),
+        "frequent_itemsets": frequent_itemsets,
+        "rules": rules,
+        "rule_index": RuleIndex.load(os.path.join(path, "index"), rules, mmap=mmap),
+        "set_arrays": set_arrays,
+        "transaction_count": meta["stats"]["transaction_count"],
+    }
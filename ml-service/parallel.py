@@ -0,0 +1,126 @@
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import multiprocessing
+import numpy as np
+import pandas as pd
+import logging
+from encoding import EncodedBaskets
+from eclat import tid_bitsets, count_itemsets, generate_candidates
+
+logger = logging.getLogger(__name__)
+
+# Per worker process: TID bitsets of the frequent items for the last shard it counted
+_shard_cache = {}
+
+def _share(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, Dict[str, Any]]:
+    """Copy an array into a new shared memory block; returns the block and how to attach to it"""
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+    return block, {"name": block.name, "shape": array.shape, "dtype": array.dtype.str}
+
+def _attach(spec: Dict[str, Any]) -> Tuple[shared_memory.SharedMemory, np.ndarray]:
+    block = shared_memory.SharedMemory(name=spec["name"])
+    return block, np.ndarray(spec["shape"], dtype=np.dtype(spec["dtype"]), buffer=block.buf)
+
+def _build_shard_bitsets(shard: Dict[str, Any]) -> np.ndarray:
+    blocks = []
+    try:
+        block, offsets = _attach(shard["offsets"])
+        blocks.append(block)
+        block, codes = _attach(shard["codes"])
+        blocks.append(block)
+        block, frequent = _attach(shard["frequent"])
+        blocks.append(block)
+        offsets = np.array(offsets[shard["start"]:shard["end"] + 1])
+        baskets = EncodedBaskets(offsets - offsets[0], codes[offsets[0]:offsets[-1]],
+                                 np.empty(shard["n_items"], dtype=object))
+        bitsets = tid_bitsets(baskets, np.array(frequent))
+        # Views into the shared blocks must be gone before they are closed
+        del baskets, codes, frequent
+        return bitsets
+    finally:
+        for block in blocks:
+            block.close()
+
+def _shard_bitsets(shard: Dict[str, Any]) -> np.ndarray:
+    """TID bitsets of the frequent items over one shard, reused while a worker keeps getting the same shard"""
+    key = (shard["codes"]["name"], shard["start"], shard["frequent"]["name"])
+    if key not in _shard_cache:
+        _shard_cache.clear()
+        _shard_cache[key] = _build_shard_bitsets(shard)
+    return _shard_cache[key]
+
+def _count_item_shard(shard: Dict[str, Any]) -> np.ndarray:
+    """Number of baskets in the shard containing each item"""
+    block, offsets = _attach(shard["offsets"])
+    codes_block, codes = _attach(shard["codes"])
+    try:
+        start, end = offsets[shard["start"]], offsets[shard["end"]]
+        return np.bincount(codes[start:end], minlength=shard["n_items"])
+    finally:
+        del offsets, codes
+        block.close()
+        codes_block.close()
+
+def _count_candidate_shard(shard: Dict[str, Any], candidates: np.ndarray) -> np.ndarray:
+    """Number of baskets in the shard containing each candidate (rows of frequent item positions)"""
+    return count_itemsets(_shard_bitsets(shard), candidates)
+
+def parallel_apriori(baskets: EncodedBaskets, min_support: float, max_len: Optional[int] = None,
+                     workers: int = 2) -> pd.DataFrame:
+    """Level-wise mining with support counting split across ``workers`` processes.
+
+    The baskets are copied once into shared memory and split into one shard
+    per worker. Each level's candidates are generated here, counted per shard
+    with TID bitsets in the pool, and the shard counts are summed, so the
+    result is exactly apriori's: same itemsets, supports and order.
+    """
+    n_transactions = baskets.n_transactions
+    found_codes, found_counts = [], []
+    blocks = []
+    try:
+        offsets_block, offsets_spec = _share(np.ascontiguousarray(baskets.offsets, dtype=np.int64))
+        blocks.append(offsets_block)
+        codes_block, codes_spec = _share(np.ascontiguousarray(baskets.codes, dtype=np.int32))
+        blocks.append(codes_block)
+        bounds = np.linspace(0, n_transactions, workers + 1).astype(np.int64)
+        shards = [{"offsets": offsets_spec, "codes": codes_spec, "n_items": baskets.n_items,
+                   "start": int(start), "end": int(end)}
+                  for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            item_counts = sum(pool.map(_count_item_shard, shards), np.zeros(baskets.n_items, dtype=np.int64))
+            frequent_items = np.flatnonzero(item_counts / max(n_transactions, 1) >= min_support)
+            found_codes = [(int(code),) for code in frequent_items]
+            found_counts = [int(item_counts[code]) for code in frequent_items]
+
+            frequent_block, frequent_spec = _share(frequent_items.astype(np.int32))
+            blocks.append(frequent_block)
+            for shard in shards:
+                shard["frequent"] = frequent_spec
+            positions = {int(code): position for position, code in enumerate(frequent_items)}
+
+            level = found_codes
+            while level and (max_len is None or len(level[0]) < max_len):
+                candidates = generate_candidates(level)
+                if not candidates:
+                    break
+                rows = np.array([[positions[code] for code in candidate] for candidate in candidates],
+                                dtype=np.int64)
+                counts = sum(pool.map(_count_candidate_shard, shards, [rows] * len(shards)))
+                keep = np.flatnonzero(counts / n_transactions >= min_support)
+                level = [candidates[i] for i in keep]
+                found_codes.extend(level)
+                found_counts.extend(int(counts[i]) for i in keep)
+                logger.info(f"Level {len(candidates[0])}: {len(level)} of {len(candidates)} candidates frequent")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    items = baskets.items
+    return pd.DataFrame({
+        'support': np.array(found_counts, dtype=np.int64) / max(n_transactions, 1),
+        'itemsets': pd.Series([frozenset(items[list(codes)]) for codes in found_codes], dtype=object),
+    })
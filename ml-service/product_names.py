@@ -1,74 +1,96 @@
-import pandas as pd
+import numpy as np
+import csv
 import logging
 import os
-from pathlib import Path
+import threading
+from typing import Dict, List, Optional, Sequence
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Code lists up to this length are decoded with plain list indexing
+_SHORT_DECODE = 16
+
 class ProductNameMapper:
+    """Product ID to name lookup, loaded on first use.
+
+    Besides lookups by ID, names can be decoded straight from a model's item
+    codes through a names array aligned with its item dictionary. Unknown IDs
+    fall back to the ID itself and are counted in ``misses`` rather than logged.
+    """
+
     def __init__(self, csv_path='data/productname.csv'):
         self.csv_path = csv_path
-        self._mapping = {}
-        self._load_mapping()
+        self._mapping = None
+        self._lock = threading.Lock()
+        # Names and misses aligned with the last item dictionary decoded, replaced as a whole
+        self._aligned = (None,)
+        # Request threads count misses concurrently; += on an attribute is not atomic
+        self._misses_lock = threading.Lock()
+        self.misses = 0
+
+    def _find_csv(self) -> Optional[str]:
+        # Try different possible paths
+        paths_to_try = [
+            self.csv_path,
+            f"/app/{self.csv_path}",
+            "/mnt/data/productname.csv"
+        ]
+        for path in paths_to_try:
+            if os.path.exists(path):
+                return path
+        logger.error(f"Product name CSV not found in any of these locations: {paths_to_try}")
+        return None
 
-    def _load_mapping(self):
+    def _load_mapping(self) -> Dict[str, str]:
         """Load product ID to name mapping from CSV file."""
+        csv_path = self._find_csv()
+        if csv_path is None:
+            return {}
         try:
-            # Try different possible paths
-            paths_to_try = [
-                self.csv_path,
-                f"/app/{self.csv_path}",
-                "/mnt/data/productname.csv"
-            ]
-
-            csv_path = None
-            for path in paths_to_try:
-                if os.path.exists(path):
-                    csv_path = path
-                    break
-
-            if csv_path is None:
-                logger.error(f"Product name CSV not found in any of these locations: {paths_to_try}")
-                return
-
-            df = pd.read_csv(csv_path, dtype={'product_id': str, 'product_name': str})
-            
-            # Ensure required columns exist
-            if 'product_id' not in df.columns or 'product_name' not in df.columns:
+            with open(csv_path, newline='', encoding='utf-8-sig') as f:
+                reader = csv.reader(f)
+                header = [column.strip() for column in next(reader, [])]
                 # Try to adapt to different column names
-                if 'ProductID' in df.columns and 'ProductName' in df.columns:
-                    df = df.rename(columns={'ProductID': 'product_id', 'ProductName': 'product_name'})
+                for id_column, name_column in (('product_id', 'product_name'), ('ProductID', 'ProductName')):
+                    if id_column in header and name_column in header:
+                        id_index, name_index = header.index(id_column), header.index(name_column)
+                        break
                 else:
                     logger.error("CSV file must contain 'product_id' and 'product_name' columns")
-                    return
-
-            # Clean data
-            df['product_id'] = df['product_id'].astype(str).str.strip()
-            df['product_name'] = df['product_name'].astype(str).str.strip()
-
-            # Create mapping
-            self._mapping = dict(zip(df['product_id'], df['product_name']))
-            logger.info(f"Loaded {len(self._mapping)} product names from {csv_path}")
-            
-            # Log sample for verification
-            sample = dict(list(self._mapping.items())[:3])
-            logger.info(f"Sample mappings: {sample}")
-
+                    return {}
+                mapping = {
+                    row[id_index].strip(): row[name_index].strip()
+                    for row in reader if len(row) > max(id_index, name_index)
+                }
+            logger.info(f"Loaded {len(mapping)} product names from {csv_path}")
+            return mapping
         except Exception as e:
             logger.error(f"Error loading product names: {str(e)}")
-            self._mapping = {}
+            return {}
+
+    def _names(self) -> Dict[str, str]:
+        if self._mapping is None:
+            with self._lock:
+                if self._mapping is None:
+                    self._mapping = self._load_mapping()
+        return self._mapping
+
+    def _count_misses(self, count: int):
+        if count:
+            with self._misses_lock:
+                self.misses += count
 
     def get_name(self, product_id):
         """Get product name for a given product ID."""
         if not product_id:
             return None
-        
+
         product_id = str(product_id).strip()
-        name = self._mapping.get(product_id)
+        name = self._names().get(product_id)
         if not name:
-            logger.warning(f"No name found for product ID: {product_id}")
+            self._count_misses(1)
             return product_id  # Return ID as fallback
         return name
 
@@ -78,9 +100,43 @@ class ProductNameMapper:
             return []
         return [self.get_name(pid) for pid in product_ids]
 
+    def _aligned_to(self, items: np.ndarray):
+        aligned = self._aligned
+        if aligned[0] is not items:
+            mapping = self._names()
+            found = [mapping.get(str(item).strip()) for item in items]
+            names = np.array([name or item for name, item in zip(found, items)], dtype=object)
+            missing = np.array([not name for name in found], dtype=bool)
+            # Python lists as well, for decoding the few codes of a single rule or itemset
+            aligned = (items, names, missing, names.tolist(), set(np.flatnonzero(missing).tolist()))
+            self._aligned = aligned
+        return aligned
+
+    def names_for_items(self, items: np.ndarray) -> np.ndarray:
+        """Names aligned with a model's item dictionary (the ID where no name is known)"""
+        return self._aligned_to(items)[1]
+
+    def decode(self, items: np.ndarray, codes: Sequence[int]) -> List[str]:
+        """Names for item codes of the item dictionary ``items``"""
+        _, names, missing, name_list, missing_codes = self._aligned_to(items)
+        if len(codes) > _SHORT_DECODE:
+            codes = np.asarray(codes, dtype=np.int64)
+            self._count_misses(int(missing[codes].sum()))
+            return names[codes].tolist()
+        codes = codes.tolist() if isinstance(codes, np.ndarray) else codes
+        if missing_codes:
+            self._count_misses(sum(code in missing_codes for code in codes))
+        return [name_list[code] for code in codes]
+
+    def stats(self) -> Dict[str, int]:
+        """Number of names loaded and of lookups that fell back to the product ID"""
+        with self._misses_lock:
+            misses = self.misses
+        return {"names_loaded": len(self._mapping or {}), "misses": misses}
+
     def get_mapping(self):
         """Return a copy of the complete product ID to name mapping."""
-        return self._mapping.copy()
+        return self._names().copy()
 
-# Create a singleton instance
-product_name_mapper = ProductNameMapper() 
\ No newline at end of file
+# Create a singleton instance; the CSV is read on first lookup
+product_name_mapper = ProductNameMapper()
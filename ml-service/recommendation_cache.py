@@ -0,0 +1,67 @@
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+from collections import OrderedDict
+import os
+import threading
+import time
+
+# Baskets kept in the cache; 0 disables it
+RECOMMENDATION_CACHE_SIZE = int(os.environ.get("RECOMMENDATION_CACHE_SIZE", 10000))
+# Seconds an entry stays valid; 0 keeps entries until they are evicted or the model changes
+RECOMMENDATION_CACHE_TTL = float(os.environ.get("RECOMMENDATION_CACHE_TTL", 300))
+
+def basket_key(version: str, items: Iterable[str], top_n: int, mode: str) -> Tuple[Hashable, ...]:
+    """Cache key of a basket: recommendations only depend on its distinct items"""
+    return (version, tuple(sorted(set(items))), top_n, mode)
+
+class RecommendationCache:
+    """Bounded LRU cache of recommendation lists with an optional time to live.
+
+    Keys come from ``basket_key``, so baskets listing the same items in any
+    order or with repeats share an entry (per top_n and scoring mode), and
+    entries of an older model never match. Cached lists are shared between requests and must not be modified.
+    """
+
+    def __init__(self, max_entries: int = RECOMMENDATION_CACHE_SIZE, ttl_seconds: float = RECOMMENDATION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        """Cached value for ``key``, or None (counted as a miss)"""
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds > 0 and time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Tuple[Hashable, ...], value: Any):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all entries, e.g. when a new model is published; counters are kept"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
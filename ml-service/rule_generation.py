@@ -0,0 +1,187 @@
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from itertools import combinations
+import numpy as np
+import pandas as pd
+import logging
+from rule_store import RuleStore, gather_sets
+
+logger = logging.getLogger(__name__)
+
+# Always computed: rules are ranked by confidence and lift
+BASE_COLUMNS = ('antecedent support', 'consequent support', 'support', 'confidence', 'lift')
+# Optional measures selectable through ``metrics``
+RULE_METRICS = ('leverage', 'conviction', 'zhangs_metric')
+
+class SupportTable:
+    """Supports of integer-encoded itemsets, looked up by hashing item codes.
+
+    Each sorted code tuple is packed into one int64 key (base ``n_items + 1``
+    digits, so itemsets of different lengths never collide) and looked up with
+    a binary search over the sorted keys. Itemsets too long to pack fall back
+    to a dict keyed by the code tuple.
+    """
+
+    def __init__(self, sets: Sequence[Tuple[int, ...]], n_items: int):
+        self.base = n_items + 1
+        max_len = max((len(s) for s in sets), default=1)
+        self.packed = self.base ** max_len < 2 ** 63
+        if self.packed:
+            keys = np.array([self._pack(s) for s in sets], dtype=np.int64)
+            self.order = np.argsort(keys, kind='stable')
+            self.keys = keys[self.order]
+        else:
+            self.rows = {s: row for row, s in enumerate(sets)}
+
+    def _pack(self, codes: Iterable[int]) -> int:
+        key = 0
+        for code in codes:
+            key = key * self.base + code + 1
+        return key
+
+    def lookup(self, codes: np.ndarray) -> np.ndarray:
+        """Row of every itemset in a matrix of sorted item codes (one itemset per row)"""
+        if not self.packed:
+            try:
+                return np.array([self.rows[tuple(row)] for row in codes.tolist()], dtype=np.int64)
+            except KeyError as e:
+                raise KeyError(f"Itemset {e} is missing from the frequent itemsets") from None
+        keys = np.zeros(len(codes), dtype=np.int64)
+        for column in range(codes.shape[1]):
+            keys = keys * self.base + codes[:, column] + 1
+        positions = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        missing = self.keys[positions] != keys if len(self.keys) else np.ones(len(keys), dtype=bool)
+        if missing.any():
+            raise KeyError(f"Itemset {codes[np.flatnonzero(missing)[0]].tolist()} is missing from the frequent itemsets")
+        return self.order[positions]
+
+def _metric_columns(sAC: np.ndarray, sA: np.ndarray, sC: np.ndarray,
+                    metrics: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Rule measures with the same arithmetic as mlxtend's association_rules"""
+    confidence = sAC / sA
+    columns = {
+        'antecedent support': sA,
+        'consequent support': sC,
+        'support': sAC,
+        'confidence': confidence,
+        'lift': confidence / sC,
+    }
+    if 'leverage' in metrics or 'zhangs_metric' in metrics:
+        leverage = sAC - sA * sC
+        if 'leverage' in metrics:
+            columns['leverage'] = leverage
+    if 'conviction' in metrics:
+        conviction = np.full(len(sAC), np.inf)
+        below = confidence < 1.0
+        conviction[below] = (1.0 - sC[below]) / (1.0 - confidence[below])
+        columns['conviction'] = conviction
+    if 'zhangs_metric' in metrics:
+        denominator = np.maximum(sAC * (1 - sA), sA * (sC - sAC))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns['zhangs_metric'] = np.where(denominator == 0, 0, leverage / denominator)
+    return columns
+
+def encode_itemsets(frequent_itemsets: pd.DataFrame, items: Sequence[str]) -> Tuple[List[Tuple[int, ...]], np.ndarray]:
+    """Sorted item code tuples of the itemsets over ``items``, and their supports"""
+    codes = {item: code for code, item in enumerate(items)}
+    sets = [tuple(sorted(codes[item] for item in itemset)) for itemset in frequent_itemsets['itemsets'].to_numpy()]
+    return sets, frequent_itemsets['support'].to_numpy(dtype=np.float64)
+
+def rows_by_length(sets: Sequence[Tuple[int, ...]]) -> Dict[int, np.ndarray]:
+    """Rows of the itemsets of each length"""
+    by_length = {}
+    for row, s in enumerate(sets):
+        by_length.setdefault(len(s), []).append(row)
+    return {length: np.array(rows, dtype=np.int64) for length, rows in sorted(by_length.items())}
+
+def _confident_splits(sets: Sequence[Tuple[int, ...]], supports: np.ndarray, table: SupportTable,
+                      min_confidence: float, keep: Optional[np.ndarray] = None):
+    """Rules reaching ``min_confidence``, one group per itemset length and split.
+
+    Yields arrays of itemset row, split rank, antecedent row and consequent
+    row. Confidence only drops as items move from the antecedent to the
+    consequent, so a consequent is tried only for the itemsets where every
+    consequent one item smaller passed. With ``keep`` only those itemsets are
+    split; their sides are still looked up among all of ``sets``.
+    """
+    for length, rows in rows_by_length(sets).items():
+        if keep is not None:
+            rows = rows[keep[rows]]
+        if length < 2 or len(rows) == 0:
+            continue
+        matrix = np.array([sets[row] for row in rows], dtype=np.int64)
+        sAC = supports[rows]
+        passed = {}
+        # Larger antecedents first, i.e. consequents growing one item at a time
+        splits = [a for size in range(length - 1, 0, -1) for a in combinations(range(length), size)]
+        for rank, antecedent in enumerate(splits):
+            consequent = tuple(p for p in range(length) if p not in antecedent)
+            candidates = np.ones(len(rows), dtype=bool)
+            if len(consequent) > 1:
+                for p in consequent:
+                    candidates &= passed[tuple(q for q in consequent if q != p)]
+            positions = np.flatnonzero(candidates)
+            antecedent_rows = table.lookup(matrix[np.ix_(positions, antecedent)])
+            confident = sAC[positions] / supports[antecedent_rows] >= min_confidence
+            passed[consequent] = np.zeros(len(rows), dtype=bool)
+            passed[consequent][positions[confident]] = True
+            if confident.any():
+                positions = positions[confident]
+                yield (rows[positions], np.full(len(positions), rank, dtype=np.int64),
+                       antecedent_rows[confident], table.lookup(matrix[np.ix_(positions, consequent)]))
+
+def count_rules(sets: Sequence[Tuple[int, ...]], supports: np.ndarray, table: SupportTable, min_confidence: float,
+                keep: Optional[np.ndarray] = None) -> Tuple[int, int, int]:
+    """Number of rules ``generate_rules`` would return, and their antecedent and consequent code counts"""
+    lengths = np.array([len(s) for s in sets], dtype=np.int64)
+    n_rules = n_antecedent_codes = n_consequent_codes = 0
+    for _, _, antecedent_rows, consequent_rows in _confident_splits(sets, supports, table, min_confidence, keep):
+        n_rules += len(antecedent_rows)
+        n_antecedent_codes += int(lengths[antecedent_rows].sum())
+        n_consequent_codes += int(lengths[consequent_rows].sum())
+    return n_rules, n_antecedent_codes, n_consequent_codes
+
+def generate_rules(frequent_itemsets: pd.DataFrame, items: Sequence[str], min_confidence: float = 0.5,
+                   metrics: Optional[Sequence[str]] = None, keep: Optional[np.ndarray] = None,
+                   table: Optional[SupportTable] = None) -> RuleStore:
+    """Association rules reaching ``min_confidence``, ranked by confidence and then lift.
+
+    Itemsets are encoded against ``items`` once and all splits of the itemsets
+    of one length are scored together, one consequent at a time. Supports come
+    from a ``SupportTable`` (``table`` if one was already built for these
+    itemsets) and the rules are returned as a ``RuleStore`` over ``items``,
+    with the columns of mlxtend's association_rules. ``metrics`` picks which of
+    RULE_METRICS to compute (default: all). Ties keep itemset order. With
+    ``keep`` rules are generated only from the itemsets where it is set.
+    """
+    metrics = RULE_METRICS if metrics is None else tuple(metrics)
+    columns = list(BASE_COLUMNS) + [m for m in RULE_METRICS if m in metrics]
+
+    sets, supports = encode_itemsets(frequent_itemsets, items)
+    if table is None:
+        table = SupportTable(sets, len(items))
+
+    # Per group of rules: itemset row, split rank, antecedent row, consequent row
+    parts = list(_confident_splits(sets, supports, table, min_confidence, keep))
+
+    # Rule columns are filled in one preallocated array each
+    n_rules = sum(len(part[0]) for part in parts)
+    itemset_rows, ranks, antecedent_rows, consequent_rows = (np.empty(n_rules, dtype=np.int64) for _ in range(4))
+    start = 0
+    for part in parts:
+        end = start + len(part[0])
+        for target, values in zip((itemset_rows, ranks, antecedent_rows, consequent_rows), part):
+            target[start:end] = values
+        start = end
+
+    values = _metric_columns(supports[itemset_rows], supports[antecedent_rows], supports[consequent_rows], metrics)
+    order = np.lexsort((ranks, itemset_rows, -values['lift'], -values['confidence']))
+
+    # Both sides are frequent itemsets, so their codes are gathered from the itemsets' CSR arrays
+    set_offsets = np.zeros(len(sets) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in sets], out=set_offsets[1:])
+    set_codes = np.fromiter((code for s in sets for code in s), dtype=np.int64, count=set_offsets[-1])
+    antecedents = gather_sets(set_offsets, set_codes, antecedent_rows[order])
+    consequents = gather_sets(set_offsets, set_codes, consequent_rows[order])
+    logger.info(f"Generated {n_rules} rules from {len(sets)} itemsets")
+    return RuleStore.from_arrays(items, *antecedents, *consequents,
+                                 {column: values[column][order] for column in columns})
@@ -0,0 +1,203 @@
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+import os
+import logging
+from scipy import sparse
+from rule_store import RuleStore
+
+logger = logging.getLogger(__name__)
+
+# How the fired rules recommending an item are combined into its score
+SCORING_MODES = ("max", "noisy_or", "lift_sum")
+DEFAULT_SCORING_MODE = "max"
+
+class RuleIndex:
+    """Inverted item -> rule index over a ranked ``RuleStore``.
+
+    Rule IDs are row positions in the store, so the rules must already be in
+    ranking order (as returned by generate_association_rules). The postings
+    are packed into NumPy arrays over the model's item codes and consequents
+    and metrics are the store's own arrays, so a lookup only touches the rules
+    whose antecedents contain one of the requested items, and only the
+    postings need saving next to the store. A rule fires when its whole
+    antecedent is in the basket: it occurs in the postings of as many basket
+    items as it has antecedent items.
+    """
+
+    _ARRAYS = ("posting_offsets", "posting_rules")
+
+    def __init__(self, items: np.ndarray, posting_offsets: np.ndarray, posting_rules: np.ndarray,
+                 antecedent_offsets: np.ndarray, consequent_offsets: np.ndarray, consequent_codes: np.ndarray,
+                 confidence: np.ndarray, lift: np.ndarray, support: np.ndarray):
+        self.items = items
+        # Plain ndarray views of memory-mapped arrays: same pages, without np.memmap's per-index overhead
+        self.posting_offsets = np.asarray(posting_offsets)
+        self.posting_rules = np.asarray(posting_rules)
+        self.antecedent_offsets = np.asarray(antecedent_offsets)
+        self.consequent_offsets = np.asarray(consequent_offsets)
+        self.consequent_codes = np.asarray(consequent_codes)
+        self.confidence = np.asarray(confidence)
+        self.lift = np.asarray(lift)
+        self.support = np.asarray(support)
+        self._codes = {item: code for code, item in enumerate(items)}
+        self._matrices = None
+
+    @classmethod
+    def _from_postings(cls, store: RuleStore, posting_offsets: np.ndarray, posting_rules: np.ndarray) -> "RuleIndex":
+        return cls(store.items, posting_offsets, posting_rules, store.antecedent_offsets, store.consequent_offsets,
+                   store.consequent_codes, store['confidence'], store['lift'], store['support'])
+
+    @classmethod
+    def from_rules(cls, rules: RuleStore) -> "RuleIndex":
+        """Build the index for ranked rules"""
+        n_items, n_rules = len(rules.items), len(rules)
+        antecedent_rules = np.repeat(np.arange(n_rules, dtype=np.int32), np.diff(rules.antecedent_offsets))
+
+        # Group rule IDs by antecedent item; the stable sort keeps each posting list in rank order
+        order = np.argsort(rules.antecedent_codes, kind='stable')
+        posting_offsets = np.zeros(n_items + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rules.antecedent_codes, minlength=n_items), out=posting_offsets[1:])
+
+        index = cls._from_postings(rules, posting_offsets, antecedent_rules[order])
+        logger.info(f"Built rule index: {n_rules} rules over {n_items} items")
+        return index
+
+    def __len__(self):
+        return len(self.confidence)
+
+    def item_code(self, item: str) -> Optional[int]:
+        """Code of an item ID in the model's item dictionary, or None if it is unknown"""
+        return self._codes.get(item)
+
+    def basket_codes(self, items) -> np.ndarray:
+        """Sorted distinct codes of the basket items known to the model"""
+        return np.array(sorted({self._codes[item] for item in items if item in self._codes}), dtype=np.int64)
+
+    def matching_rules(self, items) -> np.ndarray:
+        """Return IDs (in ranking order) of rules whose antecedents are contained in the items."""
+        return self.fired_rules(self.basket_codes(items))
+
+    def fired_rules(self, basket_codes: np.ndarray) -> np.ndarray:
+        """IDs (in ranking order) of rules whose antecedents are contained in a basket given by ``basket_codes``"""
+        postings = []
+        for code in basket_codes.tolist():
+            if self.posting_offsets[code] < self.posting_offsets[code + 1]:
+                postings.append(self.posting_rules[self.posting_offsets[code]:self.posting_offsets[code + 1]])
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+        if len(postings) == 1:
+            candidates, hits = postings[0], 1
+        else:
+            # A rule occurs once in the postings of each basket item in its antecedent
+            candidates, hits = np.unique(np.concatenate(postings), return_counts=True)
+        sizes = self.antecedent_offsets[candidates + 1] - self.antecedent_offsets[candidates]
+        return candidates[sizes == hits]
+
+    def recommend(self, rule_ids: np.ndarray, basket_codes: np.ndarray, top_n: int,
+                  mode: str = DEFAULT_SCORING_MODE) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Top ``top_n`` items recommended by fired rules, as item codes, scores, best rules and rule counts.
+
+        ``rule_ids`` are fired rules in ranking order and ``basket_codes`` the
+        sorted codes from ``basket_codes``. Every consequent item
+        not in the basket is scored over all fired rules recommending it: the
+        highest confidence ("max"), the chance that at least one rule holds if
+        they were independent ("noisy_or"), or the sum of lifts ("lift_sum").
+        Its best rule is the highest-ranked of them. Ties are broken by best
+        rule, then item code. Only the top candidates are sorted.
+        """
+        empty = np.empty(0, dtype=np.int64)
+        if len(rule_ids) == 0:
+            return empty, np.empty(0), empty, empty
+        rule_ids = np.asarray(rule_ids, dtype=np.int64)
+        starts = self.consequent_offsets[rule_ids]
+        lengths = self.consequent_offsets[rule_ids + 1] - starts
+        ends = np.cumsum(lengths)
+        positions = np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1])
+        codes, rules = self.consequent_codes[positions], np.repeat(rule_ids, lengths)
+        if len(basket_codes):
+            # basket_codes are sorted, so membership is a binary search
+            new = basket_codes[np.minimum(np.searchsorted(basket_codes, codes), len(basket_codes) - 1)] != codes
+            codes, rules = codes[new], rules[new]
+        if len(codes) == 0:
+            return empty, np.empty(0), empty, empty
+
+        # First occurrences follow ranking order, so they are each item's best rule
+        candidates, first, inverse, counts = np.unique(codes, return_index=True, return_inverse=True, return_counts=True)
+        best = rules[first]
+        if mode == "max":
+            scores = self.confidence[best].astype(np.float64)
+        elif mode == "noisy_or":
+            # Sum of log(1 - confidence); a confidence of 1 makes the score 1
+            with np.errstate(divide='ignore'):
+                log_misses = np.log1p(-self.confidence[rules].astype(np.float64))
+            scores = -np.expm1(np.bincount(inverse, weights=log_misses, minlength=len(candidates)))
+        elif mode == "lift_sum":
+            scores = np.bincount(inverse, weights=self.lift[rules].astype(np.float64), minlength=len(candidates))
+        else:
+            raise ValueError(f"Unknown scoring mode '{mode}'")
+
+        selected = np.arange(len(candidates))
+        if len(candidates) > top_n:
+            # Candidates scoring at least the top_n-th highest score, ties included
+            threshold = np.partition(scores, len(scores) - top_n)[len(scores) - top_n]
+            selected = np.flatnonzero(scores >= threshold)
+        order = selected[np.lexsort((candidates[selected], best[selected], -scores[selected]))][:top_n]
+        return candidates[order].astype(np.int64), scores[order], best[order], counts[order]
+
+    def consequent_item_codes(self, rule_id: int) -> np.ndarray:
+        return self.consequent_codes[self.consequent_offsets[rule_id]:self.consequent_offsets[rule_id + 1]]
+
+    def consequents(self, rule_id: int) -> List[str]:
+        """Return the consequent item IDs of a rule."""
+        return self.items[self.consequent_item_codes(rule_id)].tolist()
+
+    def _rule_matrices(self):
+        """Items x rules incidence matrix of antecedents and the antecedent sizes, built on first batch lookup"""
+        if self._matrices is None:
+            n_items, n_rules = len(self.items), len(self)
+            antecedents = sparse.csr_matrix(
+                (np.ones(len(self.posting_rules), dtype=np.int32), self.posting_rules, self.posting_offsets),
+                shape=(n_items, n_rules))
+            self._matrices = (antecedents, np.diff(self.antecedent_offsets).astype(np.int32))
+        return self._matrices
+
+    def basket_matrix(self, baskets: Sequence[Sequence[str]]) -> sparse.csr_matrix:
+        """Baskets x items indicator matrix; items unknown to the model are dropped"""
+        offsets = np.zeros(len(baskets) + 1, dtype=np.int64)
+        codes = []
+        for i, items in enumerate(baskets):
+            codes.extend({self._codes[item] for item in items if item in self._codes})
+            offsets[i + 1] = len(codes)
+        return sparse.csr_matrix((np.ones(len(codes), dtype=np.int32), np.array(codes, dtype=np.int32), offsets),
+                                 shape=(len(baskets), len(self.items)))
+
+    def batch_matching_rules(self, baskets: Sequence[Sequence[str]], chunk_size: int = 2048) -> List[np.ndarray]:
+        """For each basket, the IDs (in ranking order) of rules whose antecedents it contains.
+
+        The basket x rule matrix product counts each rule's antecedent items in
+        every basket at once, working through ``chunk_size`` baskets at a time;
+        a rule fires where the count equals its antecedent size.
+        """
+        antecedents, antecedent_sizes = self._rule_matrices()
+        results = []
+        for start in range(0, len(baskets), chunk_size):
+            hits = (self.basket_matrix(baskets[start:start + chunk_size]) @ antecedents).tocsr()
+            hits.sort_indices()
+            fired = hits.data == antecedent_sizes[hits.indices]
+            for row in range(hits.shape[0]):
+                begin, end = hits.indptr[row], hits.indptr[row + 1]
+                results.append(hits.indices[begin:end][fired[begin:end]])
+        return results
+
+    def save(self, path: str):
+        """Write the postings as .npy files under ``path`` (the rules are stored by the caller)"""
+        os.makedirs(path, exist_ok=True)
+        for name in self._ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, path: str, rules: RuleStore, mmap: bool = True) -> "RuleIndex":
+        """Load the postings written by ``save`` for ``rules``, memory-mapping them unless ``mmap`` is False"""
+        mmap_mode = "r" if mmap else None
+        arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in cls._ARRAYS]
+        return cls._from_postings(rules, *arrays)
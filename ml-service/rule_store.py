@@ -0,0 +1,120 @@
+from typing import Dict, List, Sequence
+import numpy as np
+import pandas as pd
+import os
+import json
+
+def _index_dtype(size: int) -> type:
+    """int32 offsets and codes unless the arrays outgrow them"""
+    return np.int32 if size < 2 ** 31 else np.int64
+
+def store_nbytes(n_rules: int, n_antecedent_codes: int, n_consequent_codes: int, n_metrics: int) -> int:
+    """Bytes ``RuleStore.nbytes`` reports for a store of the given shape"""
+    itemsize = np.dtype(_index_dtype(max(n_antecedent_codes, n_consequent_codes))).itemsize
+    return (2 * (n_rules + 1) + n_antecedent_codes + n_consequent_codes) * itemsize + n_rules * n_metrics * 4
+
+def gather_sets(offsets: np.ndarray, codes: np.ndarray, rows: np.ndarray):
+    """CSR offsets and codes of the sets at ``rows`` of a CSR set array"""
+    lengths = (offsets[1:] - offsets[:-1])[rows]
+    new_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    dtype = _index_dtype(max(int(new_offsets[-1]), len(codes)))
+    positions = np.repeat(offsets[rows] - new_offsets[:-1], lengths) + np.arange(new_offsets[-1])
+    return new_offsets.astype(dtype), np.asarray(codes)[positions].astype(dtype)
+
+class RuleStore:
+    """Association rules as flat arrays over the model's item dictionary.
+
+    Antecedents and consequents are CSR-style offsets and sorted item codes,
+    metrics are float32 columns, and rule IDs are row positions in ranking
+    order. Nothing is held per rule as Python objects, and a saved store is
+    loaded by memory-mapping its .npy files.
+    """
+
+    def __init__(self, items: np.ndarray, antecedent_offsets: np.ndarray, antecedent_codes: np.ndarray,
+                 consequent_offsets: np.ndarray, consequent_codes: np.ndarray, metrics: Dict[str, np.ndarray]):
+        self.items = items
+        self.antecedent_offsets = antecedent_offsets
+        self.antecedent_codes = antecedent_codes
+        self.consequent_offsets = consequent_offsets
+        self.consequent_codes = consequent_codes
+        self.metrics = metrics
+
+    @classmethod
+    def from_arrays(cls, items: Sequence[str], antecedent_offsets: np.ndarray, antecedent_codes: np.ndarray,
+                    consequent_offsets: np.ndarray, consequent_codes: np.ndarray,
+                    metrics: Dict[str, np.ndarray]) -> "RuleStore":
+        """Store with compact dtypes for the given sides and metric columns"""
+        dtype = _index_dtype(max(len(antecedent_codes), len(consequent_codes)))
+        return cls(
+            np.asarray(items, dtype=object),
+            np.asarray(antecedent_offsets, dtype=dtype), np.asarray(antecedent_codes, dtype=dtype),
+            np.asarray(consequent_offsets, dtype=dtype), np.asarray(consequent_codes, dtype=dtype),
+            {name: np.asarray(values, dtype=np.float32) for name, values in metrics.items()},
+        )
+
+    def __len__(self):
+        return len(self.antecedent_offsets) - 1
+
+    @property
+    def columns(self) -> List[str]:
+        """Names of the metric columns"""
+        return list(self.metrics)
+
+    def __getitem__(self, metric: str) -> np.ndarray:
+        return self.metrics[metric]
+
+    def antecedent_item_codes(self, rule_id: int) -> np.ndarray:
+        return self.antecedent_codes[self.antecedent_offsets[rule_id]:self.antecedent_offsets[rule_id + 1]]
+
+    def consequent_item_codes(self, rule_id: int) -> np.ndarray:
+        return self.consequent_codes[self.consequent_offsets[rule_id]:self.consequent_offsets[rule_id + 1]]
+
+    def antecedents(self, rule_id: int) -> List[str]:
+        """Antecedent item IDs of a rule"""
+        return self.items[self.antecedent_item_codes(rule_id)].tolist()
+
+    def consequents(self, rule_id: int) -> List[str]:
+        """Consequent item IDs of a rule"""
+        return self.items[self.consequent_item_codes(rule_id)].tolist()
+
+    def take(self, rows: np.ndarray) -> "RuleStore":
+        """Store of the rules at ``rows``, in that order"""
+        rows = np.asarray(rows, dtype=np.int64)
+        antecedent_offsets, antecedent_codes = gather_sets(self.antecedent_offsets, self.antecedent_codes, rows)
+        consequent_offsets, consequent_codes = gather_sets(self.consequent_offsets, self.consequent_codes, rows)
+        return RuleStore.from_arrays(self.items, antecedent_offsets, antecedent_codes, consequent_offsets,
+                                     consequent_codes, {name: values[rows] for name, values in self.metrics.items()})
+
+    def to_frame(self) -> pd.DataFrame:
+        """The rules as an mlxtend-style frame of frozensets, e.g. for export or comparison"""
+        return pd.DataFrame({
+            'antecedents': pd.Series([frozenset(self.antecedents(i)) for i in range(len(self))], dtype=object),
+            'consequents': pd.Series([frozenset(self.consequents(i)) for i in range(len(self))], dtype=object),
+            **{name: np.asarray(values) for name, values in self.metrics.items()},
+        })
+
+    def nbytes(self) -> int:
+        """Memory held by the rule arrays, excluding the shared item dictionary"""
+        arrays = [self.antecedent_offsets, self.antecedent_codes, self.consequent_offsets, self.consequent_codes]
+        return sum(array.nbytes for array in arrays + list(self.metrics.values()))
+
+    def save(self, path: str):
+        """Write the arrays as .npy files under ``path`` (the item dictionary is stored by the caller)"""
+        os.makedirs(path, exist_ok=True)
+        for name in ("antecedent_offsets", "antecedent_codes", "consequent_offsets", "consequent_codes"):
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        for name, values in self.metrics.items():
+            np.save(os.path.join(path, f"metric-{name.replace(' ', '_')}.npy"), values)
+        with open(os.path.join(path, "metrics.json"), "w") as f:
+            json.dump(list(self.metrics), f)
+
+    @classmethod
+    def load(cls, path: str, items: np.ndarray, mmap: bool = True) -> "RuleStore":
+        """Load a store written by ``save``, memory-mapping its arrays unless ``mmap`` is False"""
+        mmap_mode = "r" if mmap else None
+        load = lambda name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+        with open(os.path.join(path, "metrics.json")) as f:
+            names = json.load(f)
+        return cls(items, load("antecedent_offsets"), load("antecedent_codes"), load("consequent_offsets"),
+                   load("consequent_codes"), {name: load(f"metric-{name.replace(' ', '_')}") for name in names})
@@ -0,0 +1,47 @@
+from typing import Optional, Tuple
+import numpy as np
+import pandas as pd
+import math
+from scipy.stats import norm
+from encoding import EncodedBaskets
+from eclat import tid_bitsets, count_itemsets
+
+def chernoff_sample_size(min_support: float, relative_error: float, error_probability: float) -> int:
+    """Baskets to sample so an itemset at ``min_support`` is estimated within ``relative_error`` of its
+    support with probability at least 1 - ``error_probability`` (multiplicative Chernoff bound)"""
+    return math.ceil(3 * math.log(2 / error_probability) / (relative_error ** 2 * min_support))
+
+def sample_baskets(baskets: EncodedBaskets, size: int, seed: Optional[int] = None) -> EncodedBaskets:
+    """Uniform random sample of ``size`` baskets without replacement, in their original order"""
+    if size >= len(baskets):
+        return baskets
+    rows = np.sort(np.random.default_rng(seed).choice(len(baskets), size=size, replace=False))
+    return baskets.take(rows)
+
+def support_intervals(support: np.ndarray, sample_size: int, population: int,
+                      error_probability: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Wilson score intervals for supports estimated on a sample drawn without replacement.
+
+    The finite population correction shrinks the intervals as the sample
+    approaches the whole population; a full sample gives the exact supports.
+    """
+    support = np.asarray(support, dtype=np.float64)
+    if sample_size >= population:
+        return support.copy(), support.copy()
+    z = norm.ppf(1 - error_probability / 2)
+    # Sampling without replacement behaves like a larger sample with replacement
+    n = sample_size * (population - 1) / (population - sample_size)
+    center = (support + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+    half_width = z * np.sqrt(support * (1 - support) / n + z ** 2 / (4 * n ** 2)) / (1 + z ** 2 / n)
+    return np.clip(center - half_width, 0, 1), np.clip(center + half_width, 0, 1)
+
+def exact_supports(baskets: EncodedBaskets, frequent_itemsets: pd.DataFrame) -> np.ndarray:
+    """Supports of the itemsets over all ``baskets``, counted in one pass over TID bitsets of their items"""
+    if len(frequent_itemsets) == 0 or baskets.n_transactions == 0:
+        return np.zeros(len(frequent_itemsets), dtype=np.float64)
+    codes = {item: code for code, item in enumerate(baskets.items)}
+    itemsets = [sorted(codes[item] for item in itemset) for itemset in frequent_itemsets['itemsets']]
+    items = np.unique([code for itemset in itemsets for code in itemset])
+    rows = np.full(baskets.n_items, -1, dtype=np.int64)
+    rows[items] = np.arange(len(items))
+    return count_itemsets(tid_bitsets(baskets, items), itemsets, rows) / baskets.n_transactions
@@ -0,0 +1,244 @@
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_EXCEPTION
+import multiprocessing
+import numpy as np
+import pandas as pd
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import logging
+import threading
+from encoding import EncodedBaskets
+from eclat import tid_bitsets, popcount, search, count_itemsets
+
+logger = logging.getLogger(__name__)
+
+# Shared directory through which SON runs hand out partitions and collect results
+SON_DIR = os.environ.get("SON_DIR", "data/son")
+DEFAULT_PARTITIONS = int(os.environ.get("SON_PARTITIONS", 4))
+# A claimed task without output after this many seconds may be taken over by another worker
+TASK_TIMEOUT = float(os.environ.get("SON_TASK_TIMEOUT", 600))
+POLL_INTERVAL = 0.1
+
+# Local thresholds are lowered by this relative slack so rounding never drops a candidate
+_TOLERANCE = 1e-9
+
+PASSES = ("local", "count")
+
+def _read_manifest(run_dir: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(run_dir, "manifest.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def _output_path(run_dir: str, pass_name: str, partition: int) -> str:
+    return os.path.join(run_dir, f"{pass_name}-{partition:04d}")
+
+def _claim_path(run_dir: str, pass_name: str, partition: int) -> str:
+    return os.path.join(run_dir, "claims", f"{pass_name}-{partition:04d}")
+
+def _claim(run_dir: str, pass_name: str, partition: int) -> bool:
+    """Atomically claim a task; stale claims of workers that went away are taken over"""
+    path = _claim_path(run_dir, pass_name, partition)
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            if time.time() - os.path.getmtime(path) < TASK_TIMEOUT:
+                return False
+            os.remove(path)
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except (FileExistsError, FileNotFoundError):
+            return False
+    with os.fdopen(fd, "w") as f:
+        f.write(f"{socket.gethostname()}:{os.getpid()}")
+    return True
+
+def _keep_claimed(path: str, stop: threading.Event):
+    """Touch a claim until ``stop`` is set, so a long task is not taken for a stale one"""
+    while not stop.wait(TASK_TIMEOUT / 4):
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return
+
+def _save_sets(path: str, sets: List[Tuple[int, ...]]):
+    """Write item code tuples as CSR offsets/codes under ``path``, atomically"""
+    offsets = np.zeros(len(sets) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in sets], out=offsets[1:])
+    staging = f"{path}.tmp-{os.getpid()}"
+    # No makedirs: a run removed under a late worker must stay removed
+    os.mkdir(staging)
+    np.save(os.path.join(staging, "offsets.npy"), offsets)
+    np.save(os.path.join(staging, "codes.npy"), np.array([c for s in sets for c in s], dtype=np.int32))
+    try:
+        os.replace(staging, path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+        # A worker that took over this task finished first; its output is the same
+        shutil.rmtree(staging, ignore_errors=True)
+
+def _load_sets(path: str) -> List[Tuple[int, ...]]:
+    offsets = np.load(os.path.join(path, "offsets.npy"))
+    codes = np.load(os.path.join(path, "codes.npy")).tolist()
+    return [tuple(codes[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+
+def _mine_partition(baskets: EncodedBaskets, min_support: float, max_len: Optional[int]) -> List[Tuple[int, ...]]:
+    """Pass one: itemsets frequent within a single partition"""
+    n_transactions = baskets.n_transactions
+    if n_transactions == 0:
+        return []
+    local_support = min_support * (1 - _TOLERANCE)
+    supports = baskets.item_counts() / n_transactions
+    frequent = np.flatnonzero(supports >= local_support)
+    found_codes, _ = search(frequent, tid_bitsets(baskets, frequent), supports[frequent],
+                            lambda bitsets: popcount(bitsets) / n_transactions, local_support, max_len)
+    return found_codes
+
+def _count_partition(baskets: EncodedBaskets, candidates: List[Tuple[int, ...]]) -> np.ndarray:
+    """Pass two: number of baskets in a partition containing each candidate"""
+    if not candidates or baskets.n_transactions == 0:
+        return np.zeros(len(candidates), dtype=np.int64)
+    items = np.unique([code for candidate in candidates for code in candidate])
+    rows = np.full(baskets.n_items, -1, dtype=np.int64)
+    rows[items] = np.arange(len(items))
+    return count_itemsets(tid_bitsets(baskets, items), candidates, rows)
+
+def _run_task(run_dir: str, manifest: Dict[str, Any], pass_name: str, partition: int):
+    baskets = EncodedBaskets.load(os.path.join(run_dir, f"partition-{partition:04d}"))
+    output = _output_path(run_dir, pass_name, partition)
+    if pass_name == "local":
+        _save_sets(output, _mine_partition(baskets, manifest["min_support"], manifest["max_len"]))
+    else:
+        counts = _count_partition(baskets, _load_sets(os.path.join(run_dir, "candidates")))
+        np.save(f"{output}.tmp-{os.getpid()}.npy", counts)
+        os.replace(f"{output}.tmp-{os.getpid()}.npy", f"{output}.npy")
+
+def _task_done(run_dir: str, pass_name: str, partition: int) -> bool:
+    output = _output_path(run_dir, pass_name, partition)
+    return os.path.exists(output if pass_name == "local" else f"{output}.npy")
+
+def work(run_dir: str, pass_name: str) -> int:
+    """Run unclaimed tasks of one pass of a run until none are left; returns how many were run"""
+    manifest = _read_manifest(run_dir)
+    if manifest is None:
+        return 0
+    done = 0
+    for partition in range(manifest["partitions"]):
+        if not _task_done(run_dir, pass_name, partition) and _claim(run_dir, pass_name, partition):
+            stop = threading.Event()
+            heartbeat = threading.Thread(target=_keep_claimed, daemon=True,
+                                         args=(_claim_path(run_dir, pass_name, partition), stop))
+            heartbeat.start()
+            try:
+                _run_task(run_dir, manifest, pass_name, partition)
+            finally:
+                stop.set()
+                heartbeat.join()
+            done += 1
+    return done
+
+def _wait_for_pass(run_dir: str, pass_name: str, partitions: int, deadline: float, helpers: List[Future]):
+    """Wait until every task of a pass has output, failing as soon as a local helper does"""
+    pending = set(helpers)
+    while not all(_task_done(run_dir, pass_name, p) for p in range(partitions)):
+        if pending:
+            finished, pending = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_EXCEPTION)
+            for future in finished:
+                # Re-raises the helper's exception, or BrokenProcessPool if its process died
+                future.result()
+        else:
+            time.sleep(POLL_INTERVAL)
+        # Pick up tasks whose worker went away
+        work(run_dir, pass_name)
+        if time.time() > deadline:
+            raise TimeoutError(f"SON run {run_dir} timed out waiting for pass '{pass_name}'")
+
+def son(baskets: EncodedBaskets, min_support: float = 0.5, max_len: Optional[int] = None,
+        partitions: Optional[int] = None, workers: Optional[int] = None, son_dir: str = SON_DIR,
+        timeout: float = 24 * 3600) -> pd.DataFrame:
+    """Two-pass partitioned mining (SON), coordinated through ``son_dir``.
+
+    The baskets are split into ``partitions`` runs of baskets written to a run
+    directory. Pass one mines each partition's locally frequent itemsets;
+    since a globally frequent itemset is locally frequent in at least one
+    partition, their union holds every answer. Pass two counts that union in
+    each partition and the counts are summed. Tasks are claimed through files
+    in the run directory, so besides this process and ``workers - 1`` local
+    helper processes, ``python son.py <son_dir>`` on other hosts sharing the
+    directory can take partitions too. The result equals apriori's.
+    """
+    partitions = max(1, min(partitions or DEFAULT_PARTITIONS, max(baskets.n_transactions, 1)))
+    workers = max(1, workers or 1)
+    n_transactions = baskets.n_transactions
+    run_dir = os.path.join(son_dir, f"run-{socket.gethostname()}-{os.getpid()}-{int(time.time() * 1000)}")
+    deadline = time.time() + timeout
+
+    os.makedirs(os.path.join(run_dir, "claims"), exist_ok=True)
+    pool = None
+    try:
+        bounds = np.linspace(0, n_transactions, partitions + 1).astype(np.int64)
+        for partition, (start, end) in enumerate(zip(bounds[:-1], bounds[1:])):
+            offsets = np.asarray(baskets.offsets[start:end + 1])
+            EncodedBaskets(offsets - offsets[0], baskets.codes[offsets[0]:offsets[-1]], baskets.items).save(
+                os.path.join(run_dir, f"partition-{partition:04d}"))
+        # The manifest goes last: workers only look at runs that have one
+        with open(os.path.join(run_dir, "manifest.json.tmp"), "w") as f:
+            json.dump({"partitions": partitions, "min_support": min_support, "max_len": max_len}, f)
+        os.replace(os.path.join(run_dir, "manifest.json.tmp"), os.path.join(run_dir, "manifest.json"))
+
+        if workers > 1:
+            pool = ProcessPoolExecutor(max_workers=workers - 1, mp_context=multiprocessing.get_context("spawn"))
+
+        for pass_name in PASSES:
+            helpers = [pool.submit(work, run_dir, pass_name) for _ in range(workers - 1)] if pool is not None else []
+            work(run_dir, pass_name)
+            _wait_for_pass(run_dir, pass_name, partitions, deadline, helpers)
+
+            if pass_name == "local":
+                candidates = sorted(set().union(*(
+                    _load_sets(_output_path(run_dir, "local", p)) for p in range(partitions))),
+                    key=lambda codes: (len(codes), codes))
+                _save_sets(os.path.join(run_dir, "candidates"), candidates)
+                logger.info(f"SON pass one: {len(candidates)} candidates from {partitions} partitions")
+
+        counts = sum(np.load(f"{_output_path(run_dir, 'count', p)}.npy") for p in range(partitions))
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    keep = [i for i in range(len(candidates)) if counts[i] / max(n_transactions, 1) >= min_support]
+    items = baskets.items
+    return pd.DataFrame({
+        'support': np.array([counts[i] for i in keep], dtype=np.int64) / max(n_transactions, 1),
+        'itemsets': pd.Series([frozenset(items[list(candidates[i])]) for i in keep], dtype=object),
+    })
+
+def serve(son_dir: str = SON_DIR):
+    """Worker loop for other processes or hosts: take tasks from any run in ``son_dir``"""
+    logger.info(f"SON worker polling {son_dir}")
+    while True:
+        busy = 0
+        for name in sorted(os.listdir(son_dir)) if os.path.isdir(son_dir) else []:
+            run_dir = os.path.join(son_dir, name)
+            for pass_name in PASSES:
+                if pass_name == "count" and not os.path.isdir(os.path.join(run_dir, "candidates")):
+                    break
+                try:
+                    busy += work(run_dir, pass_name)
+                except (FileNotFoundError, OSError) as e:
+                    # The run finished or was removed while we were looking at it
+                    logger.debug(f"Skipping {run_dir}: {str(e)}")
+                    break
+        if not busy:
+            time.sleep(POLL_INTERVAL)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    serve(sys.argv[1] if len(sys.argv) > 1 else SON_DIR)
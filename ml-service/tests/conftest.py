@@ -0,0 +1,69 @@
+from itertools import combinations
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The service modules are imported from ml-service/, as uvicorn does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoding import EncodedBaskets
+
+MIN_SUPPORT = 0.03
+MAX_LEN = 3
+
+@pytest.fixture(scope="session")
+def basket_lists():
+    """400 small baskets over 14 products with skewed popularity and two bundles"""
+    rng = np.random.default_rng(7)
+    items = [f"P{i:02d}" for i in range(14)]
+    probabilities = 0.45 * 0.8 ** np.arange(len(items))
+    baskets = []
+    for _ in range(400):
+        basket = {item for item, p in zip(items, probabilities) if rng.random() < p}
+        if "P00" in basket and rng.random() < 0.7:
+            basket.add("P05")
+        if {"P01", "P02"} <= basket and rng.random() < 0.8:
+            basket.add("P09")
+        if not basket:
+            basket.add(items[rng.integers(len(items))])
+        baskets.append(sorted(basket))
+    return baskets
+
+@pytest.fixture(scope="session")
+def baskets(basket_lists):
+    return EncodedBaskets.from_lists(basket_lists)
+
+def brute_force_itemsets(basket_lists, min_support, max_len):
+    """Support of every itemset up to ``max_len`` items reaching ``min_support``"""
+    counts = {}
+    for basket in basket_lists:
+        for size in range(1, max_len + 1):
+            for itemset in combinations(basket, size):
+                counts[frozenset(itemset)] = counts.get(frozenset(itemset), 0) + 1
+    return {itemset: count / len(basket_lists) for itemset, count in counts.items()
+            if count / len(basket_lists) >= min_support}
+
+def make_model(baskets, version=None):
+    """A model as main._build_model makes it from ``baskets``, without saving it"""
+    import main
+    from model_store import new_version
+    from rule_generation import generate_rules
+    from rule_index import RuleIndex
+
+    frequent_itemsets = main.MINING_ENGINES["apriori"](baskets, MIN_SUPPORT, MAX_LEN)
+    rules = generate_rules(frequent_itemsets, baskets.items.tolist(), min_confidence=0.2)
+    stats = {"transaction_count": baskets.n_transactions}
+    return {
+        "version": version or new_version(),
+        "trained_at": "2026-01-01T00:00:00",
+        "params": {"min_support": MIN_SUPPORT, "max_length": MAX_LEN, "min_threshold": 0.2},
+        "stats": stats,
+        "frequent_itemsets": frequent_itemsets,
+        "columns": baskets.items.tolist(),
+        "transaction_count": stats["transaction_count"],
+        "rules": rules,
+        "rule_index": RuleIndex.from_rules(rules),
+        "aggregates": main._dashboard_aggregates(frequent_itemsets, rules, stats["transaction_count"]),
+    }
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from conftest import MIN_SUPPORT, MAX_LEN
+from encoding import EncodedBaskets
+from main import MINING_ENGINES
+from condensed import condense, condensed_mask, superset_level
+from rule_generation import generate_rules
+from rule_store import store_nbytes
+
+@pytest.fixture(scope="module")
+def baskets(basket_lists):
+    # Q1 and Q2 are always bought with P03, so itemsets of them are not closed
+    return EncodedBaskets.from_lists([basket + ["Q1", "Q2"] if "P03" in basket else basket
+                                      for basket in basket_lists])
+
+@pytest.fixture(scope="module")
+def frequent_itemsets(baskets):
+    return MINING_ENGINES["apriori"](baskets, MIN_SUPPORT, MAX_LEN)
+
+def brute_force_mask(frequent_itemsets, itemset_type):
+    supports = dict(zip(frequent_itemsets['itemsets'], frequent_itemsets['support']))
+    keep = []
+    for itemset, support in supports.items():
+        supersets = [supports[other] for other in supports if itemset < other]
+        if itemset_type == "closed":
+            keep.append(not any(np.isclose(other, support) for other in supersets))
+        else:
+            keep.append(not supersets)
+    return np.array(keep)
+
+@pytest.mark.parametrize("itemset_type", ["closed", "maximal"])
+def test_condensed_mask_matches_definition(baskets, frequent_itemsets, itemset_type):
+    mask = condensed_mask(frequent_itemsets, baskets.items.tolist(), itemset_type)
+    expected = brute_force_mask(frequent_itemsets, itemset_type)
+    assert 0 < expected.sum() < len(expected)
+    assert mask.tolist() == expected.tolist()
+
+def test_all_keeps_every_itemset(baskets, frequent_itemsets):
+    assert condensed_mask(frequent_itemsets, baskets.items.tolist(), "all").all()
+
+@pytest.mark.parametrize("itemset_type", ["closed", "maximal"])
+def test_condense_keeps_the_rules_of_kept_itemsets(baskets, frequent_itemsets, itemset_type):
+    items = baskets.items.tolist()
+    kept_itemsets, rules, report = condense(frequent_itemsets, items, itemset_type, min_confidence=0.2)
+    full = generate_rules(frequent_itemsets, items, min_confidence=0.2).to_frame()
+
+    kept = set(kept_itemsets['itemsets'])
+    expected = full[[a | c in kept for a, c in zip(full['antecedents'], full['consequents'])]]
+    found = rules.to_frame()
+    # Same rules, metrics and ranking order as in the full rule set
+    assert list(zip(found['antecedents'], found['consequents'])) == \
+        list(zip(expected['antecedents'], expected['consequents']))
+    np.testing.assert_allclose(found['confidence'], expected['confidence'])
+
+    assert report["itemsets"] == {"full": len(frequent_itemsets), "kept": len(kept_itemsets)}
+    assert report["rules"] == {"full": len(full), "kept": len(rules)}
+    assert store_nbytes(len(rules), len(rules.antecedent_codes), len(rules.consequent_codes),
+                        len(rules.columns)) == rules.nbytes()
+    assert report["bytes_saved"] == report["model_bytes"]["full"] - report["model_bytes"]["kept"] > 0
+
+@pytest.mark.parametrize("itemset_type", ["closed", "maximal"])
+def test_itemsets_at_max_len_are_checked_against_longer_ones(baskets, frequent_itemsets, itemset_type):
+    # {P03, Q1, Q2} is one item past max_len=2, and makes {Q1, Q2} neither closed nor maximal
+    items = baskets.items.tolist()
+    short = MINING_ENGINES["apriori"](baskets, MIN_SUPPORT, 2)
+    supersets = superset_level(baskets, short, MIN_SUPPORT, 2)
+    longer = frequent_itemsets[frequent_itemsets['itemsets'].apply(len) == 3]
+    assert dict(zip(supersets['itemsets'], supersets['support'])) == \
+        pytest.approx(dict(zip(longer['itemsets'], longer['support'])))
+
+    expected = dict(zip(frequent_itemsets['itemsets'], brute_force_mask(frequent_itemsets, itemset_type)))
+    mask = condensed_mask(short, items, itemset_type, supersets)
+    assert mask.tolist() == [expected[itemset] for itemset in short['itemsets']]
+    assert not expected[frozenset({"Q1", "Q2"})]
+    # Without the supersets, itemsets at the limit count as closed and maximal
+    assert condensed_mask(short, items, itemset_type)[list(short['itemsets']).index(frozenset({"Q1", "Q2"}))]
+
+    kept_itemsets, _, report = condense(short, items, itemset_type, min_confidence=0.2, supersets=supersets)
+    assert list(kept_itemsets['itemsets']) == list(short['itemsets'][mask])
+    assert report["itemsets"] == {"full": len(short), "kept": int(mask.sum())}
@@ -0,0 +1,76 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from conftest import MIN_SUPPORT, MAX_LEN
+from encoding import EncodedBaskets
+from eclat import eclat
+from incremental import IncrementalMiner
+
+def weighted_itemsets(segments, weights, min_support, max_len):
+    """Brute-force weighted supports of every itemset reaching ``min_support``"""
+    counts = {}
+    for baskets, weight in zip(segments, weights):
+        for basket in baskets:
+            for size in range(1, max_len + 1):
+                for itemset in combinations(basket, size):
+                    counts[frozenset(itemset)] = counts.get(frozenset(itemset), 0.0) + weight
+    total = sum(len(baskets) * weight for baskets, weight in zip(segments, weights))
+    return {itemset: count / total for itemset, count in counts.items()
+            if count / total >= min_support * (1 - 1e-9)}
+
+def assert_same_itemsets(frequent_itemsets, expected):
+    found = dict(zip(frequent_itemsets['itemsets'], frequent_itemsets['support']))
+    assert found.keys() == expected.keys()
+    np.testing.assert_allclose([found[s] for s in expected], list(expected.values()))
+
+def _ingest(miner, model, batch, version, **options):
+    """Apply one batch and return the model the service would save for it"""
+    update = miner.update(model, EncodedBaskets.from_lists(batch), **options)
+    miner.commit(version)
+    return dict(model, version=version, frequent_itemsets=update["frequent_itemsets"],
+                params=dict(model["params"], incremental={"base_version": update["base_version"]})), update
+
+@pytest.fixture
+def trained(tmp_path, basket_lists):
+    base = basket_lists[:300]
+    model = {
+        "version": "v0",
+        "params": {"min_support": MIN_SUPPORT, "max_length": MAX_LEN},
+        "transaction_count": len(base),
+        "frequent_itemsets": eclat(EncodedBaskets.from_lists(base), MIN_SUPPORT, MAX_LEN),
+    }
+    miner = IncrementalMiner(str(tmp_path / "incremental"))
+    # The service opens the state under the lock, which also creates the directory
+    with miner.lock():
+        miner.open(model, lambda: EncodedBaskets.from_lists(base))
+    return miner, model, base
+
+def test_fup_updates_equal_a_full_remine(trained, basket_lists):
+    miner, model, base = trained
+    first, second = basket_lists[300:360], basket_lists[360:]
+
+    model, update = _ingest(miner, model, first, "v1")
+    assert update["mode"] == "fup"
+    assert_same_itemsets(update["frequent_itemsets"], weighted_itemsets([base + first], [1.0], MIN_SUPPORT, MAX_LEN))
+
+    model, update = _ingest(miner, model, second, "v2")
+    assert_same_itemsets(update["frequent_itemsets"], weighted_itemsets([basket_lists], [1.0], MIN_SUPPORT, MAX_LEN))
+
+def test_decay_weights_older_baskets(trained, basket_lists):
+    miner, model, base = trained
+    first, second = basket_lists[300:360], basket_lists[360:]
+
+    model, _ = _ingest(miner, model, first, "v1", decay=0.5)
+    model, update = _ingest(miner, model, second, "v2", decay=0.5)
+    expected = weighted_itemsets([base, first, second], [0.25, 0.5, 1.0], MIN_SUPPORT, MAX_LEN)
+    assert_same_itemsets(update["frequent_itemsets"], expected)
+
+def test_window_drops_the_oldest_segments(trained, basket_lists):
+    miner, model, base = trained
+    first = basket_lists[300:]
+
+    model, update = _ingest(miner, model, first, "v1", window=len(first))
+    assert update["evicted_transactions"] == len(base)
+    assert_same_itemsets(update["frequent_itemsets"], weighted_itemsets([first], [1.0], MIN_SUPPORT, MAX_LEN))
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from ingest import stream_transactions
+
+HEADER = """voucher_id,date,total
+v1,2023-04-01,10.0
+v2,2023-04-01,10.0
+v3,2023-04-01,10.0
+v5,2023-04-01,10.0
+"""
+
+# v4 has no header and x9 only occurs on its row; z1 only occurs on a row without a voucher ID
+DETAIL = """voucher_id,item_no,quantity,price
+v1,b,1,2.5
+v1,a,1,2.5
+v1,b,1,2.5
+v2,c,1,2.5
+v4,x9,1,2.5
+v3,a,1,2.5
+v3,,1,2.5
+v3,c,1,2.5
+,z1,1,2.5
+v5,d,1,2.5
+v1,c,1,2.5
+"""
+
+@pytest.fixture
+def csv_files(tmp_path):
+    header, detail = tmp_path / "header.csv", tmp_path / "detail.csv"
+    header.write_text(HEADER)
+    detail.write_text(DETAIL)
+    return str(header), str(detail)
+
+def _decoded(baskets):
+    return [baskets.items[baskets.codes[baskets.offsets[i]:baskets.offsets[i + 1]]].tolist()
+            for i in range(len(baskets))]
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 100])
+def test_stream_transactions_matches_merge_and_groupby(csv_files, chunk_size):
+    header_file, detail_file = csv_files
+    baskets = stream_transactions(header_file, detail_file, chunk_size=chunk_size)
+
+    detail = pd.read_csv(detail_file, dtype=str).dropna(subset=['voucher_id', 'item_no'])
+    merged = detail.merge(pd.read_csv(header_file, dtype=str), on='voucher_id')
+    expected = merged.groupby('voucher_id', sort=False)['item_no'].apply(lambda items: sorted(set(items)))
+    assert sorted(_decoded(baskets)) == sorted(expected.tolist())
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 100])
+def test_item_dictionary_only_holds_items_in_baskets(csv_files, chunk_size):
+    baskets = stream_transactions(*csv_files, chunk_size=chunk_size)
+    assert baskets.items.tolist() == ["a", "b", "c", "d"]
+    assert (baskets.item_counts() > 0).all()
+
+def test_max_rows_only_limits_detail_rows(tmp_path, csv_files):
+    header_file, _ = csv_files
+    detail_file = tmp_path / "late.csv"
+    # v5 is the header's last voucher, so limiting the header rows as well would drop these lines
+    detail_file.write_text("voucher_id,item_no,quantity,price\nv5,d,1,2.5\nv5,a,1,2.5\nv1,b,1,2.5\n")
+    baskets = stream_transactions(header_file, str(detail_file), max_rows=2)
+    assert _decoded(baskets) == [["a", "d"]]
@@ -0,0 +1,108 @@
+from concurrent.futures import Future
+import json
+import os
+import time
+
+import numpy as np
+import pytest
+
+from conftest import MIN_SUPPORT, MAX_LEN, brute_force_itemsets
+from eclat import count_itemsets, tid_bitsets
+from main import MINING_ENGINES
+from parallel import parallel_apriori
+import son as son_module
+
+def as_dict(frequent_itemsets):
+    return dict(zip(frequent_itemsets['itemsets'], frequent_itemsets['support']))
+
+def assert_same_itemsets(frequent_itemsets, expected):
+    found = as_dict(frequent_itemsets)
+    assert found.keys() == expected.keys()
+    np.testing.assert_allclose([found[s] for s in expected], list(expected.values()))
+
+def apriori_order(frequent_itemsets):
+    return [(len(s), sorted(s)) for s in frequent_itemsets['itemsets']]
+
+@pytest.mark.parametrize("algorithm", ["apriori", "fpgrowth", "eclat"])
+def test_engines_find_every_frequent_itemset(basket_lists, baskets, algorithm):
+    frequent_itemsets = MINING_ENGINES[algorithm](baskets, MIN_SUPPORT, MAX_LEN)
+    assert_same_itemsets(frequent_itemsets, brute_force_itemsets(basket_lists, MIN_SUPPORT, MAX_LEN))
+    # Same (length, item order) order as apriori, so rule ranking ties break identically
+    assert apriori_order(frequent_itemsets) == sorted(apriori_order(frequent_itemsets))
+
+@pytest.mark.parametrize("max_len", [1, 2, 4])
+def test_eclat_respects_max_len(basket_lists, baskets, max_len):
+    frequent_itemsets = MINING_ENGINES["eclat"](baskets, MIN_SUPPORT, max_len)
+    assert_same_itemsets(frequent_itemsets, brute_force_itemsets(basket_lists, MIN_SUPPORT, max_len))
+
+def test_parallel_apriori_matches_apriori(baskets):
+    expected = MINING_ENGINES["apriori"](baskets, MIN_SUPPORT, MAX_LEN)
+    frequent_itemsets = parallel_apriori(baskets, MIN_SUPPORT, MAX_LEN, workers=2)
+    assert list(frequent_itemsets['itemsets']) == list(expected['itemsets'])
+    np.testing.assert_allclose(frequent_itemsets['support'], expected['support'])
+
+@pytest.mark.parametrize("partitions,workers", [(1, 1), (3, 1), (7, 1), (3, 2)])
+def test_son_matches_apriori(tmp_path, baskets, partitions, workers):
+    expected = MINING_ENGINES["apriori"](baskets, MIN_SUPPORT, MAX_LEN)
+    frequent_itemsets = son_module.son(baskets, MIN_SUPPORT, MAX_LEN, partitions=partitions, workers=workers,
+                                       son_dir=str(tmp_path))
+    assert list(frequent_itemsets['itemsets']) == list(expected['itemsets'])
+    np.testing.assert_allclose(frequent_itemsets['support'], expected['support'])
+    # The run directory is removed once the run is over
+    assert os.listdir(tmp_path) == []
+
+def test_son_fails_as_soon_as_a_helper_fails(tmp_path):
+    run_dir = tmp_path / "run"
+    (run_dir / "claims").mkdir(parents=True)
+    (run_dir / "manifest.json").write_text(json.dumps({"partitions": 1, "min_support": 0.5, "max_len": 2}))
+    # Another worker's claim keeps the coordinator from running the task itself
+    (run_dir / "claims" / "local-0000").write_text("elsewhere:1")
+    helper = Future()
+    helper.set_exception(RuntimeError("helper crashed"))
+
+    started = time.time()
+    with pytest.raises(RuntimeError, match="helper crashed"):
+        son_module._wait_for_pass(str(run_dir), "local", 1, started + 60, [helper])
+    assert time.time() - started < 5
+
+@pytest.mark.parametrize("block_rows", [1, 3, 256])
+def test_count_itemsets_matches_brute_force(basket_lists, baskets, block_rows):
+    expected = brute_force_itemsets(basket_lists, MIN_SUPPORT, MAX_LEN)
+    codes = {item: code for code, item in enumerate(baskets.items)}
+    # Mixed lengths, counted through a code-to-row map over bitsets of only the used items
+    candidates = [sorted(codes[item] for item in itemset) for itemset in expected]
+    items = np.unique([code for candidate in candidates for code in candidate])
+    rows = np.full(baskets.n_items, -1, dtype=np.int64)
+    rows[items] = np.arange(len(items))
+
+    counts = count_itemsets(tid_bitsets(baskets, items), candidates, rows, block_rows=block_rows)
+    np.testing.assert_allclose(counts / len(basket_lists), list(expected.values()))
+
+def _one_partition_run(tmp_path, baskets):
+    run_dir = tmp_path / "run"
+    (run_dir / "claims").mkdir(parents=True)
+    baskets.save(str(run_dir / "partition-0000"))
+    manifest = {"partitions": 1, "min_support": MIN_SUPPORT, "max_len": MAX_LEN}
+    (run_dir / "manifest.json").write_text(json.dumps(manifest))
+    return str(run_dir), manifest
+
+def test_son_task_run_twice_keeps_the_first_output(tmp_path, baskets):
+    run_dir, manifest = _one_partition_run(tmp_path, baskets)
+    for _ in range(2):
+        son_module._run_task(run_dir, manifest, "local", 0)
+    output = son_module._output_path(run_dir, "local", 0)
+    assert son_module._load_sets(output) == son_module._mine_partition(baskets, MIN_SUPPORT, MAX_LEN)
+    assert sorted(os.listdir(run_dir)) == ["claims", "local-0000", "manifest.json", "partition-0000"]
+
+def test_son_claim_stays_fresh_while_its_task_runs(tmp_path, baskets, monkeypatch):
+    run_dir, _ = _one_partition_run(tmp_path, baskets)
+    monkeypatch.setattr(son_module, "TASK_TIMEOUT", 0.2)
+    taken_over = []
+
+    def slow_task(*args):
+        time.sleep(0.6)
+        taken_over.append(son_module._claim(run_dir, "local", 0))
+    monkeypatch.setattr(son_module, "_run_task", slow_task)
+
+    assert son_module.work(run_dir, "local") == 1
+    assert taken_over == [False]
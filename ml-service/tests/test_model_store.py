@@ -0,0 +1,80 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import main
+import model_store
+from conftest import make_model
+from model_store import save_model, load_model, latest_version, new_version
+
+def test_artifacts_of_another_format_are_refused(tmp_path, baskets):
+    version = save_model(make_model(baskets), model_dir=str(tmp_path))
+    meta_path = tmp_path / version / "meta.json"
+    meta = json.loads(meta_path.read_text())
+    del meta["format"]
+    meta_path.write_text(json.dumps(meta))
+
+    with pytest.raises(ValueError, match="artifact format"):
+        load_model(version, model_dir=str(tmp_path))
+
+def test_saved_model_loads_memory_mapped_with_the_same_contents(tmp_path, baskets, basket_lists):
+    model = make_model(baskets)
+    version = save_model(model, model_dir=str(tmp_path))
+    assert version == model["version"] == latest_version(str(tmp_path))
+    loaded = load_model(model_dir=str(tmp_path))
+
+    for key in ("version", "trained_at", "params", "stats", "aggregates", "columns", "transaction_count"):
+        assert loaded[key] == model[key], key
+    assert list(loaded["frequent_itemsets"]['itemsets']) == list(model["frequent_itemsets"]['itemsets'])
+    np.testing.assert_array_equal(loaded["frequent_itemsets"]['support'], model["frequent_itemsets"]['support'])
+
+    rules, saved_rules = loaded["rules"], model["rules"]
+    assert isinstance(rules.antecedent_codes, np.memmap)
+    assert isinstance(loaded["set_arrays"]["itemset_codes"], np.memmap)
+    assert rules.columns == saved_rules.columns
+    for column in rules.columns:
+        np.testing.assert_array_equal(rules[column], saved_rules[column])
+    assert [(rules.antecedents(i), rules.consequents(i)) for i in range(len(rules))] == \
+        [(saved_rules.antecedents(i), saved_rules.consequents(i)) for i in range(len(saved_rules))]
+    for basket in basket_lists[:50]:
+        assert main.get_recommendations(basket, loaded["rule_index"]) == \
+            main.get_recommendations(basket, model["rule_index"])
+
+def test_old_versions_are_pruned(tmp_path, baskets, monkeypatch):
+    monkeypatch.setattr(model_store, "KEEP_VERSIONS", 2)
+    model = make_model(baskets)
+    versions = [save_model(dict(model, version=new_version()), model_dir=str(tmp_path)) for _ in range(4)]
+    assert sorted(os.listdir(tmp_path)) == sorted(versions[-2:] + ["LATEST"])
+
+    # The saved version is kept even when a stray artifact sorts after it
+    os.mkdir(tmp_path / "99990101T000000000000000-ffffff")
+    version = save_model(dict(model, version=new_version()), model_dir=str(tmp_path))
+    assert version in os.listdir(tmp_path) and latest_version(str(tmp_path)) == version
+    assert versions[-1] not in os.listdir(tmp_path)
+
+def test_versions_strictly_increase():
+    versions = [new_version() for _ in range(2000)]
+    assert len(set(versions)) == len(versions)
+    assert [v.split("-")[0] for v in versions] == sorted(v.split("-")[0] for v in versions)
+
+def test_only_the_model_named_by_latest_is_published(tmp_path, baskets, monkeypatch):
+    # The service uses the default model directory, relative to its working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "model_data", None)
+    model = make_model(baskets)
+    first = save_model(dict(model, version=new_version()))
+    second = save_model(dict(model, version=new_version()))
+
+    assert not main._publish_version(first)
+    assert main.model_data is None
+    assert main._publish_version(second)
+    assert main.model_data["version"] == second
+    # Already served
+    assert not main._publish_version(second)
+
+    # A newer save wins even if an older version is offered afterwards
+    third = save_model(dict(model, version=new_version()))
+    assert not main._publish_version(second)
+    assert main._publish_version(third) and main.model_data["version"] == third
@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conftest import make_model
+from model_store import save_model, load_model
+from product_names import product_name_mapper
+
+LIMIT = 7
+
+def stable_order(rows, values):
+    """Rows by value, highest first, with ties and then NaN values in table order"""
+    return sorted(rows, key=lambda row: (math.isnan(values[row]), 0.0 if math.isnan(values[row]) else -values[row]))
+
+@pytest.fixture(scope="module")
+def model(tmp_path_factory, baskets):
+    # Served the way the API serves it: loaded from an artifact, itemsets not decoded
+    model_dir = str(tmp_path_factory.mktemp("models"))
+    version = save_model(make_model(baskets), model_dir=model_dir)
+    model = load_model(version, model_dir=model_dir, mmap=False, decode_itemsets=False)
+    rules = model["rules"]
+    # Rounded confidences tie, and some convictions are NaN
+    rules.metrics["confidence"] = np.round(rules["confidence"], 1)
+    rules.metrics["conviction"][::5] = np.nan
+    return model
+
+@pytest.fixture
+def client(model, monkeypatch):
+    monkeypatch.setattr(main, "model_data", model)
+    return TestClient(main.app)
+
+def fetch_pages(client, path, key, params):
+    """Every row of a listing, requested LIMIT rows at a time through next_offset"""
+    rows, offset, totals = [], 0, set()
+    while offset is not None:
+        page = client.get(path, params=dict(params, offset=offset, limit=LIMIT)).json()
+        assert page["offset"] == offset and len(page[key]) <= LIMIT
+        assert page[key] or page["next_offset"] is None
+        rows += page[key]
+        totals.add(page["total"])
+        offset = page["next_offset"]
+    assert totals == {len(rows)}
+    return rows
+
+@pytest.mark.parametrize("seed", range(5))
+def test_select_rows_matches_a_full_stable_sort(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.integers(0, 6, size=60).astype(np.float64)
+    values[rng.random(60) < 0.2] = np.nan
+    mask = rng.random(60) < 0.7
+    expected = stable_order(np.flatnonzero(mask).tolist(), values)
+
+    for offset in (0, 1, 5, len(expected) - 1, len(expected), len(expected) + 3):
+        for limit in (1, 4, 11, None):
+            positions, total = main._select_rows(mask, values, offset, limit)
+            assert total == len(expected)
+            assert positions.tolist() == expected[offset:None if limit is None else offset + limit]
+    positions, _ = main._select_rows(mask, None, 3, 4)
+    assert positions.tolist() == np.flatnonzero(mask)[3:7].tolist()
+
+def rule_entries(rules, rule_ids):
+    return [{'antecedents': product_name_mapper.decode(rules.items, rules.antecedent_item_codes(rule_id)),
+             'consequents': product_name_mapper.decode(rules.items, rules.consequent_item_codes(rule_id))}
+            for rule_id in rule_ids]
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"sort_by": "confidence"},
+    {"sort_by": "conviction"},
+    {"sort_by": "lift", "min_confidence": 0.3, "min_length": 3},
+])
+def test_rule_pages_match_a_full_stable_sort(client, model, params):
+    rules = model["rules"]
+    mask = np.ones(len(rules), dtype=bool)
+    if "min_confidence" in params:
+        mask &= rules["confidence"] >= params["min_confidence"]
+    if "min_length" in params:
+        lengths = np.diff(rules.antecedent_offsets) + np.diff(rules.consequent_offsets)
+        mask &= lengths >= params["min_length"]
+    rule_ids = np.flatnonzero(mask).tolist()
+    if "sort_by" in params:
+        rule_ids = stable_order(rule_ids, np.asarray(rules[params["sort_by"]], dtype=np.float64))
+    assert len(rule_ids) > 3 * LIMIT
+
+    found = fetch_pages(client, "/rules", "rules", params)
+    assert [{'antecedents': r['antecedents'], 'consequents': r['consequents']} for r in found] == \
+        rule_entries(rules, rule_ids)
+
+@pytest.mark.parametrize("params", [{}, {"min_length": 2}, {"item": "P01"}])
+def test_itemset_pages_match_a_full_stable_sort(client, model, params):
+    arrays = model["set_arrays"]
+    offsets, codes = arrays["itemset_offsets"], arrays["itemset_codes"]
+    items = model["rule_index"].items
+    itemsets = [items[codes[offsets[row]:offsets[row + 1]]].tolist() for row in range(len(offsets) - 1)]
+    rows = [row for row, itemset in enumerate(itemsets)
+            if len(itemset) >= params.get("min_length", 1) and params.get("item", itemset[0]) in itemset]
+    support = model["frequent_itemsets"]['support'].to_numpy()
+    expected = [itemsets[row] for row in stable_order(rows, support)]
+    assert len(expected) > 2 * LIMIT
+
+    found = fetch_pages(client, "/frequent-itemsets", "frequent_itemsets", params)
+    assert [entry['itemset'] for entry in found] == expected
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from conftest import MIN_SUPPORT, MAX_LEN
+from rule_generation import generate_rules
+from rule_index import RuleIndex, SCORING_MODES
+
+TOP_N = 4
+
+@pytest.fixture(scope="module")
+def rules(baskets):
+    frequent_itemsets = main.MINING_ENGINES["apriori"](baskets, MIN_SUPPORT, MAX_LEN)
+    return generate_rules(frequent_itemsets, baskets.items.tolist(), min_confidence=0.2)
+
+@pytest.fixture(scope="module")
+def index(rules):
+    return RuleIndex.from_rules(rules)
+
+@pytest.fixture(scope="module")
+def queries(basket_lists):
+    # Whole baskets, parts of baskets, unknown items, repeats and an empty basket
+    rng = np.random.default_rng(3)
+    queries = [basket for basket in basket_lists[:40]]
+    queries += [list(rng.choice(basket, size=max(1, len(basket) // 2), replace=False)) for basket in basket_lists[40:80]]
+    queries += [["P00", "UNKNOWN"], ["P01", "P02", "P01"], []]
+    return queries
+
+def brute_force_scores(rules, basket, mode):
+    """Score and best rule of every item recommended by rules whose whole antecedent is in the basket"""
+    basket = set(basket)
+    confidence = np.asarray(rules['confidence'], dtype=np.float64)
+    lift = np.asarray(rules['lift'], dtype=np.float64)
+    fired = {}
+    for rule_id in range(len(rules)):
+        if set(rules.antecedents(rule_id)) <= basket:
+            for item in rules.consequents(rule_id):
+                if item not in basket:
+                    fired.setdefault(item, []).append(rule_id)
+    scores = {}
+    for item, rule_ids in fired.items():
+        if mode == "max":
+            score = confidence[rule_ids[0]]
+        elif mode == "noisy_or":
+            score = 1 - np.prod(1 - confidence[rule_ids])
+        else:
+            score = lift[rule_ids].sum()
+        scores[item] = (score, rule_ids[0])
+    return scores
+
+def assert_top_n(recommendations, expected, top_n):
+    """The recommendations are top-scoring items with brute-force scores, best first"""
+    assert len(recommendations) == min(top_n, len(expected))
+    for rec in recommendations:
+        assert rec['score'] == pytest.approx(expected[rec['item_id']][0], rel=1e-9)
+    scores = [rec['score'] for rec in recommendations]
+    assert scores == sorted(scores, reverse=True)
+    if recommendations:
+        returned = {rec['item_id'] for rec in recommendations}
+        assert all(score <= scores[-1] + 1e-9 for item, (score, _) in expected.items() if item not in returned)
+
+@pytest.mark.parametrize("mode", SCORING_MODES)
+def test_recommendations_match_brute_force(rules, index, queries, mode):
+    for basket in queries:
+        expected = brute_force_scores(rules, basket, mode)
+        recommendations = main.get_recommendations(basket, index, top_n=TOP_N, mode=mode)
+        assert_top_n(recommendations, expected, TOP_N)
+        if mode == "max":
+            # Exact ties break by best rule, then item code
+            order = sorted(expected, key=lambda item: (-expected[item][0], expected[item][1], item))[:TOP_N]
+            assert [rec['item_id'] for rec in recommendations] == order
+
+@pytest.mark.parametrize("mode", SCORING_MODES)
+def test_batch_endpoint_agrees_with_single_recommendations(baskets, rules, index, queries, mode, monkeypatch):
+    model = {"version": f"test-{mode}", "rules": rules, "rule_index": index, "params": {},
+             "stats": {"transaction_count": len(baskets)}}
+    monkeypatch.setattr(main, "model_data", model)
+    client = TestClient(main.app)
+
+    response = client.post("/recommend/batch", json={"baskets": queries, "top_n": TOP_N, "mode": mode})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert len(results) == len(queries)
+    for basket, result in zip(queries, results):
+        single = client.post("/recommend", json={"items": basket, "top_n": TOP_N, "mode": mode}).json()
+        assert [rec['id'] for rec in result['recommendations']] == [rec['id'] for rec in single['recommendations']]
+        expected = brute_force_scores(rules, basket, mode)
+        assert_top_n([{'item_id': rec['id'], 'score': rec['score']} for rec in result['recommendations']],
+                     expected, TOP_N)
@@ -0,0 +1,80 @@
+import pytest
+
+import main
+import recommendation_cache as cache_module
+from conftest import make_model
+from recommendation_cache import RecommendationCache, basket_key
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "monotonic", clock)
+    return clock
+
+@pytest.fixture
+def served(baskets, monkeypatch):
+    """A model published with a fresh cache"""
+    cache = RecommendationCache(max_entries=100, ttl_seconds=0)
+    monkeypatch.setattr(main, "recommendation_cache", cache)
+    monkeypatch.setattr(main, "model_data", None)
+    model = make_model(baskets)
+    main._publish_model(model)
+    return model, cache
+
+def test_least_recently_used_entry_is_evicted():
+    cache = RecommendationCache(max_entries=2, ttl_seconds=0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats() == {"entries": 2, "hits": 3, "misses": 1, "evictions": 1}
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = RecommendationCache(max_entries=10, ttl_seconds=30)
+    cache.put("a", 1)
+    clock.now += 30
+    assert cache.get("a") == 1
+    clock.now += 0.5
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+    # Writing an entry again restarts its time to live
+    cache.put("a", 2)
+    clock.now += 20
+    assert cache.get("a") == 2
+
+def test_zero_size_disables_the_cache():
+    cache = RecommendationCache(max_entries=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats() == {"entries": 0, "hits": 0, "misses": 0, "evictions": 0}
+
+def test_keys_depend_on_distinct_items_version_top_n_and_mode():
+    key = basket_key("v1", ["P01", "P02", "P03"], 5, "max")
+    assert basket_key("v1", ["P03", "P01", "P02", "P01"], 5, "max") == key
+    assert basket_key("v2", ["P01", "P02", "P03"], 5, "max") != key
+    assert basket_key("v1", ["P01", "P02", "P03"], 4, "max") != key
+    assert basket_key("v1", ["P01", "P02", "P03"], 5, "noisy_or") != key
+    assert basket_key("v1", ["P01", "P02"], 5, "max") != key
+
+def test_reordered_and_repeated_baskets_share_an_entry(served):
+    model, cache = served
+    first = main.cached_recommendations(["P01", "P02"], model, 5, "max")
+    assert main.cached_recommendations(["P02", "P01", "P02"], model, 5, "max") is first
+    assert main.cached_recommendations(["P01", "P02"], model, 5, "noisy_or") is not first
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 2, "evictions": 0}
+
+def test_publishing_a_model_clears_the_cache(served, baskets):
+    model, cache = served
+    main.cached_recommendations(["P00"], model, 5, "max")
+    assert cache.stats()["entries"] == 1
+    main._publish_model(make_model(baskets))
+    assert cache.stats()["entries"] == 0
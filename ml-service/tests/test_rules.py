@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+from mlxtend.frequent_patterns import association_rules
+
+from conftest import MIN_SUPPORT, MAX_LEN
+from main import MINING_ENGINES
+from rule_generation import BASE_COLUMNS, RULE_METRICS, generate_rules
+
+@pytest.fixture(scope="module")
+def frequent_itemsets(baskets):
+    return MINING_ENGINES["apriori"](baskets, MIN_SUPPORT, MAX_LEN)
+
+def keyed(frame):
+    return {(a, c): row for a, c, row in zip(frame['antecedents'], frame['consequents'], frame.to_dict('records'))}
+
+@pytest.mark.parametrize("min_confidence", [0.1, 0.5, 0.8])
+def test_rules_match_mlxtend(baskets, frequent_itemsets, min_confidence):
+    expected = keyed(association_rules(frequent_itemsets, metric="confidence", min_threshold=min_confidence))
+    rules = generate_rules(frequent_itemsets, baskets.items.tolist(), min_confidence=min_confidence)
+    found = keyed(rules.to_frame())
+
+    assert found.keys() == expected.keys()
+    for column in BASE_COLUMNS + RULE_METRICS:
+        np.testing.assert_allclose([found[key][column] for key in expected],
+                                   [expected[key][column] for key in expected], err_msg=column)
+
+def test_rules_are_ranked_by_confidence(baskets, frequent_itemsets):
+    rules = generate_rules(frequent_itemsets, baskets.items.tolist(), min_confidence=0.1)
+    confidence = np.asarray(rules['confidence'], dtype=np.float64)
+    assert len(confidence) > 20
+    # Ranked on float64 metrics, stored as float32
+    assert (np.diff(confidence) <= 1e-6).all()
+
+def test_only_requested_metrics_are_computed(baskets, frequent_itemsets):
+    rules = generate_rules(frequent_itemsets, baskets.items.tolist(), min_confidence=0.5, metrics=["leverage"])
+    assert rules.columns == list(BASE_COLUMNS) + ["leverage"]
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import MAX_LEN, brute_force_itemsets
+from rule_generation import generate_rules
+from topk import TOP_K_MIN_COUNT, top_k_itemsets, mine_top_k, select_top_rules, is_exact
+
+def all_itemsets(basket_lists):
+    """Every itemset of at least TOP_K_MIN_COUNT baskets, as a frame in apriori's order"""
+    supports = brute_force_itemsets(basket_lists, TOP_K_MIN_COUNT / len(basket_lists), MAX_LEN)
+    ordered = sorted(supports, key=lambda s: (len(s), sorted(s)))
+    return pd.DataFrame({'support': [supports[s] for s in ordered], 'itemsets': pd.Series(ordered, dtype=object)})
+
+def rule_keys(rules):
+    return {(frozenset(rules.antecedents(i)), frozenset(rules.consequents(i))) for i in range(len(rules))}
+
+@pytest.mark.parametrize("k", [1, 10, 40])
+def test_top_k_itemsets_are_the_k_best_supported(basket_lists, baskets, k):
+    frequent_itemsets, threshold = top_k_itemsets(baskets, k, MAX_LEN)
+    candidates = all_itemsets(basket_lists)
+    kth = np.sort(candidates['support'].to_numpy())[::-1][k - 1]
+    assert threshold == pytest.approx(kth)
+    expected = candidates[candidates['support'] >= kth - 1e-12]
+    assert list(frequent_itemsets['itemsets']) == list(expected['itemsets'])
+    np.testing.assert_allclose(frequent_itemsets['support'], expected['support'])
+
+@pytest.mark.parametrize("k", [5, 25])
+def test_top_k_rules_by_support(basket_lists, baskets, k):
+    items = baskets.items.tolist()
+    frequent_itemsets, _ = mine_top_k(baskets, k, MAX_LEN, target="rules", metric="support", min_confidence=0.5)
+    rules = select_top_rules(generate_rules(frequent_itemsets, items, min_confidence=0.5), k, "support")
+
+    every_rule = generate_rules(all_itemsets(basket_lists), items, min_confidence=0.5)
+    expected = select_top_rules(every_rule, k, "support")
+    assert len(rules) >= k
+    assert rule_keys(rules) == rule_keys(expected)
+
+def test_only_top_k_rules_by_lift_are_not_exact():
+    assert is_exact("itemsets", "support")
+    assert is_exact("rules", "support")
+    assert not is_exact("rules", "lift")
@@ -0,0 +1,155 @@
+from typing import Callable, Optional, Tuple
+from itertools import combinations
+import heapq
+import numpy as np
+import pandas as pd
+import os
+import logging
+from encoding import EncodedBaskets
+from eclat import tid_bitsets, popcount
+from rule_store import RuleStore
+
+logger = logging.getLogger(__name__)
+
+# Itemsets seen in fewer baskets than this are never returned, however few are found
+TOP_K_MIN_COUNT = int(os.environ.get("TOP_K_MIN_COUNT", 2))
+# Lift is not bounded by support, so top-K by lift is taken from this many times K best-supported rules
+TOP_K_LIFT_POOL = int(os.environ.get("TOP_K_LIFT_POOL", 10))
+
+TOP_K_TARGETS = ("itemsets", "rules")
+TOP_K_METRICS = ("support", "lift")
+
+# Candidate extensions AND-ed against a prefix bitset at a time
+_BLOCK_ROWS = 1024
+
+def _confident_rules(itemset: Tuple[int, ...], count: int, count_of: Callable[[Tuple[int, ...]], int],
+                     n_transactions: int, min_confidence: float) -> int:
+    """Number of rules splitting ``itemset`` whose confidence reaches ``min_confidence``"""
+    support = count / n_transactions
+    rules = 0
+    for size in range(1, len(itemset)):
+        for antecedent in combinations(itemset, size):
+            # Same arithmetic as association_rules, so boundary cases agree
+            if support / (count_of(antecedent) / n_transactions) >= min_confidence:
+                rules += 1
+    return rules
+
+def top_k_itemsets(baskets: EncodedBaskets, k: int, max_len: Optional[int] = None,
+                   min_confidence: Optional[float] = None) -> Tuple[pd.DataFrame, float]:
+    """Mine the ``k`` most frequent itemsets, or the itemsets of the ``k`` best-supported rules.
+
+    Itemsets are expanded best-first by support from a priority queue, so they
+    are taken in descending support order. The k-th best support among the
+    itemsets counted so far is the threshold: extensions below it are never queued and the search
+    stops as soon as the queue's best falls under it, so the cost is bounded
+    by K rather than by a guessed min_support. With ``min_confidence`` the
+    ranking counts the rules of each itemset reaching that confidence instead
+    (TopKRules). Returns every itemset at or above the final threshold, ties
+    included, in apriori's order, together with that threshold as a support;
+    the result is what apriori would mine at that min_support.
+    """
+    n_transactions = baskets.n_transactions
+    if n_transactions == 0:
+        return pd.DataFrame({'support': np.array([], dtype=np.float64),
+                             'itemsets': pd.Series([], dtype=object)}), 0.0
+
+    item_counts = baskets.item_counts()
+    order = np.argsort(-item_counts, kind="stable")
+    order = order[item_counts[order] >= TOP_K_MIN_COUNT]
+    sorted_counts = item_counts[order]
+    bitsets = tid_bitsets(baskets, order)
+
+    threshold = TOP_K_MIN_COUNT
+    best = []
+    known = {}
+
+    def count_of(rows):
+        if rows not in known:
+            combined = bitsets[rows[0]]
+            for row in rows[1:]:
+                combined = combined & bitsets[row]
+            known[rows] = int(popcount(combined))
+        return known[rows]
+
+    def offer(count, times=1):
+        nonlocal threshold
+        for _ in range(times):
+            if len(best) < k:
+                heapq.heappush(best, count)
+            elif count > best[0]:
+                heapq.heapreplace(best, count)
+        if len(best) == k:
+            threshold = max(threshold, best[0])
+
+    def discover(rows, count):
+        """Rank an itemset as soon as its support is known, raising the threshold early"""
+        known[rows] = count
+        if min_confidence is None:
+            offer(count)
+        elif len(rows) > 1:
+            offer(count, _confident_rules(rows, count, count_of, n_transactions, min_confidence))
+
+    # Rows are in descending support order, so the singletons already form a valid heap
+    queue = [(-int(count), (row,)) for row, count in enumerate(sorted_counts)]
+    for row, count in enumerate(sorted_counts.tolist()):
+        discover((row,), count)
+    found = []
+    extensions = {}
+    while queue and -queue[0][0] >= threshold:
+        negative_count, rows = heapq.heappop(queue)
+        count = -negative_count
+        found.append((rows, count))
+
+        if max_len is not None and len(rows) >= max_len:
+            continue
+        # Like Eclat, a prefix is only extended by the items that extended its parent,
+        # and only by those still at or above the threshold
+        if len(rows) == 1:
+            stop = int(np.searchsorted(-sorted_counts, -threshold, side="right"))
+            candidates = np.arange(rows[0] + 1, max(stop, rows[0] + 1))
+        else:
+            siblings, sibling_counts = extensions[rows[:-1]]
+            candidates = siblings[(siblings > rows[-1]) & (sibling_counts >= threshold)]
+        if not len(candidates):
+            continue
+        prefix = bitsets[rows[0]]
+        for row in rows[1:]:
+            prefix = prefix & bitsets[row]
+        child_counts = np.concatenate([popcount(prefix & bitsets[candidates[start:start + _BLOCK_ROWS]])
+                                       for start in range(0, len(candidates), _BLOCK_ROWS)])
+        keep = child_counts >= threshold
+        extensions[rows] = (candidates[keep], child_counts[keep])
+        for row, child_count in zip(candidates[keep].tolist(), child_counts[keep].tolist()):
+            discover(rows + (row,), child_count)
+            heapq.heappush(queue, (-child_count, rows + (row,)))
+
+    found = [(tuple(sorted(int(code) for code in order[list(rows)])), count)
+             for rows, count in found if count >= threshold]
+    found.sort(key=lambda entry: (len(entry[0]), entry[0]))
+    logger.info(f"Top-{k} search expanded {len(known)} itemsets, threshold {threshold} baskets")
+
+    items = baskets.items
+    return pd.DataFrame({
+        'support': np.array([count for _, count in found], dtype=np.int64) / n_transactions,
+        'itemsets': pd.Series([frozenset(items[list(codes)]) for codes, _ in found], dtype=object),
+    }), threshold / n_transactions
+
+def is_exact(target: str = "itemsets", metric: str = "support") -> bool:
+    """Whether top-K mining is exact; top-K rules by lift are the best of a pool of TOP_K_LIFT_POOL * K"""
+    return not (target == "rules" and metric == "lift")
+
+def mine_top_k(baskets: EncodedBaskets, k: int, max_len: Optional[int] = None, target: str = "itemsets",
+               metric: str = "support", min_confidence: float = 0.5) -> Tuple[pd.DataFrame, float]:
+    """Itemsets needed for the ``k`` best itemsets or rules; see ``select_top_rules`` for the rules"""
+    if target == "itemsets":
+        return top_k_itemsets(baskets, k, max_len)
+    pool = k * TOP_K_LIFT_POOL if metric == "lift" else k
+    return top_k_itemsets(baskets, pool, max_len, min_confidence=min_confidence)
+
+def select_top_rules(rules: RuleStore, k: int, metric: str = "support") -> RuleStore:
+    """The ``k`` best rules by ``metric``, ties at the k-th value included, in their existing order"""
+    if len(rules) <= k:
+        return rules
+    values = np.asarray(rules[metric])
+    kth = np.partition(values, len(values) - k)[len(values) - k]
+    return rules.take(np.flatnonzero(values >= kth))